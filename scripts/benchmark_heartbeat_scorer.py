@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark the single-pass heartbeat context scorer against the original helpers.
+
+The baseline below is the pre-HeartbeatContextScorer implementation: every
+feature re-normalizes the text, re-tokenizes it and walks its regex list,
+and selection calls them repeatedly for the same message. Both paths score
+the same synthetic messages; the script checks they agree before timing.
+
+Usage:
+    python scripts/benchmark_heartbeat_scorer.py
+    python scripts/benchmark_heartbeat_scorer.py --messages 20000 --repeat 5
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from heartbeat_context import (  # noqa: E402
+    HEARTBEAT_COMMAND_TERMS,
+    HEARTBEAT_CURRENT_EVENTS_PATTERNS,
+    HEARTBEAT_HIGH_PRIORITY_KEYWORDS,
+    HEARTBEAT_LOW_VALUE_PATTERNS,
+    HEARTBEAT_SUPPORT_KEYWORDS,
+    HeartbeatContextScorer,
+)
+
+VOCABULARY = [
+    "i", "feel", "tired", "today", "work", "deadline", "my", "therapist", "said", "sleep", "news", "bitcoin",
+    "price", "search", "family", "dinner", "lonely", "meds", "mood", "what's", "happening", "lately", "the",
+    "web", "panic", "calm", "walk", "church", "grateful", "overwhelmed", "partner", "yesterday", "recently",
+]
+
+
+def _normalize(value):
+    return " ".join((value or "").split()).strip()
+
+
+def baseline_is_current_events(message):
+    normalized = _normalize(message)
+    if not normalized:
+        return False
+    lower = normalized.lower()
+    if any(pattern.search(lower) for pattern in HEARTBEAT_CURRENT_EVENTS_PATTERNS):
+        return True
+    tokens = set(re.findall(r"[a-z']+", lower))
+    return bool({"news", "headline", "headlines", "update", "updates", "latest", "happening", "happened"} & tokens)
+
+
+def baseline_is_low_value(message):
+    normalized = _normalize(message)
+    if not normalized:
+        return True
+    lower = normalized.lower()
+    if len(lower) < 8:
+        return True
+    if any(pattern.search(lower) for pattern in HEARTBEAT_LOW_VALUE_PATTERNS):
+        return True
+    tokens = re.findall(r"[a-z']+", lower)
+    if tokens and len(tokens) <= 6 and sum(token in HEARTBEAT_COMMAND_TERMS for token in tokens) >= max(2, len(tokens) // 2):
+        return True
+    return False
+
+
+def baseline_score(message):
+    normalized = _normalize(message)
+    if not normalized:
+        return -100
+    lower = normalized.lower()
+    tokens = set(re.findall(r"[a-z']+", lower))
+    score = 0
+    if baseline_is_low_value(normalized):
+        score -= 6
+    if baseline_is_current_events(normalized):
+        score -= 8
+    score += min(6, sum(token in HEARTBEAT_SUPPORT_KEYWORDS for token in tokens) * 2)
+    score += min(8, sum(token in HEARTBEAT_HIGH_PRIORITY_KEYWORDS for token in tokens) * 2)
+    if any(phrase in lower for phrase in ("i feel", "i'm feeling", "ive been", "i've been", "yesterday", "recently")):
+        score += 2
+    if any(phrase in lower for phrase in ("my mood", "my sleep", "my therapist", "my meds", "my medication", "my partner", "my relationship", "my journal")):
+        score += 3
+    if len(tokens) >= 8:
+        score += 1
+    if any(token in tokens for token in {"bipolar", "therapy", "therapist", "meds", "medication", "anxiety", "depressed", "overwhelmed", "panic", "sleep", "relationship", "partner"}):
+        score += 2
+    return score
+
+
+def baseline_features(message):
+    # What _select_heartbeat_context_messages used to evaluate per message.
+    normalized = _normalize(message)
+    score = baseline_score(normalized)
+    is_current_events = baseline_is_current_events(normalized)
+    has_priority = any(token in HEARTBEAT_HIGH_PRIORITY_KEYWORDS for token in re.findall(r"[a-z']+", normalized.lower()))
+    is_low_value = baseline_is_low_value(normalized)
+    return score, is_current_events, has_priority, is_low_value
+
+
+def synthetic_messages(count, seed=7):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        words = rng.choices(VOCABULARY, k=rng.randint(1, 24))
+        if rng.random() < 0.05:
+            words.insert(0, "/start")
+        messages.append(" ".join(words))
+    return messages
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    messages = synthetic_messages(args.messages)
+    scorer = HeartbeatContextScorer()
+
+    for message in messages:
+        scored = scorer.score(message)
+        expected = baseline_features(message)
+        actual = (scored.score, scored.is_current_events, scored.has_high_priority, scored.is_low_value)
+        if actual != expected:
+            sys.exit(f"Mismatch for {message!r}: baseline={expected} compiled={actual}")
+
+    baseline = best_of(args.repeat, lambda: [baseline_features(message) for message in messages])
+    compiled = best_of(args.repeat, lambda: scorer.score_many(messages))
+
+    print(f"{len(messages)} messages, best of {args.repeat}")
+    print(f"  baseline helpers : {baseline * 1000:8.1f} ms  ({baseline / len(messages) * 1e6:6.2f} us/msg)")
+    print(f"  compiled scorer  : {compiled * 1000:8.1f} ms  ({compiled / len(messages) * 1e6:6.2f} us/msg)")
+    print(f"  speedup          : {baseline / compiled:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark keyword (ILIKE) vs full-text message search on synthetic tables.
+
+Builds a scratch copy of mindmate_messages (same columns, generated tsvector
+and indexes as the migrations), fills it with 10k / 100k / 1M synthetic rows
+server-side, and times both query shapes used by
+PostgresDatabase.semantic_search.
+
+Usage:
+    NEON_MINDMATE_DB_URL=postgresql://... python scripts/benchmark_message_search.py
+    python scripts/benchmark_message_search.py --sizes 10000 100000 --queries 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from postgres_db import SEARCH_HEADLINE_OPTIONS  # noqa: E402
+
+TABLE = "mindmate_search_bench"
+VOCABULARY = [
+    "anxious", "sleep", "work", "family", "church", "prayer", "walk", "gym", "tired", "grateful",
+    "deadline", "meeting", "friend", "coffee", "budget", "therapy", "medication", "journal", "rain",
+    "weekend", "project", "stress", "calm", "breathing", "doctor", "exam", "birthday", "travel",
+    "bitcoin", "music", "garden", "cooking", "headache", "focus", "morning", "evening", "lonely",
+]
+SEARCH_TERMS = ["sleep", "therapy deadline", "grateful family", "bitcoin", "calm breathing walk", "doctor"]
+
+KEYWORD_SQL = f"""
+    SELECT role, content, message_id, timestamp
+    FROM {TABLE}
+    WHERE user_id = %s AND conversation_id = %s AND content ILIKE %s
+    ORDER BY timestamp DESC
+    LIMIT %s
+"""
+FULLTEXT_SQL = f"""
+    WITH q AS (SELECT websearch_to_tsquery('english', %s) AS tsq),
+    top AS (
+        SELECT m.role, m.content, m.message_id, m.timestamp,
+               ts_rank_cd(m.content_tsv, q.tsq) AS rank
+        FROM {TABLE} m, q
+        WHERE m.user_id = %s AND m.conversation_id = %s AND m.content_tsv @@ q.tsq
+        ORDER BY rank DESC, m.timestamp DESC
+        LIMIT %s
+    )
+    SELECT top.role, top.content, top.message_id, top.timestamp, top.rank,
+           ts_headline('english', top.content, q.tsq, %s) AS snippet
+    FROM top, q
+    ORDER BY top.rank DESC, top.timestamp DESC
+"""
+
+
+def create_table(cursor):
+    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {TABLE} (
+            id SERIAL PRIMARY KEY,
+            user_id BIGINT NOT NULL,
+            conversation_id VARCHAR(200) NOT NULL,
+            role VARCHAR(20) NOT NULL,
+            content TEXT NOT NULL,
+            message_id VARCHAR(100),
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED
+        )
+    """)
+    cursor.execute(f"CREATE INDEX ON {TABLE}(user_id, conversation_id, timestamp DESC)")
+    cursor.execute(f"CREATE INDEX ON {TABLE} USING GIN (content_tsv)")
+
+
+def fill(cursor, rows, users):
+    cursor.execute(f"TRUNCATE {TABLE}")
+    # Twelve random vocabulary words per message, generated server-side.
+    cursor.execute(f"""
+        INSERT INTO {TABLE} (user_id, conversation_id, role, content, message_id, timestamp)
+        SELECT u, 'conversation:' || u,
+               CASE WHEN g %% 2 = 0 THEN 'user' ELSE 'assistant' END,
+               (SELECT string_agg(w[1 + floor(random() * array_length(w, 1))::int], ' ')
+                FROM generate_series(1, 12) AS s(i), (SELECT %s::text[] AS w) AS v
+                WHERE g > 0),
+               u || '_' || g,
+               now() - (g || ' seconds')::interval
+        FROM generate_series(1, %s) AS g, LATERAL (SELECT 1 + (g %% %s) AS u) AS owner
+    """, (VOCABULARY, rows, users))
+    cursor.execute(f"ANALYZE {TABLE}")
+
+
+def time_queries(cursor, sql, params_for, queries):
+    samples = []
+    for _ in range(queries):
+        params = params_for()
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(0.95 * (len(samples) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--users", type=int, default=50, help="distinct users the rows are spread over")
+    parser.add_argument("--queries", type=int, default=30, help="timed queries per mode and size")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch table afterwards")
+    args = parser.parse_args()
+
+    db_url = os.environ.get("NEON_MINDMATE_DB_URL") or os.environ.get("DATABASE_URL")
+    if not db_url:
+        raise SystemExit("Set NEON_MINDMATE_DB_URL or DATABASE_URL")
+
+    conn = psycopg2.connect(db_url)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    rng = random.Random(7)
+
+    def pick():
+        user_id = rng.randint(1, args.users)
+        return user_id, f"conversation:{user_id}", rng.choice(SEARCH_TERMS)
+
+    def keyword_params():
+        user_id, conversation_id, term = pick()
+        return user_id, conversation_id, f"%{term}%", 5
+
+    def fulltext_params():
+        user_id, conversation_id, term = pick()
+        return term, user_id, conversation_id, 5, SEARCH_HEADLINE_OPTIONS
+
+    try:
+        create_table(cursor)
+        print(f"{'rows':>10} {'keyword p50':>12} {'keyword p95':>12} {'fulltext p50':>13} {'fulltext p95':>13}  (ms)")
+        for size in args.sizes:
+            fill(cursor, size, args.users)
+            keyword = time_queries(cursor, KEYWORD_SQL, keyword_params, args.queries)
+            fulltext = time_queries(cursor, FULLTEXT_SQL, fulltext_params, args.queries)
+            print(f"{size:>10} {keyword[0]:>12.2f} {keyword[1]:>12.2f} {fulltext[0]:>13.2f} {fulltext[1]:>13.2f}")
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
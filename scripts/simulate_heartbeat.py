@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Dry-run a day of scheduled daily heartbeats against a synthetic population.
+
+Runs the leader's real path (HeartbeatScheduler firing
+deliver_daily_heartbeat_batch, with a simulated clock) against an in-memory
+store and a fake Telegram bot (nothing is sent), then prints per-stage
+timings, storage call counts and how long the window needs to be at the
+measured throughput.
+
+Usage:
+    python scripts/simulate_heartbeat.py
+    python scripts/simulate_heartbeat.py --users 2000 --history 30 --journal-density 0.3 --send-latency-ms 80
+    python scripts/simulate_heartbeat.py --users 500 --project-users 20000 --json
+    python scripts/simulate_heartbeat.py --users 1000 --timezones Europe/London America/New_York
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from heartbeat_simulation import PopulationSpec, run_heartbeat_simulation  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--history", type=int, default=20, help="stored messages per user")
+    parser.add_argument("--journal-density", type=float, default=0.5, help="share of users with a journal entry yesterday")
+    parser.add_argument("--opted-out", type=float, default=0.0, help="share of users who turned the heartbeat off")
+    parser.add_argument("--pending", type=float, default=0.0, help="share of users still waiting on yesterday's reply")
+    parser.add_argument("--timezones", nargs="+", default=(), help="spread users across these timezones")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--global-rate", type=float, default=None, help="messages/s across all chats (default: TELEGRAM_GLOBAL_SEND_RATE)")
+    parser.add_argument("--concurrency", type=int, default=None, help="default: HEARTBEAT_DELIVERY_CONCURRENCY")
+    parser.add_argument("--send-latency-ms", type=float, default=0.0, help="simulated Bot API round trip")
+    parser.add_argument("--store-latency-ms", type=float, default=0.0, help="simulated database round trip")
+    parser.add_argument("--warm-digests", action="store_true", help="build heartbeat digests before the timed run")
+    parser.add_argument("--project-users", type=int, default=None, help="also project the window for this many users")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    # bot.py logs every send at INFO; keep the report readable.
+    logging.getLogger("bot").setLevel(logging.WARNING)
+    spec = PopulationSpec(
+        users=args.users,
+        history_messages=args.history,
+        journal_density=args.journal_density,
+        opted_out_ratio=args.opted_out,
+        pending_ratio=args.pending,
+        timezones=tuple(args.timezones),
+        seed=args.seed,
+    )
+    report = asyncio.run(run_heartbeat_simulation(
+        spec,
+        global_rate=args.global_rate,
+        concurrency=args.concurrency,
+        send_latency_seconds=args.send_latency_ms / 1000,
+        store_latency_seconds=args.store_latency_ms / 1000,
+        warm_digests=args.warm_digests,
+    ))
+
+    if args.json:
+        print(json.dumps(report.as_dict(), indent=2))
+    else:
+        print(report.format(project_users=args.project_users))
+
+
+if __name__ == "__main__":
+    main()
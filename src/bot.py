@@ -5,31 +5,46 @@ A compassionate chatbot providing 24/7 mental wellness support.
 
 import asyncio
 import html
+import io
 import json
 import logging
 import os
 import re
 import tempfile
 import uuid
-from contextlib import asynccontextmanager
+from contextlib import aclosing, asynccontextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
 from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
-from openai import OpenAI, OpenAIError
+from fastapi.responses import JSONResponse
+from openai import OpenAIError
 from telegram import Update
 from telegram.error import TelegramError
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
 import uvicorn
 
 # Brave web search helper (optional, opt-in via explicit trigger)
-from web_search import build_web_attribution_line, search_web
+from web_search import build_web_attribution_line, close_web_search_client, search_web_async
 from verse_of_the_day import get_verse_of_the_day
+from llm_gateway import LLMGateway
+from streaming_reply import StreamingReply
+from voice_jobs import VoiceAdmission, VoiceJobPool
+from voice_pipeline import StageTimings, segment_for_speech, speak_segments
+from voice_transcription import ChunkedTranscriber, TranscriptCache
+from tts_cache import TTSCache, tts_cache_key
+from history_cache import ConversationWindowCache
+from memory_recall import HashingEmbedder, MemoryRecall, OpenAIEmbedder, format_recalled_moments
+from heartbeat_delivery import HeartbeatDeliveryEngine, TelegramRateLimiter
+from heartbeat_scheduler import HeartbeatScheduler, UserSchedule
+from heartbeat_context import HeartbeatContextScorer, ScoredMessage
+from heartbeat_digest import HeartbeatDigest, HeartbeatDigestStore
+from update_pipeline import KeyedScheduler, KeyedUpdateProcessor, UpdateIngestQueue
 
 # Import the active storage module: PostgreSQL with an in-memory fallback.
-from postgres_db import Message, PostgresDatabase
+from postgres_db import Message, PostgresDatabase, is_scheduled_checkin_done
 from postgres_db import InMemoryDatabase as PostgresInMemoryDatabase
 
 DB_AVAILABLE = "postgres"
@@ -77,14 +92,46 @@ load_dotenv(dotenv_path=PROJECT_ROOT / ".env", override=True)
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+LLM_MAX_CONCURRENCY = max(1, int(os.getenv("LLM_MAX_CONCURRENCY", "16")))
+LLM_MAX_CONNECTIONS = max(1, int(os.getenv("LLM_MAX_CONNECTIONS", "32")))
+LLM_TIMEOUT_SECONDS = max(5.0, float(os.getenv("LLM_TIMEOUT_SECONDS", "60")))
+STREAMING_REPLIES_ENABLED = os.getenv("STREAMING_REPLIES_ENABLED", "false").strip().lower() in {"1", "true", "yes", "on"}
+STREAMING_EDIT_INTERVAL_SECONDS = max(0.5, float(os.getenv("STREAMING_EDIT_INTERVAL_SECONDS", "1.0")))
+VOICE_TTS_SEGMENT_CHARS = max(100, int(os.getenv("VOICE_TTS_SEGMENT_CHARS", "600")))
+VOICE_JOB_WORKERS = max(1, int(os.getenv("VOICE_JOB_WORKERS", "4")))
+VOICE_JOB_QUEUE_SIZE = max(1, int(os.getenv("VOICE_JOB_QUEUE_SIZE", "50")))
+VOICE_JOB_PER_USER_LIMIT = max(1, int(os.getenv("VOICE_JOB_PER_USER_LIMIT", "2")))
+VOICE_JOB_LATENCY_BUDGET_SECONDS = max(0.0, float(os.getenv("VOICE_JOB_LATENCY_BUDGET_SECONDS", "45")))
+VOICE_CHUNK_THRESHOLD_SECONDS = max(10.0, float(os.getenv("VOICE_CHUNK_THRESHOLD_SECONDS", "90")))
+VOICE_CHUNK_SECONDS = max(10.0, float(os.getenv("VOICE_CHUNK_SECONDS", "60")))
+VOICE_TRANSCRIPT_CACHE_SIZE = max(1, int(os.getenv("VOICE_TRANSCRIPT_CACHE_SIZE", "500")))
+VOICE_TTS_CACHE_MEMORY_MB = max(0.0, float(os.getenv("VOICE_TTS_CACHE_MEMORY_MB", "32")))
+VOICE_TTS_CACHE_DIR = os.getenv("VOICE_TTS_CACHE_DIR", "").strip()
+VOICE_TTS_CACHE_DISK_MB = max(0.0, float(os.getenv("VOICE_TTS_CACHE_DISK_MB", "256")))
+VOICE_TTS_CACHE_ADMIT_AFTER = max(1, int(os.getenv("VOICE_TTS_CACHE_ADMIT_AFTER", "2")))
+VOICE_TTS_VOICE = "alloy"
+# Groups allow about 20 messages (edits included) per minute.
+GROUP_STREAMING_EDIT_INTERVAL_SECONDS = 3.0
 PORT = int(os.getenv("PORT", 10000))
 MAX_HISTORY_LENGTH = 10
+HISTORY_CACHE_MAX_USERS = max(1, int(os.getenv("HISTORY_CACHE_MAX_USERS", "1000")))
+MEMORY_RECALL_ENABLED = os.getenv("MEMORY_RECALL_ENABLED", "false").strip().lower() in {"1", "true", "yes", "on"}
+MEMORY_EMBEDDER = os.getenv("MEMORY_EMBEDDER", "hashing").strip().lower()
+MEMORY_RECALL_TOP_K = max(1, int(os.getenv("MEMORY_RECALL_TOP_K", "3")))
+MEMORY_RECALL_MIN_SCORE = float(os.getenv("MEMORY_RECALL_MIN_SCORE", "0.3"))
+MEMORY_MIN_CHARS = 20
 AUTO_WEB_SEARCH_ENABLED = os.getenv("AUTO_WEB_SEARCH_ENABLED", "false").strip().lower() in {"1", "true", "yes", "on"}
 DAILY_HEARTBEAT_ENABLED = os.getenv("DAILY_HEARTBEAT_ENABLED", "false").strip().lower() in {"1", "true", "yes", "on"}
 DAILY_HEARTBEAT_HOUR = int(os.getenv("DAILY_HEARTBEAT_HOUR", "7"))
 DAILY_HEARTBEAT_WINDOW_MINUTES = max(1, int(os.getenv("DAILY_HEARTBEAT_WINDOW_MINUTES", "15")))
+# Upper bound on how long the scheduler sleeps between fire times
 DAILY_HEARTBEAT_POLL_SECONDS = max(30, int(os.getenv("DAILY_HEARTBEAT_POLL_SECONDS", "60")))
+# Users are spread over this many minutes after their preferred hour to flatten send peaks
+DAILY_HEARTBEAT_SPREAD_MINUTES = max(0, int(os.getenv("DAILY_HEARTBEAT_SPREAD_MINUTES", "15")))
+# A claimed check-in that was never sent (instance died mid-send) can be re-claimed after this long
+DAILY_HEARTBEAT_CLAIM_LEASE_SECONDS = max(30, int(os.getenv("DAILY_HEARTBEAT_CLAIM_LEASE_SECONDS", "600")))
+HEARTBEAT_DELIVERY_CONCURRENCY = max(1, int(os.getenv("HEARTBEAT_DELIVERY_CONCURRENCY", "8")))
+TELEGRAM_GLOBAL_SEND_RATE = max(1.0, float(os.getenv("TELEGRAM_GLOBAL_SEND_RATE", "25")))
 DAILY_HEARTBEAT_TIMEZONE = os.getenv("DAILY_HEARTBEAT_TIMEZONE", "Africa/Johannesburg").strip() or "Africa/Johannesburg"
 DAILY_HEARTBEAT_CHAT_ID = os.getenv("DAILY_HEARTBEAT_CHAT_ID", "").strip()
 DAILY_HEARTBEAT_MESSAGE_THREAD_ID = os.getenv("DAILY_HEARTBEAT_MESSAGE_THREAD_ID", "").strip()
@@ -98,6 +145,12 @@ DAILY_HEARTBEAT_ALLOWED_USER_IDS = {
 # Set RENDER_EXTERNAL_URL in Render environment, or it will use polling as fallback
 RENDER_EXTERNAL_URL = os.getenv("RENDER_EXTERNAL_URL")  # e.g., https://mindmate-dev.onrender.com
 USE_WEBHOOK = bool(RENDER_EXTERNAL_URL)
+WEBHOOK_QUEUE_MAXSIZE = max(1, int(os.getenv("WEBHOOK_QUEUE_MAXSIZE", "1000")))
+WEBHOOK_WORKERS = max(1, int(os.getenv("WEBHOOK_WORKERS", "8")))
+WEBHOOK_DRAIN_TIMEOUT_SECONDS = max(0.0, float(os.getenv("WEBHOOK_DRAIN_TIMEOUT_SECONDS", "10")))
+# Handlers run in order per user (or per heartbeat chat) and in parallel across users
+UPDATE_MAX_CONCURRENCY = max(1, int(os.getenv("UPDATE_MAX_CONCURRENCY", "16")))
+UPDATE_MAX_PENDING = max(1, int(os.getenv("UPDATE_MAX_PENDING", "1000")))
 
 # =============================================================================
 # Personal Mode Configuration
@@ -378,6 +431,7 @@ def build_generation_system_prompt(
     response_mode: str = 'chat',
     current_time: str | None = None,
     web_results: str | None = None,
+    recalled_memories: str | None = None,
 ) -> str:
     """Build the layered system prompt for chat/voice generation."""
     identity_prompt = get_personal_mode_prompt(user_id) if personal_mode else SYSTEM_PROMPT
@@ -405,6 +459,13 @@ def build_generation_system_prompt(
             web_results,
         )
 
+    if recalled_memories:
+        prompt = build_identity_prompt(
+            prompt,
+            "## Relevant Past Moments\nThese earlier messages or journal entries from the user were retrieved because they look related to what they just said. Draw on them only when they genuinely help, and do not recite them back.",
+            recalled_memories,
+        )
+
     return prompt
 
 
@@ -484,8 +545,45 @@ db_manager: PostgresDatabase = None
 
 # In-memory fallback used only when PostgreSQL is unavailable at startup or runtime.
 conversation_history: dict[int, list[dict[str, str]]] = {}
+# Hot copy of each active user's last MAX_HISTORY_LENGTH turns stored in PostgreSQL.
+history_cache = ConversationWindowCache(max_users=HISTORY_CACHE_MAX_USERS, window=MAX_HISTORY_LENGTH)
+# Long-term recall of past messages/journal entries; built at startup when enabled.
+memory_recall: MemoryRecall | None = None
+# Concurrent, rate-limited fan-out for scheduled check-ins.
+heartbeat_delivery = HeartbeatDeliveryEngine(
+    max_concurrency=HEARTBEAT_DELIVERY_CONCURRENCY,
+    limiter=TelegramRateLimiter(TELEGRAM_GLOBAL_SEND_RATE),
+)
+# Per-user fire times for the daily heartbeat; created when the scheduler loop starts.
+heartbeat_scheduler: HeartbeatScheduler | None = None
+memory_capture_tasks: set[asyncio.Task] = set()
 user_model_selection: dict[int, str] = {}  # Track model per user for A/B testing
-openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+# One shared async gateway for chat, transcription and TTS calls.
+llm_gateway: LLMGateway | None = (
+    LLMGateway(
+        OPENAI_API_KEY,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        max_connections=LLM_MAX_CONNECTIONS,
+        timeout_seconds=LLM_TIMEOUT_SECONDS,
+    )
+    if OPENAI_API_KEY
+    else None
+)
+openai_client = llm_gateway.client if llm_gateway else None
+# Splits long voice notes into concurrently transcribed chunks and remembers transcripts per file.
+voice_transcriber = ChunkedTranscriber(
+    lambda audio, filename: transcribe_voice_bytes(audio, filename),
+    threshold_seconds=VOICE_CHUNK_THRESHOLD_SECONDS,
+    chunk_seconds=VOICE_CHUNK_SECONDS,
+    cache=TranscriptCache(max_entries=VOICE_TRANSCRIPT_CACHE_SIZE),
+)
+# Synthesized speech keyed by model, voice, format and text, so repeated phrases are never re-synthesized.
+tts_cache = TTSCache(
+    max_memory_bytes=int(VOICE_TTS_CACHE_MEMORY_MB * 1024 * 1024),
+    disk_dir=VOICE_TTS_CACHE_DIR or None,
+    max_disk_bytes=int(VOICE_TTS_CACHE_DISK_MB * 1024 * 1024),
+    admit_after=VOICE_TTS_CACHE_ADMIT_AFTER,
+)
 bot_running = False
 degraded_mode_notice_sent: set[int] = set()
 
@@ -681,6 +779,55 @@ async def set_daily_heartbeat_enabled_for_user(user_id: int, enabled: bool) -> N
         await db_manager.store_user_preference(user_id, "daily_heartbeat_enabled", enabled)
 
 
+async def get_daily_heartbeat_user_schedule(user_id: int) -> UserSchedule:
+    """Return the user's heartbeat timezone and hour, falling back to the server defaults."""
+    tz = get_daily_heartbeat_timezone()
+    hour = DAILY_HEARTBEAT_HOUR
+    if db_manager and hasattr(db_manager, "get_user_preference"):
+        timezone_name = await db_manager.get_user_preference(user_id, "daily_heartbeat_timezone")
+        if isinstance(timezone_name, str) and timezone_name:
+            try:
+                tz = ZoneInfo(timezone_name)
+            except Exception:
+                logger.warning("Ignoring invalid heartbeat timezone %s for user %s", timezone_name, user_id)
+        stored_hour = await db_manager.get_user_preference(user_id, "daily_heartbeat_hour")
+        if isinstance(stored_hour, int) and 0 <= stored_hour <= 23:
+            hour = stored_hour
+    return UserSchedule(timezone=tz, hour=hour)
+
+
+async def set_daily_heartbeat_schedule_for_user(
+    user_id: int,
+    *,
+    hour: int | None = None,
+    timezone_name: str | None = None,
+) -> UserSchedule:
+    """Persist a per-user heartbeat hour and/or timezone and move the user's next fire time."""
+    if db_manager and hasattr(db_manager, "store_user_preference"):
+        if hour is not None:
+            await db_manager.store_user_preference(user_id, "daily_heartbeat_hour", hour)
+        if timezone_name is not None:
+            await db_manager.store_user_preference(user_id, "daily_heartbeat_timezone", timezone_name)
+    if heartbeat_scheduler:
+        await heartbeat_scheduler.reschedule(user_id)
+    return await get_daily_heartbeat_user_schedule(user_id)
+
+
+async def pick_up_changed_heartbeat_schedules(scheduler: HeartbeatScheduler, since: datetime) -> int:
+    """Reschedule users whose hour or timezone changed since `since`, on whichever instance stored it."""
+    if not db_manager or not hasattr(db_manager, "get_user_ids_with_preferences_updated_since"):
+        return 0
+    changed = await db_manager.get_user_ids_with_preferences_updated_since(
+        ("daily_heartbeat_hour", "daily_heartbeat_timezone"), since
+    )
+    rescheduled = 0
+    for user_id in changed:
+        if user_id in scheduler:
+            await scheduler.reschedule(user_id)
+            rescheduled += 1
+    return rescheduled
+
+
 def can_force_test_daily_heartbeat(user_id: int) -> bool:
     """Return True when this user may manually trigger a live heartbeat test."""
     return DAILY_HEARTBEAT_ENABLED and user_id in PERSONAL_MODE_USERS and (
@@ -688,171 +835,140 @@ def can_force_test_daily_heartbeat(user_id: int) -> bool:
     )
 
 
-async def get_daily_heartbeat_last_sent_date(user_id: int) -> str | None:
-    """Return the last local-date string this user received a scheduled check-in."""
-    if not db_manager or not hasattr(db_manager, "get_user_preference"):
-        return None
-    value = await db_manager.get_user_preference(user_id, "daily_heartbeat_last_sent_date")
-    return value if isinstance(value, str) else None
-
-
-async def mark_daily_heartbeat_sent(user_id: int, local_date: str) -> None:
-    """Persist the local date when the scheduled check-in was sent."""
-    if db_manager and hasattr(db_manager, "store_user_preference"):
-        await db_manager.store_user_preference(user_id, "daily_heartbeat_last_sent_date", local_date)
-
-
-async def get_daily_heartbeat_candidate_user_ids() -> list[int]:
-    """Return eligible known users unless they have explicitly opted out."""
-    if not DAILY_HEARTBEAT_ENABLED or not db_manager or not hasattr(db_manager, "get_known_user_ids"):
-        return []
-
-    candidate_user_ids = await db_manager.get_known_user_ids()
-    eligible_user_ids: list[int] = []
-    for user_id in candidate_user_ids:
-        if await is_daily_heartbeat_enabled_for_user(user_id):
-            eligible_user_ids.append(user_id)
-    return eligible_user_ids
+async def was_daily_heartbeat_sent(user_id: int, local_date: str) -> bool:
+    """Return True when the scheduler already delivered this user's check-in for `local_date`."""
+    if not db_manager or not hasattr(db_manager, "get_daily_checkin"):
+        return False
+    return is_scheduled_checkin_done(await db_manager.get_daily_checkin(user_id, local_date))
 
 
-HEARTBEAT_SUPPORT_KEYWORDS = {
-    "anxious", "anxiety", "burnout", "calm", "coping", "crash", "crying", "depressed", "depression",
-    "drained", "emotion", "emotional", "energy", "episode", "exhausted", "family", "fatigue",
-    "feel", "feeling", "feelings", "friend", "grief", "journal", "lonely", "manic", "medication",
-    "medicine", "meds", "mood", "overwhelmed", "panic", "partner", "relationship", "rest", "sad",
-    "sleep", "stressed", "stress", "support", "therapy", "therapist", "tired", "trigger", "work"
-}
-HEARTBEAT_HIGH_PRIORITY_KEYWORDS = {
-    "journal", "journaling", "mood", "stress", "stressed", "sleep", "tired", "rest", "overwhelmed",
-    "anxious", "anxiety", "panic", "depressed", "depression", "manic", "episode", "therapy",
-    "therapist", "meds", "medication", "medicine", "relationship", "partner", "family", "friend",
-    "lonely", "grief", "crying", "support", "coping", "trigger"
-}
-HEARTBEAT_CURRENT_EVENTS_PATTERNS = (
-    re.compile(r"\b(?:news|current events?|headlines?|latest|update|updates|happening|happened)\b", re.IGNORECASE),
-    re.compile(r"\bwhat(?:'s| is)?\s+(?:exactly\s+)?(?:happening|going on|the update)\b", re.IGNORECASE),
-    re.compile(r"\b(?:there|in [a-z][a-z\s'-]{1,40})\s+(?:lately|right now|today|this week)\b", re.IGNORECASE),
-)
-HEARTBEAT_LOW_VALUE_PATTERNS = (
-    re.compile(r"^/[a-z0-9_]+(?:\s|$)", re.IGNORECASE),
-    re.compile(r"^(?:search|browse|look up|lookup|google|find)(?:\s+the)?\s+web\b", re.IGNORECASE),
-    re.compile(r"^(?:search|browse|look up|lookup|google|find)\b", re.IGNORECASE),
-    re.compile(r"\b(?:search|look up|lookup|google|find)\b.{0,30}\b(?:price|weather|news|score|stock|bitcoin|btc|crypto)\b", re.IGNORECASE),
-    re.compile(r"\b(?:bitcoin|btc|crypto|stock|forex|weather|news|score)s?\b", re.IGNORECASE),
-    re.compile(r"https?://", re.IGNORECASE),
-)
-HEARTBEAT_COMMAND_TERMS = {
-    "search", "browse", "google", "lookup", "look", "find", "price", "prices", "weather", "news", "score", "scores",
-    "bitcoin", "btc", "crypto", "stock", "stocks", "forex", "translate", "summarize", "web"
-}
+async def flush_daily_checkin_tracking() -> None:
+    """Write the check-in transitions a heartbeat cycle deferred, in one batch."""
+    if not db_manager or not hasattr(db_manager, "flush_daily_checkins"):
+        return
+    try:
+        await db_manager.flush_daily_checkins()
+    except Exception as e:
+        # The store keeps the rows and retries them with its next flush or check-in read.
+        logger.warning("Failed to flush daily check-in tracking: %s", e)
 
 
-def _normalize_heartbeat_context_text(value: str) -> str:
-    return " ".join((value or "").split()).strip()
+async def claim_daily_heartbeat(user_id: int, local_date: str) -> bool:
+    """Atomically claim today's scheduled send so no other instance delivers it too."""
+    if not db_manager or not hasattr(db_manager, "claim_daily_checkin"):
+        return True
+    return await db_manager.claim_daily_checkin(
+        user_id,
+        local_date,
+        INSTANCE_ID,
+        lease_seconds=DAILY_HEARTBEAT_CLAIM_LEASE_SECONDS,
+    )
 
 
-def _is_current_events_heartbeat_message(message: str) -> bool:
-    normalized = _normalize_heartbeat_context_text(message)
-    if not normalized:
+async def acquire_daily_heartbeat_leadership() -> bool:
+    """Return True while this instance should run the heartbeat scheduler."""
+    if not db_manager or not hasattr(db_manager, "try_acquire_heartbeat_leadership"):
+        return True
+    try:
+        return await db_manager.try_acquire_heartbeat_leadership()
+    except Exception as e:
+        logger.warning("[%s] Could not check daily heartbeat leadership: %s", INSTANCE_ID, e)
         return False
 
-    lower = normalized.lower()
-    if any(pattern.search(lower) for pattern in HEARTBEAT_CURRENT_EVENTS_PATTERNS):
-        return True
 
-    tokens = set(re.findall(r"[a-z']+", lower))
-    return bool({"news", "headline", "headlines", "update", "updates", "latest", "happening", "happened"} & tokens)
+def get_daily_heartbeat_rollout_user_ids() -> list[int]:
+    """Users the heartbeat rollout covers before any stored preference is checked."""
+    return sorted(
+        user_id
+        for user_id in PERSONAL_MODE_USERS
+        if not DAILY_HEARTBEAT_ALLOWED_USER_IDS or user_id in DAILY_HEARTBEAT_ALLOWED_USER_IDS
+    )
 
 
+async def get_daily_heartbeat_due_user_ids(local_date: str) -> list[int]:
+    """Eligible users who have not been sent today's check-in and are not awaiting a reply."""
+    if not DAILY_HEARTBEAT_ENABLED or not db_manager:
+        return []
+    if hasattr(db_manager, "get_daily_heartbeat_due_user_ids"):
+        due_user_ids = await db_manager.get_daily_heartbeat_due_user_ids(local_date, get_daily_heartbeat_rollout_user_ids())
+        # Tracking that failed to persist still lives in memory; respect it too.
+        return [
+            user_id for user_id in due_user_ids
+            if not (daily_summary_tracking.get(user_id) or {}).get("waiting_for_summary")
+        ]
 
-def _is_low_value_heartbeat_message(message: str) -> bool:
-    normalized = _normalize_heartbeat_context_text(message)
-    if not normalized:
-        return True
-    lower = normalized.lower()
-    if len(lower) < 8:
-        return True
-    if any(pattern.search(lower) for pattern in HEARTBEAT_LOW_VALUE_PATTERNS):
-        return True
-    tokens = re.findall(r"[a-z']+", lower)
-    if tokens and len(tokens) <= 6 and sum(token in HEARTBEAT_COMMAND_TERMS for token in tokens) >= max(2, len(tokens) // 2):
-        return True
-    return False
+    due_user_ids: list[int] = []
+    for user_id in await get_daily_heartbeat_candidate_user_ids():
+        pending_tracking = await get_latest_pending_daily_summary_tracking(user_id)
+        if pending_tracking and pending_tracking.get("waiting_for_summary"):
+            continue
+        if await was_daily_heartbeat_sent(user_id, local_date):
+            continue
+        due_user_ids.append(user_id)
+    return due_user_ids
 
 
+async def get_daily_heartbeat_candidate_user_ids() -> list[int]:
+    """Return eligible known users unless they have explicitly opted out."""
+    if not DAILY_HEARTBEAT_ENABLED or not db_manager or not hasattr(db_manager, "get_known_user_ids"):
+        return []
 
-def _score_heartbeat_context_message(message: str) -> int:
-    normalized = _normalize_heartbeat_context_text(message)
-    if not normalized:
-        return -100
+    candidate_user_ids = await db_manager.get_known_user_ids()
+    eligible_user_ids: list[int] = []
+    for user_id in candidate_user_ids:
+        if await is_daily_heartbeat_enabled_for_user(user_id):
+            eligible_user_ids.append(user_id)
+    return eligible_user_ids
 
-    lower = normalized.lower()
-    tokens = set(re.findall(r"[a-z']+", lower))
-    score = 0
 
-    if _is_low_value_heartbeat_message(normalized):
-        score -= 6
+heartbeat_context_scorer = HeartbeatContextScorer()
 
-    if _is_current_events_heartbeat_message(normalized):
-        score -= 8
 
-    support_hits = sum(token in HEARTBEAT_SUPPORT_KEYWORDS for token in tokens)
-    score += min(6, support_hits * 2)
+def _heartbeat_topics(text: str) -> frozenset:
+    """Topic flags that drive the heartbeat's plan suggestions and verse reflection."""
+    return heartbeat_context_scorer.topics(text)
 
-    priority_hits = sum(token in HEARTBEAT_HIGH_PRIORITY_KEYWORDS for token in tokens)
-    score += min(8, priority_hits * 2)
 
-    if any(phrase in lower for phrase in ("i feel", "i'm feeling", "ive been", "i've been", "yesterday", "recently")):
-        score += 2
-    if any(phrase in lower for phrase in ("my mood", "my sleep", "my therapist", "my meds", "my medication", "my partner", "my relationship", "my journal")):
-        score += 3
-    if len(tokens) >= 8:
-        score += 1
-    if any(token in tokens for token in {"bipolar", "therapy", "therapist", "meds", "medication", "anxiety", "depressed", "overwhelmed", "panic", "sleep", "relationship", "partner"}):
-        score += 2
+def _score_heartbeat_context_features(message: str) -> ScoredMessage | None:
+    """Score one message for heartbeat context; None for blank messages."""
+    return heartbeat_context_scorer.score(message)
 
-    return score
 
+def _select_heartbeat_context_messages(messages: list[str], limit: int = 3) -> list[str]:
+    return [item.text for item in _select_heartbeat_context_features(heartbeat_context_scorer.score_many(messages), limit)]
 
 
-def _select_heartbeat_context_messages(messages: list[str], limit: int = 3) -> list[str]:
-    support_candidates: list[tuple[int, int, str]] = []
-    general_candidates: list[tuple[int, int, str]] = []
-    fallback_messages: list[str] = []
-    current_event_fallback_messages: list[str] = []
-
-    for index, raw_message in enumerate(messages):
-        normalized = _normalize_heartbeat_context_text(raw_message)
-        if not normalized:
-            continue
+def _select_heartbeat_context_features(messages: list[ScoredMessage], limit: int = 3) -> list[ScoredMessage]:
+    support_candidates: list[tuple[int, int, ScoredMessage]] = []
+    general_candidates: list[tuple[int, int, ScoredMessage]] = []
+    fallback_messages: list[ScoredMessage] = []
+    current_event_fallback_messages: list[ScoredMessage] = []
 
-        score = _score_heartbeat_context_message(normalized)
-        is_current_events = _is_current_events_heartbeat_message(normalized)
-        has_high_priority_support = any(
-            token in HEARTBEAT_HIGH_PRIORITY_KEYWORDS for token in re.findall(r"[a-z']+", normalized.lower())
-        )
+    for index, item in enumerate(messages):
+        score = item.score
+        is_current_events = item.is_current_events
 
         if score > 0:
-            if has_high_priority_support and not is_current_events:
-                support_candidates.append((score, index, normalized))
+            if item.has_high_priority and not is_current_events:
+                support_candidates.append((score, index, item))
             elif not is_current_events:
-                general_candidates.append((score, index, normalized))
+                general_candidates.append((score, index, item))
             else:
-                current_event_fallback_messages.append(normalized)
-        elif not _is_low_value_heartbeat_message(normalized):
+                current_event_fallback_messages.append(item)
+        elif not item.is_low_value:
             if is_current_events:
-                current_event_fallback_messages.append(normalized)
+                current_event_fallback_messages.append(item)
             else:
-                fallback_messages.append(normalized)
+                fallback_messages.append(item)
 
-    def _dedupe_ranked(items: list[tuple[int, int, str]]) -> list[str]:
+    def _dedupe_ranked(items: list[tuple[int, int, ScoredMessage]]) -> list[ScoredMessage]:
         ranked = sorted(items, key=lambda item: (item[0], item[1]), reverse=True)
-        selected: list[str] = []
+        selected: list[ScoredMessage] = []
         seen: set[str] = set()
         for _, _, message in ranked:
-            if message in seen:
+            if message.text in seen:
                 continue
-            seen.add(message)
+            seen.add(message.text)
             selected.append(message)
             if len(selected) >= limit:
                 break
@@ -864,12 +980,12 @@ def _select_heartbeat_context_messages(messages: list[str], limit: int = 3) -> l
     if general_candidates:
         return _dedupe_ranked(general_candidates)
 
-    deduped_fallback: list[str] = []
+    deduped_fallback: list[ScoredMessage] = []
     seen_fallback: set[str] = set()
     for message in reversed(fallback_messages):
-        if message in seen_fallback:
+        if message.text in seen_fallback:
             continue
-        seen_fallback.add(message)
+        seen_fallback.add(message.text)
         deduped_fallback.append(message)
         if len(deduped_fallback) >= limit:
             break
@@ -877,12 +993,12 @@ def _select_heartbeat_context_messages(messages: list[str], limit: int = 3) -> l
     if deduped_fallback:
         return deduped_fallback
 
-    deduped_current_events: list[str] = []
+    deduped_current_events: list[ScoredMessage] = []
     seen_current_events: set[str] = set()
     for message in reversed(current_event_fallback_messages):
-        if message in seen_current_events:
+        if message.text in seen_current_events:
             continue
-        seen_current_events.add(message)
+        seen_current_events.add(message.text)
         deduped_current_events.append(message)
         if len(deduped_current_events) >= limit:
             break
@@ -893,57 +1009,86 @@ def _select_heartbeat_context_messages(messages: list[str], limit: int = 3) -> l
     return []
 
 
-async def build_daily_heartbeat_message(user_id: int, now: datetime | None = None, verse = None) -> str:
+# Scored recent messages and journal lines per user, maintained as they are stored.
+heartbeat_digests = HeartbeatDigestStore(
+    _score_heartbeat_context_features,
+    _heartbeat_topics,
+    window=MAX_HISTORY_LENGTH,
+    max_users=HISTORY_CACHE_MAX_USERS,
+)
+
+
+async def get_heartbeat_digest(user_id: int, yesterday: str) -> HeartbeatDigest:
+    """Return the user's heartbeat digest, rebuilding it from storage on a miss."""
+    digest = heartbeat_digests.get(user_id)
+    if digest is not None:
+        return digest
+    version = heartbeat_digests.version(user_id)
+    history = await get_history(user_id)
+    today = (datetime.strptime(yesterday, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    journal = {
+        local_date: [entry.get("entry") or "" for entry in await get_journal_entries_for_date(user_id, local_date)]
+        for local_date in (yesterday, today)
+    }
+    digest = heartbeat_digests.build(history, journal, journal_complete_from=yesterday)
+    heartbeat_digests.put(user_id, digest, version)
+    return digest
+
+
+async def build_daily_heartbeat_message(
+    user_id: int,
+    now: datetime | None = None,
+    verse = None,
+    tz: ZoneInfo | None = None,
+) -> str:
     """Build a lightweight morning companion briefing from recent context."""
-    tz = get_daily_heartbeat_timezone()
+    tz = tz or get_daily_heartbeat_timezone()
     local_now = now.astimezone(tz) if now else datetime.now(tz)
     yesterday = (local_now - timedelta(days=1)).strftime("%Y-%m-%d")
-    recent_history = await get_history(user_id)
-    journal_entries = await get_journal_entries_for_date(user_id, yesterday)
+    digest = await get_heartbeat_digest(user_id, yesterday)
+    journal_entries = heartbeat_digests.journal_for(digest, yesterday)
+    if journal_entries is None:
+        journal_entries = [
+            heartbeat_digests.journal_entry(entry.get("entry") or "")
+            for entry in await get_journal_entries_for_date(user_id, yesterday)
+        ]
     journey = await ensure_user_journey_loaded(user_id)
 
     intro = "🌤️ Morning. Tiny check-in before the day runs away with you."
 
     yesterday_line = None
     if journal_entries:
-        latest_entry = (journal_entries[-1].get("entry") or "").strip()
+        latest_entry = journal_entries[-1].text.strip()
         if latest_entry:
             compact_entry = " ".join(latest_entry.split())
             if len(compact_entry) > 180:
                 compact_entry = compact_entry[:177].rstrip() + "..."
             yesterday_line = f"🪞 From yesterday: \"{compact_entry}\""
 
-    recent_user_messages = [
-        (item.get("content") or "").strip()
-        for item in recent_history
-        if item.get("role") == "user" and (item.get("content") or "").strip()
-    ]
-    relevant_user_messages = _select_heartbeat_context_messages(recent_user_messages, limit=3)
+    relevant_user_messages = _select_heartbeat_context_features(digest.messages(), limit=3)
 
     if not yesterday_line and relevant_user_messages:
-        last_user_message = relevant_user_messages[0]
+        last_user_message = relevant_user_messages[0].text
         if len(last_user_message) > 180:
             last_user_message = last_user_message[:177].rstrip() + "..."
         yesterday_line = f"🪞 Lately it's sounded like: \"{last_user_message}\""
 
     plan_suggestions: list[str] = []
-    combined_context = " ".join(
-        [
-            " ".join((entry.get("entry") or "") for entry in journal_entries),
-            " ".join(relevant_user_messages),
-            " ".join(str(value) for value in journey.values() if isinstance(value, str)),
-        ]
-    ).lower()
+    topics = frozenset().union(
+        *(entry.topics for entry in journal_entries),
+        *(message.topics for message in relevant_user_messages),
+        *(_heartbeat_topics(value) for value in journey.values() if isinstance(value, str)),
+    )
 
-    if any(token in combined_context for token in ["tired", "sleep", "exhausted", "rest"]):
+    if "energy" in topics:
         plan_suggestions.append("protect your energy early today and keep your first task light")
-    if any(token in combined_context for token in ["anxious", "stress", "overwhelmed", "panic"]):
+    if "stress" in topics:
         plan_suggestions.append("keep today small: one clear priority, slower breathing, fewer tabs open")
-    if any(token in combined_context for token in ["work", "job", "career", "boss", "deadline"]):
+    if "work" in topics:
         plan_suggestions.append("pick the single work task that would make today feel less heavy")
-    if any(token in combined_context for token in ["medication", "medicine", "meds", "dose"]):
+    if "meds" in topics:
         plan_suggestions.append("stay steady with the basics that support you, including your normal meds routine if that's part of your day")
-    if any(token in combined_context for token in ["relationship", "partner", "friend", "family", "mom", "dad"]):
+    if "people" in topics:
         plan_suggestions.append("aim for one calm, honest check-in instead of carrying everything silently")
 
     if not plan_suggestions:
@@ -960,11 +1105,11 @@ async def build_daily_heartbeat_message(user_id: int, now: datetime | None = Non
         verse_text_lower = (verse.text or "").lower()
         if any(token in verse_text_lower for token in ["trust", "strength", "victory", "help", "fear", "peace", "rest"]):
             verse_themes.append("today doesn't have to be carried by pressure alone")
-        if any(token in combined_context for token in ["stress", "overwhelmed", "anxious", "panic"]):
+        if "stress" in topics:
             verse_themes.append("it fits the way your mind has been carrying a lot lately")
-        if any(token in combined_context for token in ["family", "relationship", "partner", "friend"]):
+        if "close_relationships" in topics:
             verse_themes.append("it also lands in the middle of the relationship weight you've been holding")
-        if any(token in combined_context for token in ["work", "job", "career"]):
+        if "career" in topics:
             verse_themes.append("it speaks into the pressure to force outcomes by yourself")
         if not verse_themes:
             verse_themes.append("it feels like a quiet reminder that you don't have to grip the whole day so tightly")
@@ -983,8 +1128,55 @@ async def build_daily_heartbeat_message(user_id: int, now: datetime | None = Non
     return "\n\n".join(lines)
 
 
+async def deliver_daily_heartbeat(user_id: int, local_date: str, tz: ZoneInfo | None = None) -> bool:
+    """Send one user's check-in for `local_date`; True when sent, False when skipped."""
+    if not await claim_daily_heartbeat(user_id, local_date):
+        logger.info("Daily heartbeat for user %s on %s already claimed elsewhere", user_id, local_date)
+        return False
+    await run_in_ordering_lane(
+        heartbeat_ordering_key(user_id),
+        send_scheduled_daily_summary(user_id, local_date=local_date, tz=tz, defer_tracking=True),
+    )
+    pending_tracking = await get_latest_pending_daily_summary_tracking(user_id)
+    if pending_tracking and pending_tracking.get("waiting_for_summary"):
+        return True
+    tracking = daily_summary_tracking.get(user_id) or {}
+    if tracking.get("status") == "failed":
+        raise RuntimeError((tracking.get("metadata") or {}).get("error") or "send failed")
+    return False
+
+
+async def deliver_daily_heartbeat_batch(local_date: str, timezones: dict[int, ZoneInfo]) -> list[int]:
+    """Deliver check-ins to the users in `timezones` that are still due for `local_date`.
+
+    Each user's timezone comes from the scheduler, which resolved it when it
+    scheduled them, so a batch does no per-user preference reads. Returns the
+    users that are done for the day (sent, or not due); failed sends are left
+    out so the scheduler retries them, and an exception means retry everyone.
+    """
+    if not DAILY_HEARTBEAT_ENABLED or not telegram_app or not telegram_app.bot:
+        return list(timezones)
+    due = set(await get_daily_heartbeat_due_user_ids(local_date))
+    targets = [user_id for user_id in timezones if user_id in due]
+    if not targets:
+        return list(timezones)
+    try:
+        report = await heartbeat_delivery.run(
+            targets, lambda user_id: deliver_daily_heartbeat(user_id, local_date, timezones[user_id])
+        )
+    finally:
+        await flush_daily_checkin_tracking()
+    logger.info("Daily heartbeat batch for %s: %s", local_date, report.as_dict())
+    failed = set(report.failed_user_ids)
+    return [user_id for user_id in timezones if user_id not in failed]
+
+
 async def run_daily_heartbeat_cycle(now: datetime | None = None) -> int:
-    """Send one scheduled daily check-in per eligible user per local day."""
+    """Send one scheduled daily check-in per eligible user inside the server-wide window.
+
+    The leader does not use this; it runs `HeartbeatScheduler`, which fires
+    `deliver_daily_heartbeat_batch` at each user's own hour.
+    """
     if not DAILY_HEARTBEAT_ENABLED or not telegram_app or not telegram_app.bot:
         return 0
 
@@ -993,40 +1185,76 @@ async def run_daily_heartbeat_cycle(now: datetime | None = None) -> int:
     if local_now.hour != DAILY_HEARTBEAT_HOUR or local_now.minute >= DAILY_HEARTBEAT_WINDOW_MINUTES:
         return 0
 
-    sent_count = 0
     local_date = local_now.strftime("%Y-%m-%d")
-    for user_id in await get_daily_heartbeat_candidate_user_ids():
-        pending_tracking = await get_latest_pending_daily_summary_tracking(user_id)
-        if pending_tracking and pending_tracking.get("waiting_for_summary"):
-            continue
-        if await get_daily_heartbeat_last_sent_date(user_id) == local_date:
-            continue
+    due_user_ids = await get_daily_heartbeat_due_user_ids(local_date)
+    if not due_user_ids:
+        return 0
+    try:
+        report = await heartbeat_delivery.run(due_user_ids, lambda user_id: deliver_daily_heartbeat(user_id, local_date, tz))
+    finally:
+        await flush_daily_checkin_tracking()
+    logger.info("Daily heartbeat cycle for %s: %s", local_date, report.as_dict())
+    return report.sent
+
+
+async def run_daily_heartbeat_scheduler_while_leader() -> None:
+    """Run the per-user scheduler until this instance loses heartbeat leadership."""
+    global heartbeat_scheduler
+    heartbeat_scheduler = HeartbeatScheduler(
+        resolve_schedule=get_daily_heartbeat_user_schedule,
+        fire=deliver_daily_heartbeat_batch,
+        spread_minutes=DAILY_HEARTBEAT_SPREAD_MINUTES,
+        window_minutes=DAILY_HEARTBEAT_WINDOW_MINUTES,
+        retry_seconds=DAILY_HEARTBEAT_POLL_SECONDS,
+        max_sleep_seconds=DAILY_HEARTBEAT_POLL_SECONDS,
+    )
+    scheduler_task = asyncio.create_task(
+        heartbeat_scheduler.run(get_daily_heartbeat_rollout_user_ids()),
+        name="mindmate-heartbeat-scheduler",
+    )
+    # `/schedule` on another instance only writes preferences; pick those changes up here.
+    schedules_checked_at = datetime.now()
+    try:
+        while not scheduler_task.done():
+            await asyncio.wait({scheduler_task}, timeout=DAILY_HEARTBEAT_POLL_SECONDS)
+            if not scheduler_task.done() and not await acquire_daily_heartbeat_leadership():
+                logger.warning("[%s] Lost daily heartbeat leadership; stopping scheduler", INSTANCE_ID)
+                break
+            checked_at = datetime.now()
+            try:
+                # Overlap the previous check so a write committed just before it isn't missed.
+                since = schedules_checked_at - timedelta(seconds=DAILY_HEARTBEAT_POLL_SECONDS)
+                await pick_up_changed_heartbeat_schedules(heartbeat_scheduler, since)
+                schedules_checked_at = checked_at
+            except Exception as e:
+                logger.warning("[%s] Could not pick up changed heartbeat schedules: %s", INSTANCE_ID, e)
+        if scheduler_task.done():
+            scheduler_task.result()
+    finally:
+        scheduler_task.cancel()
         try:
-            await send_scheduled_daily_summary(user_id)
-            pending_tracking = await get_latest_pending_daily_summary_tracking(user_id)
-            if pending_tracking and pending_tracking.get("waiting_for_summary"):
-                await mark_daily_heartbeat_sent(user_id, local_date)
-                sent_count += 1
-        except Exception as e:
-            logger.error("Daily heartbeat send failed for user %s: %s", user_id, e)
-    return sent_count
+            await scheduler_task
+        except asyncio.CancelledError:
+            pass
+        heartbeat_scheduler = None
 
 
 async def daily_heartbeat_scheduler_loop() -> None:
-    """Background scheduler for the once-daily MindMate heartbeat MVP."""
+    """Elect one heartbeat leader across instances and fire each user at their own local hour."""
     logger.info(
-        "Daily heartbeat scheduler active: enabled=%s hour=%s tz=%s window=%sm allowlist=%s",
+        "Daily heartbeat scheduler active: enabled=%s default_hour=%s default_tz=%s window=%sm spread=%sm allowlist=%s",
         DAILY_HEARTBEAT_ENABLED,
         DAILY_HEARTBEAT_HOUR,
         DAILY_HEARTBEAT_TIMEZONE,
         DAILY_HEARTBEAT_WINDOW_MINUTES,
+        DAILY_HEARTBEAT_SPREAD_MINUTES,
         sorted(DAILY_HEARTBEAT_ALLOWED_USER_IDS) if DAILY_HEARTBEAT_ALLOWED_USER_IDS else "all-opted-in-users",
     )
     while True:
         try:
-            sent_count = await run_daily_heartbeat_cycle()
-            if sent_count:
-                logger.info("Daily heartbeat scheduler sent %s check-in(s)", sent_count)
+            if await acquire_daily_heartbeat_leadership():
+                logger.info("[%s] Leading the daily heartbeat scheduler", INSTANCE_ID)
+                await run_daily_heartbeat_scheduler_while_leader()
         except asyncio.CancelledError:
             raise
         except Exception as e:
@@ -1042,11 +1270,54 @@ async def daily_heartbeat_scheduler_loop() -> None:
 telegram_app: Application = None
 daily_heartbeat_task: asyncio.Task | None = None
 telegram_startup_status: str = "disabled"
+update_ingest_queue: UpdateIngestQueue | None = None
+update_scheduler: KeyedScheduler | None = None
+voice_job_pool: VoiceJobPool | None = None
+
+
+def update_ordering_key(update: object) -> tuple:
+    """Key whose updates must be handled one at a time, in arrival order."""
+    chat = getattr(update, "effective_chat", None)
+    user = getattr(update, "effective_user", None)
+    if chat is not None and DAILY_HEARTBEAT_CHAT_ID and str(chat.id) == DAILY_HEARTBEAT_CHAT_ID:
+        return ("chat", chat.id)
+    if user is not None:
+        return ("user", user.id)
+    if chat is not None:
+        return ("chat", chat.id)
+    return ("update", getattr(update, "update_id", id(update)))
+
+
+def heartbeat_ordering_key(user_id: int) -> tuple:
+    """Ordering key a reply to this user's heartbeat would be handled under."""
+    if DAILY_HEARTBEAT_CHAT_ID:
+        try:
+            return ("chat", int(DAILY_HEARTBEAT_CHAT_ID))
+        except ValueError:
+            return ("chat", DAILY_HEARTBEAT_CHAT_ID)
+    return ("user", user_id)
+
+
+async def run_in_ordering_lane(key: tuple, job):
+    """Run `job` behind any updates already queued for `key`."""
+    if update_scheduler is None:
+        return await job
+    return await update_scheduler.run(key, job)
+
+
+async def process_queued_update(update: Update) -> None:
+    """Hand one queued webhook update to the Telegram application."""
+    if telegram_app is None:
+        logger.warning("Dropping queued update %s: Telegram app is not running", update.update_id)
+        return
+    await telegram_app.update_processor.process_update(update, telegram_app.process_update(update))
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events for FastAPI."""
-    global telegram_app, db_manager, daily_heartbeat_task, telegram_startup_status
+    global telegram_app, db_manager, daily_heartbeat_task, telegram_startup_status, update_ingest_queue, update_scheduler
+    global memory_recall, voice_job_pool
     
     # Startup: Initialize PostgreSQL database first
     logger.info(f"[{INSTANCE_ID}] Initializing PostgreSQL database...")
@@ -1062,6 +1333,10 @@ async def lifespan(app: FastAPI):
         logger.info(f"[{INSTANCE_ID}] 🔄 Will use in-memory fallback storage")
         db_manager = PostgresInMemoryDatabase()
         await db_manager.connect()
+
+    memory_recall = build_memory_recall(db_manager)
+    if memory_recall:
+        logger.info(f"[{INSTANCE_ID}] ✅ Memory recall enabled with {memory_recall.embedder.model}")
     
     # Initialize and start the Telegram bot
     logger.info(f"[{INSTANCE_ID}] Starting MindMate Bot...")
@@ -1071,7 +1346,13 @@ async def lifespan(app: FastAPI):
         telegram_startup_status = "disabled-missing-token"
     else:
         telegram_startup_status = "starting"
-        telegram_runtime = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+        update_scheduler = KeyedScheduler(max_concurrency=UPDATE_MAX_CONCURRENCY, max_pending=UPDATE_MAX_PENDING)
+        telegram_runtime = (
+            Application.builder()
+            .token(TELEGRAM_BOT_TOKEN)
+            .concurrent_updates(KeyedUpdateProcessor(update_scheduler, update_ordering_key))
+            .build()
+        )
 
         # Set bot commands menu for better UX
         from telegram import BotCommand
@@ -1120,6 +1401,22 @@ async def lifespan(app: FastAPI):
         if telegram_started:
             telegram_app = telegram_runtime
             telegram_startup_status = "running"
+            voice_job_pool = VoiceJobPool(
+                workers=VOICE_JOB_WORKERS,
+                max_queue=VOICE_JOB_QUEUE_SIZE,
+                per_user_limit=VOICE_JOB_PER_USER_LIMIT,
+                latency_budget_seconds=VOICE_JOB_LATENCY_BUDGET_SECONDS,
+            )
+            await voice_job_pool.start()
+            logger.info(f"[{INSTANCE_ID}] ✅ Voice job pool started with {VOICE_JOB_WORKERS} worker(s)")
+            if USE_WEBHOOK:
+                update_ingest_queue = UpdateIngestQueue(
+                    process_queued_update,
+                    maxsize=WEBHOOK_QUEUE_MAXSIZE,
+                    workers=WEBHOOK_WORKERS,
+                )
+                await update_ingest_queue.start()
+                logger.info(f"[{INSTANCE_ID}] ✅ Webhook update queue started with {WEBHOOK_WORKERS} worker(s)")
             if DAILY_HEARTBEAT_ENABLED:
                 daily_heartbeat_task = asyncio.create_task(daily_heartbeat_scheduler_loop(), name="mindmate-daily-heartbeat")
                 logger.info(f"[{INSTANCE_ID}] ✅ Daily heartbeat scheduler started")
@@ -1140,8 +1437,30 @@ async def lifespan(app: FastAPI):
             pass
         daily_heartbeat_task = None
 
+    if update_ingest_queue:
+        await update_ingest_queue.stop(drain_timeout=WEBHOOK_DRAIN_TIMEOUT_SECONDS)
+        update_ingest_queue = None
+
+    if update_scheduler:
+        await update_scheduler.shutdown(timeout=WEBHOOK_DRAIN_TIMEOUT_SECONDS)
+        update_scheduler = None
+
+    if voice_job_pool:
+        await voice_job_pool.stop(drain_timeout=WEBHOOK_DRAIN_TIMEOUT_SECONDS)
+        voice_job_pool = None
+
+    if memory_capture_tasks:
+        await asyncio.wait(list(memory_capture_tasks), timeout=WEBHOOK_DRAIN_TIMEOUT_SECONDS)
+
     # Shutdown: Close database and stop the bot
     if db_manager:
+        if hasattr(db_manager, "flush_messages"):
+            try:
+                flushed = await db_manager.flush_messages()
+                if flushed:
+                    logger.info(f"[{INSTANCE_ID}] Flushed {flushed} buffered message(s)")
+            except Exception as e:
+                logger.error(f"[{INSTANCE_ID}] Failed to flush buffered messages: {e}")
         logger.info(f"[{INSTANCE_ID}] Closing database connection...")
         await db_manager.close()
 
@@ -1152,6 +1471,10 @@ async def lifespan(app: FastAPI):
         await telegram_app.stop()
         await telegram_app.shutdown()
 
+    if llm_gateway:
+        await llm_gateway.close()
+    await close_web_search_client()
+
 fastapi_app = FastAPI(title="MindMate Bot", lifespan=lifespan)
 
 @fastapi_app.get("/")
@@ -1184,6 +1507,17 @@ async def health():
         },
         "uptime": "operational",
         "version": "1.2.0",
+        "llm": llm_gateway.stats() if llm_gateway else None,
+        "database_pool": db_manager.get_pool_stats() if hasattr(db_manager, "get_pool_stats") else None,
+        "webhook_queue": update_ingest_queue.stats() if update_ingest_queue else None,
+        "history_cache": history_cache.stats(),
+        "heartbeat_digests": heartbeat_digests.stats(),
+        "daily_heartbeat": heartbeat_delivery.last_report.as_dict() if heartbeat_delivery.last_report else None,
+        "update_scheduler": update_scheduler.stats() if update_scheduler else None,
+        "voice_jobs": voice_job_pool.stats() if voice_job_pool else None,
+        "voice_transcription": voice_transcriber.stats(),
+        "tts_cache": tts_cache.stats(),
+        "heartbeat_scheduler": heartbeat_scheduler.stats() if heartbeat_scheduler else None,
         "features": {
             "voice": True,
             "personal_mode": True,
@@ -1209,7 +1543,12 @@ async def webhook(request: Request):
         logger.info(f"Webhook received update: {update_data.get('update_id', 'unknown')}")
         
         update = Update.de_json(update_data, telegram_app.bot)
-        await telegram_app.process_update(update)
+        if update_ingest_queue is None:
+            await telegram_app.process_update(update)
+        elif not update_ingest_queue.submit(update):
+            # Non-2xx makes Telegram redeliver later instead of us dropping the update.
+            logger.warning(f"Webhook queue full; asking Telegram to retry update {update.update_id}")
+            return JSONResponse({"status": "busy"}, status_code=503)
         
         return {"status": "ok"}
     except Exception as e:
@@ -1225,8 +1564,14 @@ async def webhook(request: Request):
 async def get_history(user_id: int) -> list[dict[str, str]]:
     """Get conversation history for a user from PostgreSQL or fallback memory."""
     if db_manager:
+        cached = history_cache.get(user_id)
+        if cached is not None:
+            return cached
         try:
-            return await db_manager.get_conversation_history(user_id, MAX_HISTORY_LENGTH)
+            version = history_cache.version(user_id)
+            history = await db_manager.get_conversation_history(user_id, MAX_HISTORY_LENGTH)
+            history_cache.put(user_id, history, version)
+            return history
         except Exception as e:
             logger.warning(f"Failed to get history from PostgreSQL: {e}")
     
@@ -1422,6 +1767,13 @@ async def append_journal_entry_for_user(
     cache = daily_journals.setdefault(user_id, {}).setdefault(local_date, [])
     if source_message_id is None or not any(_entry_source_message_id(item) == str(source_message_id) for item in cache):
         cache.append(entry)
+    heartbeat_digests.record_journal(user_id, local_date, entry_text)
+    schedule_memory_capture(
+        user_id,
+        "journal",
+        f"{local_date}:{entry_metadata.get('source_message_id') or entry.get('timestamp')}",
+        entry_text,
+    )
     return entry, True
 
 
@@ -1454,7 +1806,13 @@ async def set_daily_summary_tracking(
     prompt_kind: str = "daily_heartbeat",
     status: str | None = None,
     metadata: dict | None = None,
+    defer: bool = False,
 ) -> dict:
+    """Record a check-in transition in memory and in storage.
+
+    With `defer`, the storage write is queued for the batch a heartbeat cycle
+    flushes once it finishes (`flush_daily_checkin_tracking`).
+    """
     tracking = {
         "local_date": local_date,
         "waiting_for_summary": waiting_for_summary,
@@ -1469,8 +1827,11 @@ async def set_daily_summary_tracking(
         tracking["metadata"] = metadata
 
     if db_manager and hasattr(db_manager, "upsert_daily_checkin"):
+        write = db_manager.upsert_daily_checkin
+        if defer and hasattr(db_manager, "queue_daily_checkin"):
+            write = db_manager.queue_daily_checkin
         try:
-            persisted = await db_manager.upsert_daily_checkin(
+            persisted = await write(
                 user_id=user_id,
                 local_date=local_date,
                 waiting_for_summary=waiting_for_summary,
@@ -1503,19 +1864,33 @@ async def add_to_history(user_id: int, role: str, content: str) -> None:
                 message_id=f"{user_id}_{datetime.now().timestamp()}"
             )
             await db_manager.store_message(message)
+            history_cache.append(user_id, role, content)
+            heartbeat_digests.record_turn(user_id, role, content)
+            if role == "user":
+                schedule_memory_capture(user_id, "message", message.message_id, content)
             return
         except Exception as e:
+            history_cache.invalidate(user_id)
+            heartbeat_digests.invalidate(user_id)
             logger.warning(f"Failed to store message in PostgreSQL: {e}")
     
     # Fallback to in-memory storage
     if user_id not in conversation_history:
         conversation_history[user_id] = []
     conversation_history[user_id].append({"role": role, "content": content})
+    heartbeat_digests.record_turn(user_id, role, content)
     if len(conversation_history[user_id]) > MAX_HISTORY_LENGTH:
         conversation_history[user_id] = conversation_history[user_id][-MAX_HISTORY_LENGTH:]
 
 async def clear_history(user_id: int) -> None:
-    """Clear conversation history from PostgreSQL, with in-memory fallback if needed."""
+    """Clear conversation history from PostgreSQL, with in-memory fallback if needed.
+
+    Recall embeddings of the cleared messages go too, so they never resurface
+    in later prompts. Journal entries are kept, as they are by the clear itself.
+    """
+    history_cache.invalidate(user_id)
+    heartbeat_digests.invalidate(user_id)
+    await forget_message_memories(user_id)
     if db_manager:
         try:
             await db_manager.clear_conversation(user_id)
@@ -1526,6 +1901,63 @@ async def clear_history(user_id: int) -> None:
     # Fallback to in-memory storage
     conversation_history.pop(user_id, None)
 
+
+async def forget_message_memories(user_id: int) -> None:
+    """Delete a user's message embeddings and drop their warm recall index."""
+    if memory_capture_tasks:
+        # A capture still in flight would otherwise write a cleared message back.
+        await asyncio.wait(list(memory_capture_tasks), timeout=WEBHOOK_DRAIN_TIMEOUT_SECONDS)
+    if memory_recall:
+        memory_recall.forget(user_id)
+    if db_manager and hasattr(db_manager, "delete_memory_embeddings"):
+        try:
+            await db_manager.delete_memory_embeddings(user_id, sources=("message",))
+        except Exception as e:
+            logger.warning(f"Failed to delete memory embeddings for user {user_id}: {e}")
+
+def build_memory_recall(store) -> MemoryRecall | None:
+    """Create the long-term recall helper for the active store, if enabled."""
+    if not MEMORY_RECALL_ENABLED or not hasattr(store, "get_memory_embeddings"):
+        return None
+    if MEMORY_EMBEDDER == "openai" and llm_gateway:
+        embedder = OpenAIEmbedder(llm_gateway)
+    else:
+        embedder = HashingEmbedder()
+    return MemoryRecall(store, embedder, min_score=MEMORY_RECALL_MIN_SCORE)
+
+
+def schedule_memory_capture(user_id: int, source: str, source_id: str, content: str) -> None:
+    """Embed a user message or journal entry in the background for later recall."""
+    if not memory_recall or len((content or "").strip()) < MEMORY_MIN_CHARS:
+        return
+
+    async def _capture() -> None:
+        try:
+            await memory_recall.remember(user_id, source, source_id, content, datetime.now().isoformat())
+        except Exception as e:
+            logger.warning(f"Failed to store memory embedding for user {user_id}: {e}")
+
+    task = asyncio.create_task(_capture())
+    memory_capture_tasks.add(task)
+    task.add_done_callback(memory_capture_tasks.discard)
+
+
+async def recall_relevant_memories(user_id: int, query: str, history: list[dict[str, str]] | None = None) -> str | None:
+    """Top-k past moments related to `query`, formatted for the system prompt."""
+    if not memory_recall:
+        return None
+    try:
+        moments = await memory_recall.recall(
+            user_id,
+            query,
+            k=MEMORY_RECALL_TOP_K,
+            exclude_contents=[item.get("content", "") for item in history or []],
+        )
+    except Exception as e:
+        logger.warning(f"Memory recall failed for user {user_id}: {e}")
+        return None
+    return format_recalled_moments(moments) or None
+
 # =============================================================================
 # Crisis Detection
 # =============================================================================
@@ -2162,7 +2594,7 @@ async def cmd_heartbeat(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     """Show the daily heartbeat scheduler status."""
     user_id = update.effective_user.id
     enabled_for_user = await is_daily_heartbeat_enabled_for_user(user_id)
-    timezone_name = get_daily_heartbeat_timezone().key
+    schedule = await get_daily_heartbeat_user_schedule(user_id)
     status = "enabled" if DAILY_HEARTBEAT_ENABLED else "disabled"
     user_status = "on" if enabled_for_user else "off"
     await send_markdown_message(
@@ -2170,7 +2602,7 @@ async def cmd_heartbeat(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         f"🫀 **Heartbeat Status**\n\n"
         f"Scheduler: **{status}**\n"
         f"Your reminder: **{user_status}**\n"
-        f"Time: **{DAILY_HEARTBEAT_HOUR:02d}:00 {timezone_name}**\n"
+        f"Time: **{schedule.hour:02d}:00 {schedule.timezone.key}**\n"
         f"Delivery: **direct message from MindMate**"
     )
 
@@ -2184,9 +2616,10 @@ async def cmd_schedule(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         return
 
     action = (context.args[0].strip().lower() if context.args else "status")
-    if action not in {"status", "on", "off", "test"}:
+    if action not in {"status", "on", "off", "test", "hour", "tz"}:
         await update.message.reply_text(
-            "⏰ Use `/schedule status`, `/schedule on`, `/schedule off`, or `/schedule test`."
+            "⏰ Use `/schedule status`, `/schedule on`, `/schedule off`, `/schedule test`, "
+            "`/schedule hour 7`, or `/schedule tz Africa/Johannesburg`."
         )
         return
 
@@ -2211,7 +2644,8 @@ async def cmd_schedule(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
             )
             return
 
-        await send_scheduled_daily_summary(user_id)
+        schedule = await get_daily_heartbeat_user_schedule(user_id)
+        await send_scheduled_daily_summary(user_id, tz=schedule.timezone)
         pending_tracking = await get_latest_pending_daily_summary_tracking(user_id)
         if pending_tracking and pending_tracking.get("waiting_for_summary"):
             await update.message.reply_text(
@@ -2237,11 +2671,27 @@ async def cmd_schedule(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         await set_daily_heartbeat_enabled_for_user(user_id, True)
     elif action == "off":
         await set_daily_heartbeat_enabled_for_user(user_id, False)
+    elif action == "hour":
+        value = context.args[1].strip() if len(context.args) > 1 else ""
+        if not value.isdigit() or not 0 <= int(value) <= 23:
+            await update.message.reply_text("⏰ Give me an hour from 0 to 23, e.g. `/schedule hour 7`.")
+            return
+        await set_daily_heartbeat_schedule_for_user(user_id, hour=int(value))
+    elif action == "tz":
+        value = context.args[1].strip() if len(context.args) > 1 else ""
+        try:
+            ZoneInfo(value)
+        except Exception:
+            await update.message.reply_text(
+                "⏰ I don't recognise that timezone. Use an Area/City name, e.g. `/schedule tz Europe/London`."
+            )
+            return
+        await set_daily_heartbeat_schedule_for_user(user_id, timezone_name=value)
 
     enabled_for_user = await is_daily_heartbeat_enabled_for_user(user_id)
     journey = await ensure_user_journey_loaded(user_id)
     last_summary = journey.get('last_daily_summary', 'No recent summaries')
-    timezone_name = get_daily_heartbeat_timezone().key
+    schedule = await get_daily_heartbeat_user_schedule(user_id)
     rollout_note = "Limited rollout (default on)" if rollout_limited else "Default on"
     scheduler_status = "enabled" if DAILY_HEARTBEAT_ENABLED else "disabled"
     user_status = "on" if enabled_for_user else "off"
@@ -2251,7 +2701,7 @@ async def cmd_schedule(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         f"⏰ **Daily Check-in Schedule**\n\n"
         f"Scheduler: **{scheduler_status}**\n"
         f"Your reminder: **{user_status}**\n"
-        f"Time: **{DAILY_HEARTBEAT_HOUR:02d}:00 {timezone_name}**\n"
+        f"Time: **{schedule.hour:02d}:00 {schedule.timezone.key}**\n"
         f"Delivery: **direct message from MindMate**\n"
         f"Rollout: **{rollout_note}**\n\n"
         f"Reply naturally when I check in. If you're busy, say **later** or **skip** and I'll leave it for the next day.\n\n"
@@ -2290,6 +2740,44 @@ async def cmd_context(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         )
 
 
+def build_streaming_reply(update: Update) -> StreamingReply:
+    """A reply to `update` that grows by message edits, throttled for the chat type."""
+    chat_type = getattr(update.effective_chat, "type", "private")
+    edit_interval = STREAMING_EDIT_INTERVAL_SECONDS
+    if chat_type != "private":
+        edit_interval = max(edit_interval, GROUP_STREAMING_EDIT_INTERVAL_SECONDS)
+    return StreamingReply(update.message.reply_text, render=_render_basic_telegram_html, edit_interval=edit_interval)
+
+
+async def stream_chat_reply(streaming_reply: StreamingReply, completion_kwargs: dict) -> str:
+    """Stream a chat completion into `streaming_reply` and return the full text."""
+    await streaming_reply.start()
+    # aclosing releases the gateway's slot and connection even if a push raises mid-stream.
+    async with aclosing(llm_gateway.stream_chat_completion(**completion_kwargs)) as stream:
+        async for delta in stream:
+            await streaming_reply.push(delta)
+    if not streaming_reply.text.strip():
+        raise RuntimeError("Streamed chat completion returned no text")
+    if streaming_reply.first_text_at is not None:
+        logger.debug(
+            "Streamed reply: first text after %.2fs, %s edits",
+            streaming_reply.first_text_at - streaming_reply.started_at,
+            streaming_reply.edits,
+        )
+    return streaming_reply.text
+
+
+async def send_chat_failure_notice(update: Update, streaming_reply: StreamingReply | None, text: str) -> None:
+    """Tell the user a reply failed, replacing a half-streamed reply rather than leaving it hanging."""
+    if streaming_reply and streaming_reply.started:
+        try:
+            await streaming_reply.fail(text)
+            return
+        except TelegramError as e:
+            logger.warning(f"Could not replace streamed reply with failure notice: {e}")
+    await update.message.reply_text(text)
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     # Deduplicate messages to prevent double responses during deployments
     message_id = update.message.message_id
@@ -2309,6 +2797,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     user_id = update.effective_user.id
     message = update.message.text
     personal_mode = is_personal_mode(user_id)
+    if voice_job_pool is not None:
+        # Answer after this user's earlier voice notes so history stays in order.
+        await voice_job_pool.wait_for_user(user_id)
     history = await get_history(user_id)
 
     # ------------------------------------------------------------------
@@ -2332,7 +2823,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             )
             return
 
-        search_result = search_web(web_query, max_results=5)
+        search_result = await search_web_async(web_query, max_results=5)
         if search_result.ok:
             web_search_result = search_result
             web_results = search_result.summary
@@ -2360,7 +2851,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         auto_web_query = extract_auto_web_query(stripped, history)
         if auto_web_query:
             web_query = auto_web_query
-            search_result = search_web(web_query, max_results=5)
+            search_result = await search_web_async(web_query, max_results=5)
             if search_result.ok:
                 web_search_result = search_result
                 web_results = search_result.summary
@@ -2400,7 +2891,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await send_markdown_message(update, CRISIS_RESPONSE)
             return
     
-    if not openai_client:
+    if not llm_gateway:
         await update.message.reply_text("I'm temporarily unavailable. Please try again later.")
         return
 
@@ -2417,24 +2908,29 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         response_mode="chat",
         current_time=current_time,
         web_results=web_results,
+        recalled_memories=await recall_relevant_memories(user_id, message, history),
     )
 
     mode_str = "PERSONAL" if personal_mode else "STANDARD"
     logger.info(f"Message from user {user_id} [{mode_str}] using model {current_model}")
     
+    streaming_reply: StreamingReply | None = None
     try:
         messages = [{"role": "system", "content": system_prompt}]
         messages.extend(history)
         messages.append({"role": "user", "content": message})
         
-        response = openai_client.chat.completions.create(
-            **build_chat_completion_kwargs(
-                model=current_model,
-                messages=messages,
-                max_output_tokens=600,
-            )
+        completion_kwargs = build_chat_completion_kwargs(
+            model=current_model,
+            messages=messages,
+            max_output_tokens=600,
         )
-        reply = response.choices[0].message.content
+        if STREAMING_REPLIES_ENABLED:
+            streaming_reply = build_streaming_reply(update)
+            reply = await stream_chat_reply(streaming_reply, completion_kwargs)
+        else:
+            response = await llm_gateway.chat_completion(**completion_kwargs)
+            reply = response.choices[0].message.content
 
         web_attribution_line = build_web_attribution_line(web_search_result) if used_web else ""
         if web_attribution_line:
@@ -2443,19 +2939,22 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await add_to_history(user_id, "user", message)
         await add_to_history(user_id, "assistant", reply)
         
-        await send_markdown_message(update, reply)
+        if streaming_reply:
+            await streaming_reply.finish(reply)
+        else:
+            await send_markdown_message(update, reply)
         logger.info(f"Responded to user {user_id}")
         
     except OpenAIError as e:
         logger.error(f"OpenAI error: {e}")
-        await update.message.reply_text(
-            build_chat_recovery_message(e, used_web=used_web)
-        )
+        await send_chat_failure_notice(update, streaming_reply, build_chat_recovery_message(e, used_web=used_web))
     except Exception as e:
         logger.error(f"Error: {e}")
-        await update.message.reply_text(
+        await send_chat_failure_notice(
+            update,
+            streaming_reply,
             "💙 Something went wrong while I was preparing that reply. "
-            "Please try again, or resend the main part in one shorter message."
+            "Please try again, or resend the main part in one shorter message.",
         )
 
 
@@ -2612,11 +3111,28 @@ async def update_context_from_message(user_id: int, message: str) -> None:
     logger.info(f"Auto-updated context for user {user_id} from message: {message[:50]}...")
 
 
-async def send_scheduled_daily_summary(user_id: int) -> None:
-    """Send the once-daily proactive MindMate verse + check-in flow and track the reply."""
+async def send_heartbeat_message(**kwargs):
+    """Send one heartbeat message under the delivery rate limits, retrying flood-control errors."""
+    return await heartbeat_delivery.send(telegram_app.bot.send_message, **kwargs)
+
+
+async def send_scheduled_daily_summary(
+    user_id: int,
+    local_date: str | None = None,
+    tz: ZoneInfo | None = None,
+    *,
+    defer_tracking: bool = False,
+) -> None:
+    """Send the once-daily proactive MindMate verse + check-in flow and track the reply.
+
+    The claim → sent transition is always written before anything is sent, so a
+    crash mid-cycle can never make the day claimable again. `defer_tracking`
+    only defers the post-send bookkeeping (message ids, delivery target).
+    """
 
     sent_at = datetime.now()
-    local_date = sent_at.astimezone(get_daily_heartbeat_timezone()).strftime("%Y-%m-%d")
+    tz = tz or get_daily_heartbeat_timezone()
+    local_date = local_date or sent_at.astimezone(tz).strftime("%Y-%m-%d")
     tracking = await set_daily_summary_tracking(
         user_id,
         local_date,
@@ -2653,15 +3169,15 @@ async def send_scheduled_daily_summary(user_id: int) -> None:
                 version=verse.version,
                 link=verse.link,
             )
-            verse_message = await telegram_app.bot.send_message(
+            verse_message = await send_heartbeat_message(
                 text=_render_basic_telegram_html(verse_text),
                 parse_mode='HTML',
                 **send_kwargs,
             )
 
-        heartbeat_text = await build_daily_heartbeat_message(user_id, verse=verse)
+        heartbeat_text = await build_daily_heartbeat_message(user_id, verse=verse, tz=tz)
 
-        message = await telegram_app.bot.send_message(text=heartbeat_text, **send_kwargs)
+        message = await send_heartbeat_message(text=heartbeat_text, **send_kwargs)
 
         await set_daily_summary_tracking(
             user_id,
@@ -2679,6 +3195,7 @@ async def send_scheduled_daily_summary(user_id: int) -> None:
                 "verse_message_id": verse_message.message_id if verse_message else None,
                 "verse_reference": verse.reference if verse else None,
             },
+            defer=defer_tracking,
         )
         logger.info("Sent daily verse/check-in flow to user %s via %s", user_id, delivery_target)
 
@@ -2693,142 +3210,187 @@ async def send_scheduled_daily_summary(user_id: int) -> None:
             prompt_kind="daily_heartbeat",
             status="failed",
             metadata={"error": str(e)},
+            defer=defer_tracking,
+        )
+
+
+def _voice_filename(voice) -> str:
+    """Filename to upload a voice note or audio file under; the extension tells the API its format."""
+    file_name = getattr(voice, "file_name", None)
+    return file_name if isinstance(file_name, str) and "." in file_name else "voice.ogg"
+
+
+async def download_voice_bytes(telegram_bot, voice) -> bytes:
+    """Download a Telegram voice note or audio file into memory."""
+    telegram_file = await telegram_bot.get_file(voice.file_id)
+    buffer = io.BytesIO()
+    await telegram_file.download_to_memory(out=buffer)
+    return buffer.getvalue()
+
+
+async def transcribe_voice_bytes(audio: bytes, filename: str = "voice.ogg") -> str:
+    """Transcribe in-memory audio with the shared gateway client."""
+    transcript = await llm_gateway.transcribe(model=VOICE_TRANSCRIPTION_MODEL, file=(filename, audio))
+    return transcript.text
+
+
+async def synthesize_voice_bytes(text: str) -> bytes:
+    """Synthesize `text` as OGG/Opus bytes, the format Telegram plays as a voice note.
+
+    Phrases that keep coming back are served from `tts_cache` instead of being synthesized again.
+    """
+    async def synthesize() -> bytes:
+        speech = await llm_gateway.synthesize_speech(
+            model=VOICE_TTS_MODEL,
+            input=text,
+            voice=VOICE_TTS_VOICE,
+            response_format="opus",
         )
+        return speech.content if speech else b""
+
+    return await tts_cache.get_or_synthesize(tts_cache_key(VOICE_TTS_MODEL, VOICE_TTS_VOICE, "opus", text), synthesize)
+
+
+def voice_queue_notice(admission: VoiceAdmission) -> str | None:
+    """What to tell a user whose voice note had to queue, if anything."""
+    if not admission.accepted:
+        if admission.reason == "user_limit":
+            return "⏳ I'm still working on your earlier voice notes. Send this one again once I've replied."
+        return "⏳ Voice notes are very busy right now. Please try again in a minute, or type your message."
+    if admission.text_only:
+        return "🎧 It's busy right now, so I'll answer this voice note in text."
+    if admission.position == 1:
+        return "🎧 Got it, you're next."
+    if admission.position > 1:
+        return f"🎧 Got it. There are {admission.position - 1} voice notes ahead of yours."
+    return None
 
 
 async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle voice messages - transcribe and respond with voice."""
+    """Handle voice messages - queue them on the voice pool, which transcribes and replies."""
+    user_id = update.effective_user.id
+    
+    # Check OpenAI client availability
+    if not llm_gateway:
+        logger.error(f"OpenAI client not initialized for user {user_id}")
+        await update.message.reply_text(
+            "❌ Voice service is temporarily unavailable. Please try again later.",
+        )
+        return
+    
+    # Get voice file
+    voice = update.message.voice or update.message.audio
+    if not voice:
+        await update.message.reply_text("❌ Please send a voice message.")
+        return
+    
+    if voice_job_pool is None:
+        await process_voice_note(update, context, voice)
+        return
+    
+    admission = voice_job_pool.submit(
+        user_id,
+        lambda text_only: process_voice_note(update, context, voice, text_only=text_only),
+    )
+    if not admission.accepted:
+        logger.info(f"Voice note from user {user_id} refused: {admission.reason}")
+    notice = voice_queue_notice(admission)
+    if notice:
+        await update.message.reply_text(notice)
+
+
+async def process_voice_note(update: Update, context: ContextTypes.DEFAULT_TYPE, voice, *, text_only: bool = False) -> None:
+    """Transcribe a voice note and reply, in text and then (unless `text_only`) in voice."""
     user_id = update.effective_user.id
     personal_mode = is_personal_mode(user_id)
     
     try:
-        # Check OpenAI client availability
-        if not openai_client:
-            logger.error(f"OpenAI client not initialized for user {user_id}")
-            await update.message.reply_text(
-                "❌ Voice service is temporarily unavailable. Please try again later.",
+        # Download, transcribe and answer entirely in memory: nothing touches the disk.
+        timings = StageTimings()
+        cache_key = getattr(voice, "file_unique_id", None)
+        transcribed_text = voice_transcriber.cached(cache_key)
+        if transcribed_text is None:
+            audio = await download_voice_bytes(context.bot, voice)
+            timings.mark("download")
+            transcribed_text = await voice_transcriber.transcribe(
+                audio,
+                _voice_filename(voice),
+                duration=getattr(voice, "duration", None),
+                cache_key=cache_key,
             )
-            return
+        timings.mark("transcribe")
+        logger.info(f"User {user_id} voice transcribed: {transcribed_text[:50]}...")
         
-        # Get voice file
-        voice = update.message.voice or update.message.audio
-        if not voice:
-            await update.message.reply_text("❌ Please send a voice message.")
-            return
+        # Add transcription to history
+        await add_to_history(user_id, "user", transcribed_text)
         
-        # Download voice file
-        voice_file = await context.bot.get_file(voice.file_id)
+        # Get conversation history
+        history = await get_history(user_id)
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".ogg") as temp_file:
-            await voice_file.download_to_drive(temp_file.name)
-            
-            # Transcribe voice to text
-            from openai import AsyncOpenAI
-            async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-            
-            with open(temp_file.name, "rb") as audio_file:
-                transcript = await async_client.audio.transcriptions.create(
-                    model=VOICE_TRANSCRIPTION_MODEL,
-                    file=audio_file
-                )
-            
-            transcribed_text = transcript.text
-            logger.info(f"User {user_id} voice transcribed: {transcribed_text[:50]}...")
-            
-            # Add detailed logging for debugging
-            logger.info(f"OpenAI client status: {openai_client is not None}")
-            logger.info(f"Transcription successful: {transcribed_text[:100]}...")
-            
-            # Add transcription to history
-            await add_to_history(user_id, "user", transcribed_text)
-            
-            # Get conversation history
-            history = await get_history(user_id)
-            
-            # Generate response
-            current_model = get_user_model(user_id)
-            current_time = update.message.date.strftime("%I:%M %p on %B %d, %Y") if update.message and update.message.date else None
-            system_prompt = build_generation_system_prompt(
-                user_id,
-                personal_mode=personal_mode,
-                response_mode="voice",
-                current_time=current_time,
-            )
+        # Generate response
+        current_model = get_user_model(user_id)
+        current_time = update.message.date.strftime("%I:%M %p on %B %d, %Y") if update.message and update.message.date else None
+        system_prompt = build_generation_system_prompt(
+            user_id,
+            personal_mode=personal_mode,
+            response_mode="voice",
+            current_time=current_time,
+            recalled_memories=await recall_relevant_memories(user_id, transcribed_text, history),
+        )
 
-            messages = [{"role": "system", "content": system_prompt}]
-            messages.extend(history)
-            messages.append({"role": "user", "content": transcribed_text})
-            
-            response = openai_client.chat.completions.create(
-                **build_chat_completion_kwargs(
-                    model=current_model,
-                    messages=messages,
-                    max_output_tokens=500,
-                )
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(history)
+        messages.append({"role": "user", "content": transcribed_text})
+        
+        response = await llm_gateway.chat_completion(
+            **build_chat_completion_kwargs(
+                model=current_model,
+                messages=messages,
+                max_output_tokens=500,
             )
-            
-            logger.info(f"Chat completion successful for user {user_id}")
-            
-            response_text = response.choices[0].message.content
-            logger.info(f"Response text extracted: {response_text[:100]}...")
-            
-            # Validate response before proceeding
-            if not response_text:
-                logger.error(f"Empty response from OpenAI for user {user_id}")
-                await update.message.reply_text(
-                    "❌ I didn't get a proper response. Please try again.",
-                )
-                return
-            
-            # Add response to history
-            await add_to_history(user_id, "assistant", response_text)
-            
-            # Generate voice response
-            logger.info(f"About to create TTS for user {user_id}")
-            voice_response = openai_client.audio.speech.create(
-                model=VOICE_TTS_MODEL,
-                input=response_text,
-                voice="alloy"
+        )
+        timings.mark("completion")
+        
+        response_text = response.choices[0].message.content
+        
+        # Validate response before proceeding
+        if not response_text:
+            logger.error(f"Empty response from OpenAI for user {user_id}")
+            await update.message.reply_text(
+                "❌ I didn't get a proper response. Please try again.",
             )
-            
-            logger.info(f"TTS creation successful for user {user_id}")
-            
-            # Validate voice response
-            if not voice_response:
-                logger.error(f"Failed to generate voice response for user {user_id}")
-                await update.message.reply_text(
-                    f"💬 **Text Response:**\n\n{response_text}",
-                )
-                return
-            
-            # Create temporary file for TTS response
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".ogg") as voice_file:
-                # Run synchronous stream_to_file in executor to avoid blocking
-                loop = asyncio.get_event_loop()
-                await loop.run_in_executor(None, voice_response.stream_to_file, voice_file.name)
-                
-                # Check if response fits in Telegram caption limit (800 chars leaves room for formatting)
-                if len(response_text) <= 800:
-                    # Normal flow - voice with full caption
-                    caption_text = f"🎤 **Voice Response:**\n\n{response_text}"
-                    await update.message.reply_voice(
-                        voice=voice_file,
-                        caption=caption_text,
-                    )
-                else:
-                    # Response too long - send voice + split text messages
-                    await update.message.reply_voice(
-                        voice=voice_file,
-                        caption="🎤 **Full response below:**",
-                    )
-                    
-                    # Split long text into multiple messages (Telegram limit: 4096 chars)
-                    for i in range(0, len(response_text), 4096):
-                        await update.message.reply_text(response_text[i:i+4096])
-            
-            logger.info(f"Voice response sent to user {user_id}")
-            
+            return
+        
+        # Start speech right away and send the text while it synthesizes.
+        segments = [] if text_only else segment_for_speech(response_text, max_chars=VOICE_TTS_SEGMENT_CHARS)
+        text_sent = asyncio.Event()
+
+        async def send_voice_segment(voice_audio: bytes, index: int) -> None:
+            await text_sent.wait()
+            await update.message.reply_voice(voice=voice_audio)
+
+        speech = asyncio.create_task(
+            speak_segments(segments, synthesize_voice_bytes, send_voice_segment, timings=timings)
+        )
+        try:
+            await add_to_history(user_id, "assistant", response_text)
+            # Split long text into multiple messages (Telegram limit: 4096 chars)
+            for i in range(0, len(response_text), 4096):
+                await update.message.reply_text(response_text[i:i+4096])
+            timings.note("text_sent")
+            text_sent.set()
+        except BaseException:
+            speech.cancel()
+            raise
+        
+        try:
+            await speech
+        except (OpenAIError, TelegramError, ValueError) as e:
+            # The text reply is already out; a failed voice note only costs the audio.
+            logger.error(f"Voice synthesis failed for user {user_id} after the text reply: {e}")
+        timings.mark("speech")
+        logger.info(f"Voice turn for user {user_id} ({len(segments)} segment(s)): {timings.format()}")
+        
     except OpenAIError as e:
         logger.error(f"OpenAI error processing voice for user {user_id}: {e}")
         await update.message.reply_text(
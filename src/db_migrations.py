@@ -0,0 +1,245 @@
+"""Versioned schema migrations for MindMate's PostgreSQL storage.
+
+Each migration is a numbered list of DDL statements. Applied versions are
+recorded in `mindmate_schema_migrations`, so a startup against an up-to-date
+database costs two cheap catalog/version reads and runs no DDL at all.
+Pending migrations run in order under a session advisory lock, which keeps
+two instances booting at once from racing each other, and each one commits
+together with its version row.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import List, Sequence
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE = "mindmate_schema_migrations"
+# Arbitrary constant shared by every instance; only guards migration runs.
+MIGRATION_LOCK_KEY = 0x4D4D5F4D4947
+
+
+@dataclass(frozen=True)
+class Migration:
+    """One forward-only schema change."""
+    version: int
+    name: str
+    statements: Sequence[str]
+
+
+MIGRATIONS: Sequence[Migration] = (
+    Migration(
+        version=1,
+        name="baseline schema",
+        statements=(
+            """
+            CREATE TABLE IF NOT EXISTS mindmate_messages (
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                conversation_id VARCHAR(200) NOT NULL,
+                role VARCHAR(20) NOT NULL,
+                content TEXT NOT NULL,
+                message_id VARCHAR(100),
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS mindmate_user_preferences (
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                pref_key VARCHAR(100) NOT NULL,
+                pref_value TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(user_id, pref_key)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS mindmate_feedback (
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                feedback_text TEXT NOT NULL,
+                source VARCHAR(50) DEFAULT 'command',
+                metadata TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS mindmate_user_journey (
+                user_id BIGINT PRIMARY KEY,
+                journey_data JSONB NOT NULL DEFAULT '{}'::jsonb,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS mindmate_journal_entries (
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                local_date DATE NOT NULL,
+                entry_type VARCHAR(50) NOT NULL,
+                entry_text TEXT NOT NULL,
+                mood TEXT,
+                plan_tomorrow TEXT,
+                metadata JSONB NOT NULL DEFAULT '{}'::jsonb,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS mindmate_daily_checkins (
+                user_id BIGINT NOT NULL,
+                local_date DATE NOT NULL,
+                waiting_for_summary BOOLEAN NOT NULL DEFAULT FALSE,
+                sent_at TIMESTAMP,
+                responded_at TIMESTAMP,
+                prompt_message_id VARCHAR(100),
+                response_message_id VARCHAR(100),
+                prompt_kind VARCHAR(50) NOT NULL DEFAULT 'daily_heartbeat',
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                metadata JSONB NOT NULL DEFAULT '{}'::jsonb,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, local_date)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_messages_user ON mindmate_messages(user_id)",
+            "CREATE INDEX IF NOT EXISTS idx_messages_conv ON mindmate_messages(conversation_id)",
+            "CREATE INDEX IF NOT EXISTS idx_prefs_user ON mindmate_user_preferences(user_id)",
+            "CREATE INDEX IF NOT EXISTS idx_feedback_user ON mindmate_feedback(user_id)",
+            "CREATE INDEX IF NOT EXISTS idx_feedback_created_at ON mindmate_feedback(created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_journal_user_date ON mindmate_journal_entries(user_id, local_date, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_journal_source_message ON mindmate_journal_entries(user_id, entry_type, ((metadata->>'source_message_id'))) WHERE metadata ? 'source_message_id'",
+            "CREATE INDEX IF NOT EXISTS idx_checkins_user_updated ON mindmate_daily_checkins(user_id, updated_at DESC)",
+        ),
+    ),
+    Migration(
+        version=2,
+        name="composite indexes for hot queries",
+        statements=(
+            # History, keyword search and clear: WHERE user_id AND conversation_id ORDER BY timestamp DESC.
+            "CREATE INDEX IF NOT EXISTS idx_messages_user_conv_ts ON mindmate_messages(user_id, conversation_id, timestamp DESC)",
+            # The composite index's leading column serves user_id-only scans; nothing filters on conversation_id alone.
+            "DROP INDEX IF EXISTS idx_messages_user",
+            "DROP INDEX IF EXISTS idx_messages_conv",
+            # Preference fan-out by key (heartbeat eligibility) as an index-only scan.
+            "CREATE INDEX IF NOT EXISTS idx_prefs_key_covering ON mindmate_user_preferences(pref_key) INCLUDE (user_id, pref_value)",
+            # UNIQUE(user_id, pref_key) already covers per-user lookups.
+            "DROP INDEX IF EXISTS idx_prefs_user",
+            # Journal entries across all dates: WHERE user_id ORDER BY created_at.
+            "CREATE INDEX IF NOT EXISTS idx_journal_user_created ON mindmate_journal_entries(user_id, created_at)",
+            # Latest pending check-in: WHERE user_id AND waiting_for_summary ORDER BY local_date DESC, updated_at DESC.
+            "CREATE INDEX IF NOT EXISTS idx_checkins_pending ON mindmate_daily_checkins(user_id, local_date DESC, updated_at DESC) WHERE waiting_for_summary",
+        ),
+    ),
+    Migration(
+        version=3,
+        name="full-text search over messages",
+        statements=(
+            # Stored generated column (PostgreSQL 12+): kept in sync by the server on every insert.
+            "ALTER TABLE mindmate_messages ADD COLUMN IF NOT EXISTS content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED",
+            "CREATE INDEX IF NOT EXISTS idx_messages_content_tsv ON mindmate_messages USING GIN (content_tsv)",
+        ),
+    ),
+    Migration(
+        version=4,
+        name="memory embeddings",
+        statements=(
+            """
+            CREATE TABLE IF NOT EXISTS mindmate_memory_embeddings (
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                model VARCHAR(100) NOT NULL,
+                source VARCHAR(20) NOT NULL,
+                source_id VARCHAR(100) NOT NULL,
+                content TEXT NOT NULL,
+                embedding BYTEA NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (user_id, model, source, source_id)
+            )
+            """,
+        ),
+    ),
+    Migration(
+        version=5,
+        name="daily check-in claims",
+        statements=(
+            # Which instance took a scheduled send, and when; see claim_daily_checkin().
+            "ALTER TABLE mindmate_daily_checkins ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(64)",
+            "ALTER TABLE mindmate_daily_checkins ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP",
+        ),
+    ),
+    Migration(
+        version=6,
+        name="fold heartbeat last-sent date into daily check-ins",
+        statements=(
+            # A claimed check-in in a delivered state now records the day's scheduled send,
+            # replacing the per-user 'daily_heartbeat_last_sent_date' preference row.
+            """
+            INSERT INTO mindmate_daily_checkins (user_id, local_date, waiting_for_summary, prompt_kind, status, claimed_by, claimed_at, updated_at)
+            SELECT user_id, btrim(pref_value, '"')::date, FALSE, 'daily_heartbeat', 'sent', 'backfill', updated_at, updated_at
+            FROM mindmate_user_preferences
+            WHERE pref_key = 'daily_heartbeat_last_sent_date' AND pref_value ~ '^"[0-9]{4}-[0-9]{2}-[0-9]{2}"$'
+            ON CONFLICT (user_id, local_date) DO UPDATE SET
+                claimed_by = COALESCE(mindmate_daily_checkins.claimed_by, EXCLUDED.claimed_by),
+                claimed_at = COALESCE(mindmate_daily_checkins.claimed_at, EXCLUDED.claimed_at)
+            """,
+            "DELETE FROM mindmate_user_preferences WHERE pref_key = 'daily_heartbeat_last_sent_date'",
+        ),
+    ),
+)
+
+
+def latest_version(migrations: Sequence[Migration] = MIGRATIONS) -> int:
+    return max((migration.version for migration in migrations), default=0)
+
+
+def _current_version(cursor) -> int:
+    cursor.execute("SELECT to_regclass(%s)", (MIGRATIONS_TABLE,))
+    row = cursor.fetchone()
+    if not row or row[0] is None:
+        return 0
+    cursor.execute(f"SELECT COALESCE(MAX(version), 0) FROM {MIGRATIONS_TABLE}")
+    return int(cursor.fetchone()[0])
+
+
+def apply_migrations(conn, migrations: Sequence[Migration] = MIGRATIONS) -> List[int]:
+    """Apply pending migrations on a psycopg2 connection; returns the versions applied."""
+    target = latest_version(migrations)
+    cursor = conn.cursor()
+    if _current_version(cursor) >= target:
+        conn.commit()
+        return []
+
+    applied: List[int] = []
+    cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+        # Another instance may have finished while we waited for the lock.
+        cursor.execute(f"SELECT version FROM {MIGRATIONS_TABLE}")
+        done = {int(version) for (version,) in cursor.fetchall()}
+        for migration in sorted(migrations, key=lambda item: item.version):
+            if migration.version in done:
+                continue
+            try:
+                for statement in migration.statements:
+                    cursor.execute(statement)
+                cursor.execute(
+                    f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES (%s, %s)",
+                    (migration.version, migration.name),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(migration.version)
+            logger.info("Applied schema migration %s: %s", migration.version, migration.name)
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+        conn.commit()
+    return applied
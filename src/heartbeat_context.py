@@ -0,0 +1,172 @@
+"""Scoring of user messages as context for the daily heartbeat.
+
+The heartbeat picks a few recent messages worth reflecting back ("Lately
+it's sounded like ...") and derives topic flags for its plan suggestions.
+`HeartbeatContextScorer` computes every feature that needs in one pass per
+message: the text is normalized and tokenized once, the keyword lists are
+frozen sets tested by intersection, and each regex list is compiled into a
+single alternation.
+
+`scripts/benchmark_heartbeat_scorer.py` compares it with the original
+per-feature helpers; the equivalence tests pin the original outputs.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+HEARTBEAT_SUPPORT_KEYWORDS = frozenset({
+    "anxious", "anxiety", "burnout", "calm", "coping", "crash", "crying", "depressed", "depression",
+    "drained", "emotion", "emotional", "energy", "episode", "exhausted", "family", "fatigue",
+    "feel", "feeling", "feelings", "friend", "grief", "journal", "lonely", "manic", "medication",
+    "medicine", "meds", "mood", "overwhelmed", "panic", "partner", "relationship", "rest", "sad",
+    "sleep", "stressed", "stress", "support", "therapy", "therapist", "tired", "trigger", "work"
+})
+HEARTBEAT_HIGH_PRIORITY_KEYWORDS = frozenset({
+    "journal", "journaling", "mood", "stress", "stressed", "sleep", "tired", "rest", "overwhelmed",
+    "anxious", "anxiety", "panic", "depressed", "depression", "manic", "episode", "therapy",
+    "therapist", "meds", "medication", "medicine", "relationship", "partner", "family", "friend",
+    "lonely", "grief", "crying", "support", "coping", "trigger"
+})
+HEARTBEAT_CLINICAL_KEYWORDS = frozenset({
+    "bipolar", "therapy", "therapist", "meds", "medication", "anxiety", "depressed", "overwhelmed",
+    "panic", "sleep", "relationship", "partner"
+})
+HEARTBEAT_CURRENT_EVENTS_TOKENS = frozenset({
+    "news", "headline", "headlines", "update", "updates", "latest", "happening", "happened"
+})
+HEARTBEAT_COMMAND_TERMS = frozenset({
+    "search", "browse", "google", "lookup", "look", "find", "price", "prices", "weather", "news", "score", "scores",
+    "bitcoin", "btc", "crypto", "stock", "stocks", "forex", "translate", "summarize", "web"
+})
+HEARTBEAT_CURRENT_EVENTS_PATTERNS = (
+    re.compile(r"\b(?:news|current events?|headlines?|latest|update|updates|happening|happened)\b", re.IGNORECASE),
+    re.compile(r"\bwhat(?:'s| is)?\s+(?:exactly\s+)?(?:happening|going on|the update)\b", re.IGNORECASE),
+    re.compile(r"\b(?:there|in [a-z][a-z\s'-]{1,40})\s+(?:lately|right now|today|this week)\b", re.IGNORECASE),
+)
+HEARTBEAT_LOW_VALUE_PATTERNS = (
+    re.compile(r"^/[a-z0-9_]+(?:\s|$)", re.IGNORECASE),
+    re.compile(r"^(?:search|browse|look up|lookup|google|find)(?:\s+the)?\s+web\b", re.IGNORECASE),
+    re.compile(r"^(?:search|browse|look up|lookup|google|find)\b", re.IGNORECASE),
+    re.compile(r"\b(?:search|look up|lookup|google|find)\b.{0,30}\b(?:price|weather|news|score|stock|bitcoin|btc|crypto)\b", re.IGNORECASE),
+    re.compile(r"\b(?:bitcoin|btc|crypto|stock|forex|weather|news|score)s?\b", re.IGNORECASE),
+    re.compile(r"https?://", re.IGNORECASE),
+)
+HEARTBEAT_REFLECTIVE_PHRASES = ("i feel", "i'm feeling", "ive been", "i've been", "yesterday", "recently")
+HEARTBEAT_PERSONAL_PHRASES = (
+    "my mood", "my sleep", "my therapist", "my meds", "my medication", "my partner", "my relationship", "my journal",
+)
+HEARTBEAT_TOPIC_KEYWORDS = {
+    "energy": ("tired", "sleep", "exhausted", "rest"),
+    "stress": ("anxious", "stress", "overwhelmed", "panic"),
+    "work": ("work", "job", "career", "boss", "deadline"),
+    "career": ("work", "job", "career"),
+    "meds": ("medication", "medicine", "meds", "dose"),
+    "people": ("relationship", "partner", "friend", "family", "mom", "dad"),
+    "close_relationships": ("family", "relationship", "partner", "friend"),
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z']+")
+
+
+def normalize_context_text(value: str) -> str:
+    return " ".join((value or "").split()).strip()
+
+
+def _combine(patterns: Iterable[re.Pattern]) -> re.Pattern:
+    # `any(p.search(s) for p in patterns)` == one search over the alternation.
+    return re.compile("|".join(f"(?:{pattern.pattern})" for pattern in patterns), re.IGNORECASE)
+
+
+def _phrase_pattern(phrases: Iterable[str]) -> re.Pattern:
+    return re.compile("|".join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True)))
+
+
+@dataclass(frozen=True)
+class ScoredMessage:
+    """A user message with every feature the heartbeat ranking needs."""
+    text: str
+    score: int
+    is_current_events: bool
+    has_high_priority: bool
+    is_low_value: bool
+    topics: frozenset = frozenset()
+
+
+class HeartbeatContextScorer:
+    """Single-pass scorer for heartbeat context messages."""
+
+    def __init__(self):
+        self._current_events = _combine(HEARTBEAT_CURRENT_EVENTS_PATTERNS)
+        self._low_value = _combine(HEARTBEAT_LOW_VALUE_PATTERNS)
+        self._reflective = _phrase_pattern(HEARTBEAT_REFLECTIVE_PHRASES)
+        self._personal = _phrase_pattern(HEARTBEAT_PERSONAL_PHRASES)
+        # Each keyword is checked once even when several topics share it.
+        topics_by_keyword: dict[str, frozenset] = {}
+        for topic, keywords in HEARTBEAT_TOPIC_KEYWORDS.items():
+            for keyword in keywords:
+                topics_by_keyword[keyword] = topics_by_keyword.get(keyword, frozenset()) | {topic}
+        self._topic_keywords = tuple(topics_by_keyword.items())
+
+    def topics(self, text: str) -> frozenset:
+        """Topic flags whose keywords appear anywhere in `text` (substring match)."""
+        lower = (text or "").lower()
+        found = frozenset()
+        for keyword, topics in self._topic_keywords:
+            if keyword in lower:
+                found |= topics
+        return found
+
+    def score(self, message: str) -> Optional[ScoredMessage]:
+        """All features of one message, or None when it is blank."""
+        normalized = normalize_context_text(message)
+        if not normalized:
+            return None
+        lower = normalized.lower()
+        token_list = TOKEN_PATTERN.findall(lower)
+        tokens = frozenset(token_list)
+
+        # Cheap set checks first; the regex alternations only run when they are inconclusive.
+        is_current_events = bool(tokens & HEARTBEAT_CURRENT_EVENTS_TOKENS) or bool(self._current_events.search(lower))
+        is_low_value = (
+            len(lower) < 8
+            or (
+                bool(token_list)
+                and len(token_list) <= 6
+                and sum(token in HEARTBEAT_COMMAND_TERMS for token in token_list) >= max(2, len(token_list) // 2)
+            )
+            or bool(self._low_value.search(lower))
+        )
+        priority_hits = len(tokens & HEARTBEAT_HIGH_PRIORITY_KEYWORDS)
+
+        score = 0
+        if is_low_value:
+            score -= 6
+        if is_current_events:
+            score -= 8
+        score += min(6, len(tokens & HEARTBEAT_SUPPORT_KEYWORDS) * 2)
+        score += min(8, priority_hits * 2)
+        if self._reflective.search(lower):
+            score += 2
+        if self._personal.search(lower):
+            score += 3
+        if len(tokens) >= 8:
+            score += 1
+        if tokens & HEARTBEAT_CLINICAL_KEYWORDS:
+            score += 2
+
+        return ScoredMessage(
+            text=normalized,
+            score=score,
+            is_current_events=is_current_events,
+            has_high_priority=priority_hits > 0,
+            is_low_value=is_low_value,
+            topics=self.topics(lower),
+        )
+
+    def score_many(self, messages: Iterable[str]) -> list[ScoredMessage]:
+        """Score a batch, dropping blank messages."""
+        scored = (self.score(message) for message in messages)
+        return [item for item in scored if item is not None]
@@ -0,0 +1,184 @@
+"""Concurrent, rate-limited delivery for the daily heartbeat fan-out.
+
+Scheduled check-ins are delivered by a small pool of concurrent workers.
+Every Telegram send first takes a token from a global bucket (the Bot API
+allows roughly 30 messages per second per bot) and from a per-chat bucket
+(about one message per second in a private chat, 20 per minute in a group).
+A 429 `RetryAfter` pauses all sends for the period Telegram asks for, then
+the send is retried; transient network errors back off exponentially.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable
+
+from telegram.error import NetworkError, RetryAfter, TimedOut
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GLOBAL_RATE = 25.0  # a little under Telegram's ~30/s so user replies still get through
+PRIVATE_CHAT_RATE = 1.0
+GROUP_CHAT_RATE = 20 / 60
+
+
+class TokenBucket:
+    """Classic token bucket; `acquire` waits until a token is available."""
+
+    def __init__(self, rate: float, capacity: float | None = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def is_full(self) -> bool:
+        self._refill()
+        return self._tokens >= self.capacity
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class TelegramRateLimiter:
+    """Global plus per-chat token buckets, with a shared pause after a 429."""
+
+    def __init__(self, global_rate: float = DEFAULT_GLOBAL_RATE, *, max_idle_chats: int = 1000):
+        self.global_bucket = TokenBucket(global_rate)
+        self.max_idle_chats = max_idle_chats
+        self._chat_buckets: Dict[Hashable, TokenBucket] = {}
+        self._paused_until = 0.0
+
+    def _chat_bucket(self, chat_id: Hashable) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.max_idle_chats:
+                # Full buckets carry no state worth keeping.
+                for key in [key for key, item in self._chat_buckets.items() if item.is_full]:
+                    del self._chat_buckets[key]
+            is_group = str(chat_id).startswith("-")
+            bucket = TokenBucket(GROUP_CHAT_RATE if is_group else PRIVATE_CHAT_RATE, capacity=1)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, chat_id: Hashable) -> None:
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self._chat_bucket(chat_id).acquire()
+        await self.global_bucket.acquire()
+
+
+async def send_with_retry(
+    send: Callable[..., Awaitable[Any]],
+    *,
+    limiter: TelegramRateLimiter,
+    chat_id: Hashable,
+    max_retries: int = 3,
+    base_backoff: float = 1.0,
+    on_retry: Callable[[], None] | None = None,
+    **kwargs,
+) -> Any:
+    """Call `send(chat_id=..., **kwargs)` under the limiter, retrying 429s and transient errors."""
+    attempt = 0
+    while True:
+        await limiter.acquire(chat_id)
+        try:
+            return await send(chat_id=chat_id, **kwargs)
+        except RetryAfter as exc:
+            if attempt >= max_retries:
+                raise
+            wait = float(exc.retry_after) + random.uniform(0, 0.5)
+            limiter.pause(wait)
+            logger.warning("Telegram flood control on chat %s; retrying in %.1fs", chat_id, wait)
+        except (TimedOut, NetworkError) as exc:
+            if attempt >= max_retries:
+                raise
+            wait = base_backoff * (2 ** attempt) + random.uniform(0, base_backoff)
+            logger.warning("Transient Telegram error on chat %s (%s); retrying in %.1fs", chat_id, exc, wait)
+            await asyncio.sleep(wait)
+        attempt += 1
+        if on_retry:
+            on_retry()
+
+
+@dataclass
+class DeliveryReport:
+    """Outcome of one heartbeat cycle."""
+    due: int = 0
+    sent: int = 0
+    skipped: int = 0
+    failed: int = 0
+    retries: int = 0
+    duration_seconds: float = 0.0
+    failed_user_ids: list = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        payload = asdict(self)
+        payload["duration_seconds"] = round(self.duration_seconds, 3)
+        return payload
+
+
+class HeartbeatDeliveryEngine:
+    """Runs per-user deliveries with bounded concurrency and reports the outcome."""
+
+    def __init__(self, *, max_concurrency: int = 8, limiter: TelegramRateLimiter | None = None):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.limiter = limiter or TelegramRateLimiter()
+        self.last_report: DeliveryReport | None = None
+        self._current: DeliveryReport | None = None
+
+    def record_retry(self) -> None:
+        if self._current is not None:
+            self._current.retries += 1
+
+    async def send(self, send: Callable[..., Awaitable[Any]], *, chat_id: Hashable, **kwargs) -> Any:
+        return await send_with_retry(send, limiter=self.limiter, chat_id=chat_id, on_retry=self.record_retry, **kwargs)
+
+    async def run(self, user_ids: Iterable[int], deliver: Callable[[int], Awaitable[bool]]) -> DeliveryReport:
+        """Deliver to every user; `deliver` returns True when sent, False when skipped."""
+        user_ids = list(user_ids)
+        report = DeliveryReport(due=len(user_ids))
+        self._current = report
+        slots = asyncio.Semaphore(self.max_concurrency)
+        started = time.perf_counter()
+
+        async def _one(user_id: int) -> None:
+            async with slots:
+                try:
+                    if await deliver(user_id):
+                        report.sent += 1
+                    else:
+                        report.skipped += 1
+                except Exception as exc:
+                    report.failed += 1
+                    report.failed_user_ids.append(user_id)
+                    logger.error("Daily heartbeat delivery failed for user %s: %s", user_id, exc)
+
+        try:
+            await asyncio.gather(*(_one(user_id) for user_id in user_ids))
+        finally:
+            report.duration_seconds = time.perf_counter() - started
+            self._current = None
+            self.last_report = report
+        return report
@@ -0,0 +1,149 @@
+"""Rolling per-user digest of the context the daily heartbeat is built from.
+
+`build_daily_heartbeat_message` needs the user's recent messages scored for
+support relevance, yesterday's journal entries and a few topic flags. Doing
+that at send time means a burst of history/journal reads and regex scoring
+for every user at once. The digest instead scores each message as it is
+stored and remembers recent journal entries, so the morning build is a
+lookup plus a cheap ranking over precomputed features.
+
+The digest mirrors the conversation window (`MAX_HISTORY_LENGTH` turns of
+any role) and is process-local: a user with no digest, or one invalidated
+by a clear or a failed write, is rebuilt from storage on the next build.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from heartbeat_context import ScoredMessage
+
+# Keep journal entries for this many recent local dates per user.
+JOURNAL_DAYS_KEPT = 3
+
+
+@dataclass(frozen=True)
+class DigestJournalEntry:
+    text: str
+    topics: frozenset = frozenset()
+
+
+@dataclass
+class HeartbeatDigest:
+    # One slot per conversation turn; None for turns that are not user messages.
+    turns: deque
+    journal: dict[str, list[DigestJournalEntry]] = field(default_factory=dict)
+    # Journal entries are complete for this local date onwards.
+    journal_complete_from: str = ""
+
+    def messages(self) -> list[ScoredMessage]:
+        return [turn for turn in self.turns if turn is not None]
+
+
+class HeartbeatDigestStore:
+    """LRU of per-user heartbeat digests, kept current as turns and journal entries arrive.
+
+    Uses the same versioning as `ConversationWindowCache`: a rebuild records
+    the version before reading storage and `put` ignores it if a write
+    landed in the meantime.
+    """
+
+    def __init__(
+        self,
+        score_message: Callable[[str], Optional[ScoredMessage]],
+        topics_for: Callable[[str], frozenset],
+        *,
+        window: int = 10,
+        max_users: int = 1000,
+    ):
+        self._score_message = score_message
+        self._topics_for = topics_for
+        self.window = max(1, int(window))
+        self.max_users = max(1, int(max_users))
+        self._digests: OrderedDict[int, HeartbeatDigest] = OrderedDict()
+        self._versions: dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    def _bump(self, user_id: int) -> None:
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def journal_entry(self, text: str) -> DigestJournalEntry:
+        return DigestJournalEntry(text=text, topics=self._topics_for(text))
+
+    def get(self, user_id: int) -> HeartbeatDigest | None:
+        digest = self._digests.get(user_id)
+        if digest is None:
+            self.misses += 1
+            return None
+        self._digests.move_to_end(user_id)
+        self.hits += 1
+        return digest
+
+    def build(self, history: list[dict], journal: dict[str, list[str]], journal_complete_from: str) -> HeartbeatDigest:
+        """Build a digest from a conversation window and journal entries read from storage."""
+        turns: deque = deque(maxlen=self.window)
+        for item in history[-self.window:]:
+            turns.append(self._score_message(item.get("content") or "") if item.get("role") == "user" else None)
+        digest = HeartbeatDigest(turns=turns, journal_complete_from=journal_complete_from)
+        for local_date in sorted(journal):
+            digest.journal[local_date] = [self.journal_entry(text) for text in journal[local_date]]
+        return digest
+
+    def put(self, user_id: int, digest: HeartbeatDigest, version: int | None = None) -> bool:
+        """Cache a freshly built digest unless a write landed while it was loading."""
+        if version is not None and version != self.version(user_id):
+            return False
+        self._digests[user_id] = digest
+        self._digests.move_to_end(user_id)
+        while len(self._digests) > self.max_users:
+            evicted_user_id, _ = self._digests.popitem(last=False)
+            self._versions.pop(evicted_user_id, None)
+        return True
+
+    def record_turn(self, user_id: int, role: str, content: str) -> None:
+        """Score a newly stored turn into the user's digest, if they have one."""
+        self._bump(user_id)
+        digest = self._digests.get(user_id)
+        if digest is not None:
+            digest.turns.append(self._score_message(content) if role == "user" else None)
+
+    def record_journal(self, user_id: int, local_date: str, text: str) -> None:
+        self._bump(user_id)
+        digest = self._digests.get(user_id)
+        if digest is None or local_date < digest.journal_complete_from:
+            return
+        digest.journal.setdefault(local_date, []).append(self.journal_entry(text))
+        while len(digest.journal) > JOURNAL_DAYS_KEPT:
+            oldest = min(digest.journal)
+            del digest.journal[oldest]
+            digest.journal_complete_from = max(digest.journal_complete_from, min(digest.journal))
+
+    def journal_for(self, digest: HeartbeatDigest, local_date: str) -> list[DigestJournalEntry] | None:
+        """Entries for `local_date`, or None when the digest cannot vouch for that day."""
+        if not digest.journal_complete_from or local_date < digest.journal_complete_from:
+            return None
+        return list(digest.journal.get(local_date, []))
+
+    def invalidate(self, user_id: int) -> None:
+        self._bump(user_id)
+        self._digests.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._digests.clear()
+        self._versions.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._digests),
+            "max_users": self.max_users,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,237 @@
+"""Event-driven scheduler for the daily heartbeat.
+
+Each user gets a next fire time computed from their own timezone and
+preferred hour (stored in preferences, falling back to the server defaults)
+plus a stable per-user offset inside a spread window, so a large cohort does
+not all land in the same minute. Fire times live in a min-heap; the loop
+sleeps until the earliest one is due (or until `reschedule` wakes it), pops
+every user that is due, hands them to the delivery callback grouped by their
+local date (with the timezone each was scheduled in, so delivery does not
+look it up again). The delivery callback returns the users it is done with
+(sent, or skipped because nothing is due); those move on to their next local
+day. Everyone else, including a whole batch whose callback raised, is tried
+again `retry_seconds` later for as long as their send window is still open.
+
+Rescheduling is lazy: a per-user generation counter invalidates older heap
+entries instead of searching the heap for them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+# Heap entries due within this many seconds of each other are fired as one batch.
+BATCH_TOLERANCE_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class UserSchedule:
+    """Where and when one user wants their daily check-in."""
+    timezone: ZoneInfo
+    hour: int
+
+
+def spread_offset_minutes(user_id: int, spread_minutes: int) -> int:
+    """Stable per-user offset in [0, spread_minutes) so sends fan out over the window."""
+    if spread_minutes <= 1:
+        return 0
+    return zlib.crc32(str(user_id).encode("utf-8")) % spread_minutes
+
+
+def next_fire_time(
+    user_id: int,
+    schedule: UserSchedule,
+    now: datetime,
+    *,
+    spread_minutes: int = 0,
+    window_minutes: int = 15,
+    skip_local_date: Optional[str] = None,
+) -> Tuple[datetime, str]:
+    """Return `(fire_at_utc, local_date)` for the user's next check-in.
+
+    If `now` is already inside today's send window the user fires immediately
+    (catch-up after a restart); a window that has fully passed rolls over to
+    the next local day. `skip_local_date` forces the day after a completed send.
+    """
+    tz = schedule.timezone
+    local_now = now.astimezone(tz)
+    offset = timedelta(minutes=spread_offset_minutes(user_id, spread_minutes))
+    window = timedelta(minutes=max(1, window_minutes))
+
+    for days_ahead in range(3):
+        day: date = local_now.date() + timedelta(days=days_ahead)
+        local_date = day.isoformat()
+        if local_date == skip_local_date:
+            continue
+        fire_at = datetime.combine(day, time(schedule.hour), tzinfo=tz) + offset
+        if local_now < fire_at + window:
+            return max(fire_at, local_now).astimezone(timezone.utc), local_date
+    raise RuntimeError(f"Could not compute a heartbeat fire time for user {user_id}")
+
+
+class HeartbeatScheduler:
+    """Min-heap of per-user fire times with lazy invalidation."""
+
+    def __init__(
+        self,
+        *,
+        resolve_schedule: Callable[[int], Awaitable[UserSchedule]],
+        fire: Callable[[str, Dict[int, ZoneInfo]], Awaitable[Iterable[int]]],
+        spread_minutes: int = 0,
+        window_minutes: int = 15,
+        retry_seconds: float = 60.0,
+        max_sleep_seconds: float = 3600.0,
+        clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+    ):
+        self._resolve_schedule = resolve_schedule
+        self._fire = fire
+        self.spread_minutes = max(0, int(spread_minutes))
+        self.window_minutes = max(1, int(window_minutes))
+        self.retry_seconds = max(1.0, float(retry_seconds))
+        self.max_sleep_seconds = max(1.0, float(max_sleep_seconds))
+        self._clock = clock
+        self._heap: List[Tuple[float, int, int, str]] = []
+        self._generation: Dict[int, int] = {}
+        self._timezones: Dict[int, ZoneInfo] = {}
+        self._wake = asyncio.Event()
+        self.fired_batches = 0
+        self.retried_users = 0
+
+    def __len__(self) -> int:
+        return len(self._generation)
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._generation
+
+    async def schedule(
+        self,
+        user_id: int,
+        *,
+        skip_local_date: Optional[str] = None,
+        retry_local_date: Optional[str] = None,
+    ) -> datetime:
+        """(Re)compute the user's next fire time and push it onto the heap.
+
+        `retry_local_date` retries an undelivered day `retry_seconds` from now,
+        or moves on to the next day if its window will have closed by then.
+        """
+        user_schedule = await self._resolve_schedule(user_id)
+        now = self._clock()
+        if retry_local_date is not None:
+            now += timedelta(seconds=self.retry_seconds)
+        fire_at, local_date = next_fire_time(
+            user_id,
+            user_schedule,
+            now,
+            spread_minutes=self.spread_minutes,
+            window_minutes=self.window_minutes,
+            skip_local_date=skip_local_date,
+        )
+        if retry_local_date is not None:
+            if local_date == retry_local_date:
+                self.retried_users += 1
+            else:
+                logger.warning(
+                    "Daily heartbeat for user %s on %s not delivered before its window closed", user_id, retry_local_date
+                )
+        generation = self._generation.get(user_id, 0) + 1
+        self._generation[user_id] = generation
+        self._timezones[user_id] = user_schedule.timezone
+        heapq.heappush(self._heap, (fire_at.timestamp(), user_id, generation, local_date))
+        return fire_at
+
+    async def reschedule(self, user_id: int) -> datetime:
+        """Pick up a changed hour/timezone and wake the loop if it is now due sooner."""
+        fire_at = await self.schedule(user_id)
+        self._wake.set()
+        return fire_at
+
+    def unschedule(self, user_id: int) -> None:
+        self._generation.pop(user_id, None)
+        self._timezones.pop(user_id, None)
+
+    def _drop_stale(self) -> None:
+        while self._heap:
+            _, user_id, generation, _ = self._heap[0]
+            if self._generation.get(user_id) == generation:
+                return
+            heapq.heappop(self._heap)
+
+    def next_fire_at(self) -> Optional[datetime]:
+        self._drop_stale()
+        if not self._heap:
+            return None
+        return datetime.fromtimestamp(self._heap[0][0], tz=timezone.utc)
+
+    def pop_due(self) -> Dict[str, Dict[int, ZoneInfo]]:
+        """Remove every user due now, grouped by local date and mapped to their timezone."""
+        cutoff = self._clock().timestamp() + BATCH_TOLERANCE_SECONDS
+        due: Dict[str, Dict[int, ZoneInfo]] = {}
+        while True:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > cutoff:
+                return due
+            _, user_id, _, local_date = heapq.heappop(self._heap)
+            due.setdefault(local_date, {})[user_id] = self._timezones[user_id]
+
+    async def run_due(self) -> int:
+        """Fire every due batch; delivered users move to their next local day, the rest retry."""
+        fired = 0
+        for local_date, timezones in self.pop_due().items():
+            done: set = set()
+            try:
+                done = set(await self._fire(local_date, timezones))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Daily heartbeat batch for %s failed: %s", local_date, e)
+            self.fired_batches += 1
+            fired += len(timezones)
+            for user_id in timezones:
+                if user_id not in self._generation:
+                    continue
+                if user_id in done:
+                    await self.schedule(user_id, skip_local_date=local_date)
+                else:
+                    await self.schedule(user_id, retry_local_date=local_date)
+        return fired
+
+    def seconds_until_next(self) -> float:
+        next_at = self.next_fire_at()
+        if next_at is None:
+            return self.max_sleep_seconds
+        delay = (next_at - self._clock()).total_seconds()
+        return min(self.max_sleep_seconds, max(0.0, delay))
+
+    async def run(self, user_ids: Iterable[int]) -> None:
+        """Schedule `user_ids` and fire them forever; cancel the task to stop."""
+        for user_id in user_ids:
+            try:
+                await self.schedule(user_id)
+            except Exception as e:
+                logger.error("Could not schedule daily heartbeat for user %s: %s", user_id, e)
+        while True:
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.seconds_until_next())
+            except asyncio.TimeoutError:
+                pass
+            await self.run_due()
+
+    def stats(self) -> Dict[str, Any]:
+        next_at = self.next_fire_at()
+        return {
+            "scheduled_users": len(self._generation),
+            "next_fire_at": next_at.isoformat() if next_at else None,
+            "fired_batches": self.fired_batches,
+            "retried_users": self.retried_users,
+        }
@@ -0,0 +1,359 @@
+"""Dry-run and load simulation for the daily heartbeat.
+
+Runs the path the heartbeat leader runs in production: a `HeartbeatScheduler`
+configured like the real one, firing `deliver_daily_heartbeat_batch` (due
+query, claim, verse, message build, rate-limited sends, tracking) against a
+synthetic population in an in-memory store and a fake Telegram bot, so a day
+of check-ins can be measured without sending anything. The scheduler's clock
+is stepped from one fire time to the next instead of sleeping, so users are
+spread over `DAILY_HEARTBEAT_SPREAD_MINUTES` and grouped by their own
+timezone exactly as they would be live. Every storage call is counted, the
+main stages are timed, and the result is a throughput report for sizing
+`DAILY_HEARTBEAT_WINDOW_MINUTES` before a rollout.
+
+The bot's module globals are swapped for the duration of a run and restored
+afterwards; synthetic users live in their own id range and are evicted from
+the in-process caches when the run ends.
+
+    python scripts/simulate_heartbeat.py --users 500 --history 30 --journal-density 0.4
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple
+
+import bot
+from heartbeat_delivery import DeliveryReport, HeartbeatDeliveryEngine, TelegramRateLimiter
+from heartbeat_scheduler import HeartbeatScheduler
+from postgres_db import InMemoryDatabase, Message
+from verse_of_the_day import VerseOfTheDay
+
+SYNTHETIC_USER_ID_BASE = 9_000_000_000
+SIMULATED_VERSE = VerseOfTheDay(text="Be still, and know that I am God.", reference="Psalm 46:10", version="NIV")
+# Instrumented bot functions, in pipeline order.
+STAGES = (
+    "get_daily_heartbeat_due_user_ids",
+    "claim_daily_heartbeat",
+    "get_verse_of_the_day",
+    "build_daily_heartbeat_message",
+    "send_heartbeat_message",
+    "set_daily_summary_tracking",
+)
+# Store calls that only append to a write buffer; the flush that follows is the round trip.
+BUFFERED_CALLS = frozenset({"store_message", "queue_daily_checkin"})
+USER_LINES = (
+    "I've been so tired and my sleep is a mess",
+    "Work deadline stress again, barely slept",
+    "Family dinner was tense and I felt lonely",
+    "My therapist said to journal when I feel overwhelmed",
+    "search the web for bitcoin price",
+    "Had a nice walk in the park with the dog",
+    "what's happening in the news today",
+    "My meds make me drowsy and my mood is flat",
+)
+JOURNAL_LINES = (
+    "Felt tired and stressed after work.",
+    "Good day, calmer than expected.",
+    "Argued with my partner, need rest.",
+    "Skipped my meds, anxious evening.",
+)
+
+
+@dataclass
+class PopulationSpec:
+    """Shape of the synthetic user population."""
+    users: int = 200
+    history_messages: int = 20
+    journal_density: float = 0.5
+    opted_out_ratio: float = 0.0
+    pending_ratio: float = 0.0
+    # Timezone names users are spread across; empty keeps everyone on the server default.
+    timezones: Tuple[str, ...] = ()
+    seed: int = 7
+
+
+class FakeTelegramBot:
+    """Accepts `send_message` calls like the Bot API would, after an optional delay."""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.sent: List[tuple] = []
+        self._message_ids = itertools.count(1)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        self.sent.append((chat_id, text))
+        return SimpleNamespace(message_id=next(self._message_ids), chat_id=chat_id)
+
+
+class CountingStore:
+    """Wraps a store, counting (and optionally delaying) every async call."""
+
+    def __init__(self, inner, latency_seconds: float = 0.0):
+        self._inner = inner
+        self.latency_seconds = latency_seconds
+        self.calls: Counter = Counter()
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        async def _counted(*args, **kwargs):
+            self.calls[name] += 1
+            if self.latency_seconds:
+                await asyncio.sleep(self.latency_seconds)
+            return await attr(*args, **kwargs)
+
+        return _counted
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def wrap(self, name: str, fn):
+        async def _timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.samples[name].append(time.perf_counter() - started)
+
+        return _timed
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for name in STAGES:
+            samples = sorted(self.samples.get(name, []))
+            if not samples:
+                continue
+            result[name] = {
+                "calls": len(samples),
+                "total_ms": round(sum(samples) * 1000, 2),
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+                "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 3),
+            }
+        return result
+
+
+@dataclass
+class SimulationReport:
+    users: int
+    due: int
+    sent: int
+    skipped: int
+    failed: int
+    messages_sent: int
+    wall_seconds: float
+    window_minutes: int
+    spread_minutes: int = 0
+    batches: int = 0
+    largest_batch: int = 0
+    stages: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    store_calls: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def round_trips(self) -> int:
+        return sum(count for name, count in self.store_calls.items() if name not in BUFFERED_CALLS)
+
+    @property
+    def users_per_second(self) -> float:
+        return self.sent / self.wall_seconds if self.wall_seconds else 0.0
+
+    def minutes_for(self, users: int) -> float:
+        """Minutes a cycle for `users` due users would take at the measured throughput."""
+        return users / self.users_per_second / 60 if self.users_per_second else float("inf")
+
+    def as_dict(self) -> Dict[str, Any]:
+        payload = asdict(self)
+        payload["wall_seconds"] = round(self.wall_seconds, 3)
+        payload["users_per_second"] = round(self.users_per_second, 2)
+        payload["round_trips"] = self.round_trips
+        return payload
+
+    def format(self, project_users: int | None = None) -> str:
+        lines = [
+            f"Heartbeat dry run: {self.users} users, {self.due} due, {self.batches} batches (largest {self.largest_batch})",
+            f"  sent {self.sent}, skipped {self.skipped}, failed {self.failed}, {self.messages_sent} Telegram messages",
+            f"  wall time {self.wall_seconds:.2f}s, {self.users_per_second:.1f} users/s",
+            "",
+            f"  {'stage':<34}{'calls':>7}{'total ms':>11}{'mean ms':>10}{'p95 ms':>10}",
+        ]
+        for name, stats in self.stages.items():
+            lines.append(
+                f"  {name:<34}{stats['calls']:>7}{stats['total_ms']:>11.1f}{stats['mean_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+            )
+        lines.append("")
+        lines.append(f"  store calls: {sum(self.store_calls.values())} total, {self.round_trips} round trips")
+        for name, count in sorted(self.store_calls.items(), key=lambda item: -item[1]):
+            note = "  buffered" if name in BUFFERED_CALLS else ""
+            lines.append(f"    {name:<40}{count:>7}  ({count / max(1, self.due):.2f}/user){note}")
+        lines.append("")
+        # Users sharing a timezone and hour are spread over the spread minutes, and the last
+        # of them still has a full window, so that cohort has spread + window minutes.
+        budget = self.spread_minutes + self.window_minutes
+        for users in sorted({self.due, project_users or self.due}):
+            lines.append(
+                f"  {users} users in one timezone need ~{self.minutes_for(users):.1f} min "
+                f"(spread {self.spread_minutes} + window {self.window_minutes} = {budget} min)"
+            )
+        return "\n".join(lines)
+
+
+async def seed_population(store: InMemoryDatabase, spec: PopulationSpec, local_date: str) -> List[int]:
+    """Fill `store` with synthetic users and return their ids."""
+    rng = random.Random(spec.seed)
+    yesterday = (datetime.strptime(local_date, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+    started = datetime.strptime(yesterday, "%Y-%m-%d")
+    user_ids = [SYNTHETIC_USER_ID_BASE + index for index in range(spec.users)]
+    for user_id in user_ids:
+        for index in range(spec.history_messages):
+            role = "user" if index % 2 == 0 else "assistant"
+            content = rng.choice(USER_LINES) if role == "user" else "Thanks for telling me. What would help right now?"
+            await store.store_message(Message(
+                user_id=user_id,
+                content=content,
+                role=role,
+                timestamp=started + timedelta(minutes=index),
+                message_id=f"sim_{user_id}_{index}",
+            ))
+        if rng.random() < spec.journal_density:
+            await store.append_journal_entry(user_id=user_id, local_date=yesterday, entry_text=rng.choice(JOURNAL_LINES))
+        if spec.timezones:
+            await store.store_user_preference(user_id, "daily_heartbeat_timezone", rng.choice(spec.timezones))
+        if rng.random() < spec.opted_out_ratio:
+            await store.store_user_preference(user_id, "daily_heartbeat_enabled", False)
+        elif rng.random() < spec.pending_ratio:
+            await store.upsert_daily_checkin(user_id, yesterday, True, sent_at=started)
+    return user_ids
+
+
+class _Swap:
+    """Temporarily replace attributes, restoring them in reverse order."""
+
+    def __init__(self):
+        self._saved: List[tuple] = []
+
+    def set(self, target, name: str, value) -> None:
+        self._saved.append((target, name, getattr(target, name)))
+        setattr(target, name, value)
+
+    def restore(self) -> None:
+        while self._saved:
+            target, name, value = self._saved.pop()
+            setattr(target, name, value)
+
+
+def _forget_users(user_ids: List[int]) -> None:
+    for user_id in user_ids:
+        bot.history_cache.invalidate(user_id)
+        bot.heartbeat_digests.invalidate(user_id)
+        bot.user_journey.pop(user_id, None)
+        bot.daily_journals.pop(user_id, None)
+        bot.daily_summary_tracking.pop(user_id, None)
+
+
+async def run_heartbeat_simulation(
+    spec: PopulationSpec,
+    *,
+    now: datetime | None = None,
+    global_rate: float | None = None,
+    concurrency: int | None = None,
+    send_latency_seconds: float = 0.0,
+    store_latency_seconds: float = 0.0,
+    warm_digests: bool = False,
+) -> SimulationReport:
+    """Dry-run one day of scheduled check-ins, starting at `now`, over a synthetic population."""
+    tz = bot.get_daily_heartbeat_timezone()
+    now = now or datetime.now(tz).replace(hour=bot.DAILY_HEARTBEAT_HOUR, minute=0, second=0, microsecond=0)
+    local_date = now.astimezone(tz).strftime("%Y-%m-%d")
+
+    inner = InMemoryDatabase()
+    user_ids = await seed_population(inner, spec, local_date)
+    store = CountingStore(inner, latency_seconds=store_latency_seconds)
+    fake_bot = FakeTelegramBot(latency_seconds=send_latency_seconds)
+    engine = HeartbeatDeliveryEngine(
+        max_concurrency=concurrency or bot.HEARTBEAT_DELIVERY_CONCURRENCY,
+        limiter=TelegramRateLimiter(global_rate or bot.TELEGRAM_GLOBAL_SEND_RATE),
+    )
+    timer = StageTimer()
+    batch_reports: List[DeliveryReport] = []
+    clock = {"now": now.astimezone(timezone.utc)}
+
+    async def _fixed_verse():
+        return SIMULATED_VERSE
+
+    async def _run_and_record(targets, deliver):
+        report = await engine_run(targets, deliver)
+        batch_reports.append(report)
+        return report
+
+    engine_run = engine.run
+    engine.run = _run_and_record
+    # Same settings the leader builds its scheduler with; only the clock is simulated.
+    scheduler = HeartbeatScheduler(
+        resolve_schedule=lambda user_id: bot.get_daily_heartbeat_user_schedule(user_id),
+        fire=lambda day, timezones: bot.deliver_daily_heartbeat_batch(day, timezones),
+        spread_minutes=bot.DAILY_HEARTBEAT_SPREAD_MINUTES,
+        window_minutes=bot.DAILY_HEARTBEAT_WINDOW_MINUTES,
+        retry_seconds=bot.DAILY_HEARTBEAT_POLL_SECONDS,
+        clock=lambda: clock["now"],
+    )
+
+    swap = _Swap()
+    try:
+        swap.set(bot, "db_manager", store)
+        swap.set(bot, "telegram_app", SimpleNamespace(bot=fake_bot))
+        swap.set(bot, "DAILY_HEARTBEAT_ENABLED", True)
+        swap.set(bot, "heartbeat_delivery", engine)
+        swap.set(bot, "get_daily_heartbeat_rollout_user_ids", lambda: list(user_ids))
+        swap.set(bot, "get_verse_of_the_day", _fixed_verse)
+        for name in STAGES:
+            swap.set(bot, name, timer.wrap(name, getattr(bot, name)))
+
+        if warm_digests:
+            yesterday = (now.astimezone(tz) - timedelta(days=1)).strftime("%Y-%m-%d")
+            for user_id in user_ids:
+                await bot.get_heartbeat_digest(user_id, yesterday)
+            store.calls.clear()
+
+        started = time.perf_counter()
+        for user_id in bot.get_daily_heartbeat_rollout_user_ids():
+            await scheduler.schedule(user_id)
+        # Step the clock to each fire time in the next day instead of sleeping until it.
+        day_ends = clock["now"] + timedelta(days=1)
+        next_at = scheduler.next_fire_at()
+        while next_at is not None and next_at < day_ends:
+            clock["now"] = next_at
+            await scheduler.run_due()
+            next_at = scheduler.next_fire_at()
+        wall_seconds = time.perf_counter() - started
+    finally:
+        swap.restore()
+        _forget_users(user_ids)
+
+    return SimulationReport(
+        users=spec.users,
+        due=sum(report.due for report in batch_reports),
+        sent=sum(report.sent for report in batch_reports),
+        skipped=sum(report.skipped for report in batch_reports),
+        failed=sum(report.failed for report in batch_reports),
+        messages_sent=len(fake_bot.sent),
+        wall_seconds=wall_seconds,
+        window_minutes=bot.DAILY_HEARTBEAT_WINDOW_MINUTES,
+        spread_minutes=bot.DAILY_HEARTBEAT_SPREAD_MINUTES,
+        batches=len(batch_reports),
+        largest_batch=max((report.due for report in batch_reports), default=0),
+        stages=timer.summary(),
+        store_calls=dict(store.calls),
+    )
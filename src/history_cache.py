@@ -0,0 +1,86 @@
+"""In-process cache of each active user's recent conversation window.
+
+`get_history` is called on every text message, voice note and heartbeat
+build, always for the same last `MAX_HISTORY_LENGTH` turns. The cache keeps
+that window per user in an LRU, is appended to as turns are stored and is
+dropped on clear, so steady-state chat never re-reads history from Postgres.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+
+
+class ConversationWindowCache:
+    """LRU of per-user conversation windows with hit/miss counters.
+
+    Every write or invalidation bumps a per-user version. A reader that
+    misses records the version before loading from storage and passes it to
+    `put`, which ignores the load if the window changed in the meantime.
+    """
+
+    def __init__(self, *, max_users: int = 1000, window: int = 10):
+        self.max_users = max(1, int(max_users))
+        self.window = max(1, int(window))
+        self._windows: OrderedDict[int, deque] = OrderedDict()
+        self._versions: dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def version(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    def _bump(self, user_id: int) -> None:
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def get(self, user_id: int) -> list[dict[str, str]] | None:
+        """Return a copy of the cached window, or None on a miss."""
+        turns = self._windows.get(user_id)
+        if turns is None:
+            self.misses += 1
+            return None
+        self._windows.move_to_end(user_id)
+        self.hits += 1
+        return [dict(turn) for turn in turns]
+
+    def put(self, user_id: int, turns: list[dict[str, str]], version: int | None = None) -> bool:
+        """Cache a window loaded from storage unless it went stale while loading."""
+        if version is not None and version != self.version(user_id):
+            return False
+        self._windows[user_id] = deque(
+            ({"role": turn["role"], "content": turn["content"]} for turn in turns),
+            maxlen=self.window,
+        )
+        self._windows.move_to_end(user_id)
+        while len(self._windows) > self.max_users:
+            evicted_user_id, _ = self._windows.popitem(last=False)
+            self._versions.pop(evicted_user_id, None)
+            self.evictions += 1
+        return True
+
+    def append(self, user_id: int, role: str, content: str) -> None:
+        """Record a newly stored turn; uncached users stay uncached."""
+        self._bump(user_id)
+        turns = self._windows.get(user_id)
+        if turns is not None:
+            turns.append({"role": role, "content": content})
+
+    def invalidate(self, user_id: int) -> None:
+        self._bump(user_id)
+        self._windows.pop(user_id, None)
+
+    def clear(self) -> None:
+        self._windows.clear()
+        self._versions.clear()
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._windows),
+            "max_users": self.max_users,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,138 @@
+"""Shared async OpenAI gateway for MindMate.
+
+Every handler talks to OpenAI through one `AsyncOpenAI` client backed by a
+pooled `httpx.AsyncClient`, so chat, transcription and speech calls never
+block the event loop. A single semaphore bounds how many requests are in
+flight per process; callers beyond that limit wait for a free slot instead of
+opening more sockets.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+import httpx
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_MAX_CONNECTIONS = 32
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 16
+DEFAULT_TIMEOUT_SECONDS = 60.0
+DEFAULT_MAX_RETRIES = 2
+
+
+class LLMGateway:
+    """Bounded-concurrency wrapper around one pooled `AsyncOpenAI` client."""
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        *,
+        client: Any = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._http_client: httpx.AsyncClient | None = None
+        if client is None:
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max(self.max_concurrency, int(max_connections)),
+                    max_keepalive_connections=max(1, int(max_keepalive_connections)),
+                ),
+                timeout=httpx.Timeout(timeout_seconds, connect=10.0),
+            )
+            client = AsyncOpenAI(api_key=api_key, http_client=self._http_client, max_retries=max_retries)
+        self.client = client
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._in_flight = 0
+        self._waiting = 0
+        self._completed = 0
+        self._failed = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the gateway's concurrency slots for the duration of a call."""
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    async def _call(self, label: str, func, **kwargs) -> Any:
+        started = time.perf_counter()
+        async with self.slot():
+            try:
+                result = await func(**kwargs)
+            except Exception:
+                self._failed += 1
+                raise
+        self._completed += 1
+        logger.debug("LLM %s finished in %.2fs", label, time.perf_counter() - started)
+        return result
+
+    async def chat_completion(self, **kwargs) -> Any:
+        """Create a chat completion without blocking the event loop."""
+        return await self._call("chat", self.client.chat.completions.create, **kwargs)
+
+    async def stream_chat_completion(self, **kwargs) -> AsyncIterator[str]:
+        """Yield the text deltas of a streamed chat completion.
+
+        The slot is held until the stream is exhausted or the caller stops
+        iterating, since the connection stays busy for the whole response.
+        """
+        started = time.perf_counter()
+        async with self.slot():
+            try:
+                stream = await self.client.chat.completions.create(stream=True, **kwargs)
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        yield delta
+            except Exception:
+                self._failed += 1
+                raise
+        self._completed += 1
+        logger.debug("LLM chat stream finished in %.2fs", time.perf_counter() - started)
+
+    async def transcribe(self, **kwargs) -> Any:
+        """Transcribe audio with the shared client."""
+        return await self._call("transcription", self.client.audio.transcriptions.create, **kwargs)
+
+    async def synthesize_speech(self, **kwargs) -> Any:
+        """Synthesize speech with the shared client."""
+        return await self._call("speech", self.client.audio.speech.create, **kwargs)
+
+    async def embed(self, **kwargs) -> Any:
+        """Create embeddings with the shared client."""
+        return await self._call("embeddings", self.client.embeddings.create, **kwargs)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "completed": self._completed,
+            "failed": self._failed,
+        }
+
+    async def close(self) -> None:
+        """Release pooled connections owned by this gateway."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
@@ -0,0 +1,261 @@
+"""Embedding-based long-term memory recall for MindMate.
+
+User messages and journal entries are embedded once and stored next to the
+rows they came from (`mindmate_memory_embeddings`). On recall, a user's
+vectors are loaded into a NumPy index that stays warm in an LRU, and the
+query is matched by cosine similarity: brute force for small histories,
+an inverted-file (IVF) index over k-means cells once a user has enough
+vectors that a full scan starts to cost.
+
+Embedding providers are pluggable. `HashingEmbedder` is deterministic and
+fully local (good for tests and offline runs); `OpenAIEmbedder` calls the
+embeddings endpoint through the shared LLM gateway.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Protocol, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIMENSIONS = 256
+IVF_MIN_VECTORS = 2048
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+class EmbeddingProvider(Protocol):
+    """Turns texts into L2-normalised float32 row vectors."""
+    model: str
+    dimensions: int
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    """Deterministic local embedder using signed feature hashing of words and bigrams."""
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS):
+        self.dimensions = int(dimensions)
+        self.model = f"hashing-v1-{self.dimensions}"
+
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKEN_RE.findall((text or "").lower())
+        return tokens + [f"{left} {right}" for left, right in zip(tokens, tokens[1:])]
+
+    def embed_sync(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+                matrix[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        return _normalize_rows(matrix)
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return self.embed_sync(texts)
+
+
+class OpenAIEmbedder:
+    """Embeddings endpoint via the shared `LLMGateway`."""
+
+    def __init__(self, gateway: Any, model: str = "text-embedding-3-small", dimensions: int = DEFAULT_DIMENSIONS):
+        self.gateway = gateway
+        self.dimensions = int(dimensions)
+        self.model = f"{model}-{self.dimensions}"
+        self._api_model = model
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        response = await self.gateway.embed(model=self._api_model, input=list(texts), dimensions=self.dimensions)
+        return _normalize_rows(np.asarray([item.embedding for item in response.data], dtype=np.float32))
+
+
+def _kmeans(vectors: np.ndarray, cells: int, iterations: int = 8, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Spherical k-means; returns (centroids, assignment per vector)."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=cells, replace=False)].copy()
+    assignment = np.zeros(len(vectors), dtype=np.int64)
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for cell in range(cells):
+            members = vectors[assignment == cell]
+            if len(members):
+                centroids[cell] = members.sum(axis=0)
+        centroids = _normalize_rows(centroids)
+    return centroids, assignment
+
+
+class VectorIndex:
+    """Per-user cosine index: brute force below `ivf_min_vectors`, IVF above it."""
+
+    def __init__(self, dimensions: int, *, ivf_min_vectors: int = IVF_MIN_VECTORS, nprobe: int = 4):
+        self.dimensions = dimensions
+        self.ivf_min_vectors = ivf_min_vectors
+        self.nprobe = nprobe
+        self._vectors = np.zeros((0, dimensions), dtype=np.float32)
+        self._items: List[Dict[str, Any]] = []
+        self._keys: set = set()
+        self._centroids: Optional[np.ndarray] = None
+        self._cells: List[np.ndarray] = []
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, vectors: np.ndarray, items: Sequence[Dict[str, Any]]) -> None:
+        fresh = [index for index, item in enumerate(items) if (item["source"], item["source_id"]) not in self._keys]
+        if not fresh:
+            return
+        self._vectors = np.vstack([self._vectors, vectors[fresh]])
+        for index in fresh:
+            self._items.append(items[index])
+            self._keys.add((items[index]["source"], items[index]["source_id"]))
+        if self._centroids is not None:
+            # Route new vectors into existing cells; retrain once the index doubles.
+            start = len(self._items) - len(fresh)
+            owners = np.argmax(vectors[fresh] @ self._centroids.T, axis=1)
+            for offset, cell in enumerate(owners):
+                self._cells[cell] = np.append(self._cells[cell], start + offset)
+            if len(self._items) >= 2 * self._trained_size:
+                self._centroids = None
+
+    def _train(self) -> None:
+        cells = max(2, int(np.sqrt(len(self._items))))
+        self._centroids, assignment = _kmeans(self._vectors, cells)
+        self._cells = [np.flatnonzero(assignment == cell) for cell in range(cells)]
+        self._trained_size = len(self._items)
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        if len(self._items) < self.ivf_min_vectors:
+            return None
+        if self._centroids is None:
+            self._train()
+        nearest_cells = np.argsort(-(self._centroids @ query))[: self.nprobe]
+        return np.concatenate([self._cells[cell] for cell in nearest_cells])
+
+    def search(self, query: np.ndarray, k: int) -> List[tuple[float, Dict[str, Any]]]:
+        if not self._items or k <= 0:
+            return []
+        candidates = self._candidates(query)
+        vectors = self._vectors if candidates is None else self._vectors[candidates]
+        scores = vectors @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        positions = top if candidates is None else candidates[top]
+        return [(float(scores[index]), self._items[position]) for index, position in zip(top, positions)]
+
+
+@dataclass(slots=True)
+class RecalledMoment:
+    score: float
+    source: str
+    content: str
+    created_at: str
+
+
+class MemoryRecall:
+    """Embeds, stores and recalls a user's past moments."""
+
+    def __init__(
+        self,
+        store: Any,
+        embedder: EmbeddingProvider,
+        *,
+        max_users: int = 200,
+        min_score: float = 0.3,
+        ivf_min_vectors: int = IVF_MIN_VECTORS,
+    ):
+        self.store = store
+        self.embedder = embedder
+        self.max_users = max(1, int(max_users))
+        self.min_score = float(min_score)
+        self.ivf_min_vectors = ivf_min_vectors
+        self._indexes: OrderedDict[int, VectorIndex] = OrderedDict()
+
+    async def remember(
+        self,
+        user_id: int,
+        source: str,
+        source_id: str,
+        content: str,
+        created_at: str,
+    ) -> None:
+        """Embed one message or journal entry and persist it for later recall."""
+        vectors = await self.embedder.embed([content])
+        item = {"source": source, "source_id": str(source_id), "content": content, "created_at": created_at}
+        await self.store.store_memory_embeddings(
+            user_id,
+            self.embedder.model,
+            [dict(item, embedding=vectors[0].tobytes())],
+        )
+        index = self._indexes.get(user_id)
+        if index is not None:
+            index.add(vectors, [item])
+
+    def forget(self, user_id: int) -> None:
+        """Drop the user's warm index so the next recall reloads it from the store."""
+        self._indexes.pop(user_id, None)
+
+    async def _index_for(self, user_id: int) -> VectorIndex:
+        index = self._indexes.get(user_id)
+        if index is not None:
+            self._indexes.move_to_end(user_id)
+            return index
+        rows = await self.store.get_memory_embeddings(user_id, self.embedder.model)
+        index = VectorIndex(self.embedder.dimensions, ivf_min_vectors=self.ivf_min_vectors)
+        if rows:
+            vectors = np.vstack([np.frombuffer(row["embedding"], dtype=np.float32) for row in rows])
+            index.add(vectors, [{key: row[key] for key in ("source", "source_id", "content", "created_at")} for row in rows])
+        self._indexes[user_id] = index
+        while len(self._indexes) > self.max_users:
+            self._indexes.popitem(last=False)
+        return index
+
+    async def recall(
+        self,
+        user_id: int,
+        query: str,
+        k: int = 3,
+        exclude_contents: Sequence[str] = (),
+    ) -> List[RecalledMoment]:
+        """Return up to `k` stored moments most similar to `query`."""
+        if not (query or "").strip():
+            return []
+        index = await self._index_for(user_id)
+        if not len(index):
+            return []
+        query_vector = (await self.embedder.embed([query]))[0]
+        excluded = {text.strip() for text in exclude_contents}
+        moments: List[RecalledMoment] = []
+        for score, item in index.search(query_vector, k + len(excluded)):
+            if score < self.min_score or item["content"].strip() in excluded:
+                continue
+            moments.append(RecalledMoment(score, item["source"], item["content"], item["created_at"]))
+            if len(moments) == k:
+                break
+        return moments
+
+
+def format_recalled_moments(moments: Sequence[RecalledMoment], max_chars: int = 280) -> str:
+    lines = []
+    for moment in moments:
+        content = " ".join(moment.content.split())
+        if len(content) > max_chars:
+            content = content[: max_chars - 1].rstrip() + "…"
+        label = "journal" if moment.source == "journal" else "said"
+        lines.append(f"- [{moment.created_at[:10]}, {label}] {content}")
+    return "\n".join(lines)
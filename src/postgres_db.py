@@ -1,19 +1,81 @@
 """
 PostgreSQL Database Module for MindMate Bot
 Handles the active persistent storage path for the current runtime.
+
+psycopg2 is a blocking driver, so every query runs on a bounded thread pool
+sized to the connection pool. The event loop only awaits the result, which
+keeps Telegram updates, the webhook and the heartbeat loop responsive while a
+slow Neon round-trip is in flight.
+
+Conversation messages are written behind: `store_message` buffers rows and
+a flush turns them into one multi-row INSERT once the batch fills up or the
+flush interval elapses. Reads of a user's history overlay rows that are
+still buffered, so callers always see their own writes.
+
+Daily check-in transitions made during a heartbeat cycle are buffered the
+same way (`queue_daily_checkin`) and written in one multi-row upsert by
+`flush_daily_checkins`; check-in reads flush first.
 """
+import asyncio
 import json
 import os
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from dataclasses import dataclass
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Sequence
 import logging
 import psycopg2
-from psycopg2.extras import Json, RealDictCursor
-from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.extras import Json, RealDictCursor, execute_values
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+from db_migrations import apply_migrations
 
 logger = logging.getLogger(__name__)
 
+SEARCH_HEADLINE_OPTIONS = "StartSel=**, StopSel=**, MaxWords=24, MinWords=8, MaxFragments=2"
+# Session advisory lock held by whichever instance runs the daily heartbeat scheduler.
+HEARTBEAT_LEADER_LOCK_KEY = 0x4D4D5F484254
+# States of a claimed check-in that mean the scheduled send for that day went out.
+SCHEDULED_CHECKIN_DONE_STATUSES = ("sent", "completed", "dismissed")
+
+
+def is_scheduled_checkin_done(record: Optional[Dict[str, Any]]) -> bool:
+    """True when `record` is a day the scheduler already delivered (test sends are never claimed)."""
+    return bool(record) and bool(record.get("claimed_by")) and record.get("status") in SCHEDULED_CHECKIN_DONE_STATUSES
+
+
+def _daily_checkin_status(waiting_for_summary: bool, responded_at: Optional[datetime], status: Optional[str]) -> str:
+    if status is not None:
+        return status
+    if responded_at:
+        return "completed"
+    return "sent" if waiting_for_summary else "dismissed"
+
+
+def _daily_checkin_payload(
+    waiting_for_summary: bool,
+    sent_at: Optional[datetime],
+    responded_at: Optional[datetime],
+    prompt_message_id: Optional[Any],
+    response_message_id: Optional[Any],
+    prompt_kind: str,
+    status: str,
+    metadata: Optional[Dict[str, Any]],
+) -> Dict[str, Any]:
+    payload = {
+        "waiting_for_summary": bool(waiting_for_summary),
+        "sent_time": sent_at.isoformat() if sent_at else None,
+        "responded_at": responded_at.isoformat() if responded_at else None,
+        "message_id": str(prompt_message_id) if prompt_message_id is not None else None,
+        "response_message_id": str(response_message_id) if response_message_id is not None else None,
+        "kind": prompt_kind,
+        "status": status,
+    }
+    if metadata:
+        payload["metadata"] = dict(metadata)
+    return payload
+
 
 @dataclass
 class Message:
@@ -25,9 +87,50 @@ class Message:
     message_id: str
 
 
+class DatabaseBusyError(RuntimeError):
+    """Raised when no pooled connection frees up within the configured wait time."""
+
+
+# Failures that say nothing about the rows themselves: the batch is kept and retried later.
+TRANSIENT_DB_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, PoolError, DatabaseBusyError)
+MESSAGE_FLUSH_MAX_BACKOFF_SECONDS = 30.0
+
+
 class PostgresDatabase:
     """PostgreSQL database manager for the active production storage path."""
 
+    # Class-level defaults so lazily-built helpers also work on instances
+    # created without __init__ (e.g. in tests).
+    pool_min_size = 1
+    pool_max_size = 20
+    pool_wait_timeout = 10.0
+    _executor: Optional[ThreadPoolExecutor] = None
+    _query_slots: Optional[asyncio.Semaphore] = None
+    _queries_in_flight = 0
+    _queries_waiting = 0
+    _total_wait_seconds = 0.0
+    _max_wait_seconds = 0.0
+    _total_queries = 0
+    search_mode = "fulltext"
+    message_batch_size = 50
+    message_flush_interval = 0.25
+    _pending_messages: Optional[List[tuple]] = None
+    _flushing_messages: tuple = ()
+    _flush_lock: Optional[asyncio.Lock] = None
+    _flush_timer: Optional[asyncio.Task] = None
+    _messages_flushed = 0
+    _message_flushes = 0
+    message_buffer_limit = 5000
+    _messages_dropped = 0
+    _message_flush_failures = 0
+    checkin_batch_size = 200
+    _pending_checkins: Optional[Dict[tuple, tuple]] = None
+    _checkins_flushed = 0
+    _checkin_flushes = 0
+    # Row positions of sent_at, responded_at, prompt_message_id, response_message_id.
+    _CHECKIN_COALESCE_COLUMNS = frozenset({3, 4, 5, 6})
+    _leader_conn = None
+
     def __init__(self, db_url: str = None, openai_client=None):
         self.db_url = db_url or os.environ.get('NEON_MINDMATE_DB_URL') or os.environ.get('DATABASE_URL')
         if not self.db_url:
@@ -37,133 +140,255 @@ class PostgresDatabase:
         self.pool = None
         self.env = os.getenv("ENV", "production")
         self.prefix = f"{self.env}:" if self.env != "production" else ""
+        self.pool_min_size = max(1, int(os.getenv("DB_POOL_MIN_SIZE", "1")))
+        self.pool_max_size = max(self.pool_min_size, int(os.getenv("DB_POOL_MAX_SIZE", "20")))
+        self.pool_wait_timeout = max(0.1, float(os.getenv("DB_POOL_WAIT_TIMEOUT_SECONDS", "10")))
+        self.search_mode = os.getenv("MESSAGE_SEARCH_MODE", "fulltext").strip().lower() or "fulltext"
+        self.message_batch_size = max(1, int(os.getenv("DB_MESSAGE_BATCH_SIZE", "50")))
+        self.message_flush_interval = max(0.0, float(os.getenv("DB_MESSAGE_FLUSH_INTERVAL_MS", "250")) / 1000)
+        self.message_buffer_limit = max(self.message_batch_size, int(os.getenv("DB_MESSAGE_BUFFER_LIMIT", "5000")))
+        self.checkin_batch_size = max(1, int(os.getenv("DB_CHECKIN_BATCH_SIZE", "200")))
 
     def _get_pool(self):
         if not self.pool:
-            self.pool = ThreadedConnectionPool(1, 5, self.db_url)
+            self.pool = ThreadedConnectionPool(self.pool_min_size, self.pool_max_size, self.db_url)
         return self.pool
 
-    async def connect(self):
-        """Initialize database and create tables"""
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_max_size, thread_name_prefix="mindmate-db")
+        return self._executor
+
+    def _get_query_slots(self) -> asyncio.Semaphore:
+        # One slot per pooled connection: ThreadedConnectionPool raises instead of
+        # blocking when exhausted, so callers queue here rather than in psycopg2.
+        if self._query_slots is None:
+            self._query_slots = asyncio.Semaphore(self.pool_max_size)
+        return self._query_slots
+
+    def _run_with_connection(self, operation):
         pool = self._get_pool()
         conn = pool.getconn()
-        cursor = conn.cursor()
+        try:
+            return operation(conn)
+        finally:
+            pool.putconn(conn)
 
+    async def _run(self, operation):
+        """Run a blocking `operation(conn)` on the DB executor with a pooled connection."""
+        slots = self._get_query_slots()
+        wait_started = time.perf_counter()
+        self._queries_waiting += 1
         try:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS mindmate_messages (
-                    id SERIAL PRIMARY KEY,
-                    user_id BIGINT NOT NULL,
-                    conversation_id VARCHAR(200) NOT NULL,
-                    role VARCHAR(20) NOT NULL,
-                    content TEXT NOT NULL,
-                    message_id VARCHAR(100),
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            await asyncio.wait_for(slots.acquire(), timeout=self.pool_wait_timeout)
+        except asyncio.TimeoutError as exc:
+            raise DatabaseBusyError(
+                f"No PostgreSQL connection available within {self.pool_wait_timeout:.1f}s"
+            ) from exc
+        finally:
+            self._queries_waiting -= 1
 
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS mindmate_user_preferences (
-                    id SERIAL PRIMARY KEY,
-                    user_id BIGINT NOT NULL,
-                    pref_key VARCHAR(100) NOT NULL,
-                    pref_value TEXT,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(user_id, pref_key)
-                )
-            """)
+        waited = time.perf_counter() - wait_started
+        self._total_wait_seconds += waited
+        self._max_wait_seconds = max(self._max_wait_seconds, waited)
+        self._total_queries += 1
+        self._queries_in_flight += 1
 
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS mindmate_feedback (
-                    id SERIAL PRIMARY KEY,
-                    user_id BIGINT NOT NULL,
-                    feedback_text TEXT NOT NULL,
-                    source VARCHAR(50) DEFAULT 'command',
-                    metadata TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+        loop = asyncio.get_running_loop()
 
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS mindmate_user_journey (
-                    user_id BIGINT PRIMARY KEY,
-                    journey_data JSONB NOT NULL DEFAULT '{}'::jsonb,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+        def _release(_future) -> None:
+            # The worker thread may outlive a cancelled caller; only free the
+            # slot once the connection is actually back in the pool.
+            loop.call_soon_threadsafe(self._release_query_slot, slots)
 
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS mindmate_journal_entries (
-                    id SERIAL PRIMARY KEY,
-                    user_id BIGINT NOT NULL,
-                    local_date DATE NOT NULL,
-                    entry_type VARCHAR(50) NOT NULL,
-                    entry_text TEXT NOT NULL,
-                    mood TEXT,
-                    plan_tomorrow TEXT,
-                    metadata JSONB NOT NULL DEFAULT '{}'::jsonb,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+        future = self._get_executor().submit(self._run_with_connection, operation)
+        future.add_done_callback(_release)
+        return await asyncio.wrap_future(future)
 
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS mindmate_daily_checkins (
-                    user_id BIGINT NOT NULL,
-                    local_date DATE NOT NULL,
-                    waiting_for_summary BOOLEAN NOT NULL DEFAULT FALSE,
-                    sent_at TIMESTAMP,
-                    responded_at TIMESTAMP,
-                    prompt_message_id VARCHAR(100),
-                    response_message_id VARCHAR(100),
-                    prompt_kind VARCHAR(50) NOT NULL DEFAULT 'daily_heartbeat',
-                    status VARCHAR(20) NOT NULL DEFAULT 'pending',
-                    metadata JSONB NOT NULL DEFAULT '{}'::jsonb,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (user_id, local_date)
-                )
-            """)
+    def _release_query_slot(self, slots: asyncio.Semaphore) -> None:
+        self._queries_in_flight -= 1
+        slots.release()
 
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_user ON mindmate_messages(user_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_conv ON mindmate_messages(conversation_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_prefs_user ON mindmate_user_preferences(user_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_user ON mindmate_feedback(user_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_created_at ON mindmate_feedback(created_at)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_journal_user_date ON mindmate_journal_entries(user_id, local_date, created_at)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_journal_source_message ON mindmate_journal_entries(user_id, entry_type, ((metadata->>'source_message_id'))) WHERE metadata ? 'source_message_id'")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_checkins_user_updated ON mindmate_daily_checkins(user_id, updated_at DESC)")
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Return connection pool usage and wait-time counters."""
+        return {
+            "pool_min_size": self.pool_min_size,
+            "pool_max_size": self.pool_max_size,
+            "pool_wait_timeout_seconds": self.pool_wait_timeout,
+            "in_flight": self._queries_in_flight,
+            "waiting": self._queries_waiting,
+            "total_queries": self._total_queries,
+            "avg_wait_ms": round(1000 * self._total_wait_seconds / self._total_queries, 2) if self._total_queries else 0.0,
+            "max_wait_ms": round(1000 * self._max_wait_seconds, 2),
+            "buffered_messages": len(self._pending_messages or ()) + len(self._flushing_messages),
+            "messages_flushed": self._messages_flushed,
+            "message_flushes": self._message_flushes,
+            "messages_dropped": self._messages_dropped,
+            "message_flush_failures": self._message_flush_failures,
+            "buffered_checkins": len(self._pending_checkins or ()),
+            "checkins_flushed": self._checkins_flushed,
+            "checkin_flushes": self._checkin_flushes,
+        }
 
-            conn.commit()
+    async def connect(self):
+        """Bring the schema up to date; a no-op beyond a version check when current"""
+        def _operation(conn):
+            applied = apply_migrations(conn)
+            if applied:
+                logger.info(f"Applied schema migrations: {applied}")
             logger.info("✅ PostgreSQL connected successfully")
-        finally:
-            pool.putconn(conn)
+
+        await self._run(_operation)
 
     def _key(self, key: str) -> str:
         return f"{self.prefix}{key}"
 
+    def _get_flush_lock(self) -> asyncio.Lock:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        return self._flush_lock
+
     async def store_message(self, message: Message):
-        """Store a message in the database"""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor()
+        """Buffer a message for the next batched insert.
+
+        Never raises once the row is buffered: a failed flush is logged and
+        retried from the flush timer, so callers don't store the message twice.
+        """
+        if self._pending_messages is None:
+            self._pending_messages = []
+        conversation_id = self._key(f"conversation:{message.user_id}")
+        self._pending_messages.append(
+            (message.user_id, conversation_id, message.role, message.content, message.message_id, message.timestamp)
+        )
+        self._enforce_message_buffer_limit()
+        if len(self._pending_messages) >= self.message_batch_size:
+            try:
+                await self.flush_messages()
+            except Exception as e:
+                self._note_message_flush_failure(e)
+        else:
+            self._schedule_message_flush(self.message_flush_interval)
 
+    def _schedule_message_flush(self, delay: float) -> None:
+        timer = self._flush_timer
+        if timer is not None and not timer.done() and timer is not asyncio.current_task():
+            return
+        self._flush_timer = asyncio.create_task(self._flush_after_interval(delay), name="mindmate-db-message-flush")
+
+    async def _flush_after_interval(self, delay: float) -> None:
+        await asyncio.sleep(delay)
         try:
-            conversation_id = self._key(f"conversation:{message.user_id}")
-            cursor.execute("""
-                INSERT INTO mindmate_messages (user_id, conversation_id, role, content, message_id, timestamp)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (message.user_id, conversation_id, message.role, message.content, message.message_id, message.timestamp))
-            conn.commit()
-        finally:
-            pool.putconn(conn)
+            await self.flush_messages()
+        except Exception as e:
+            self._note_message_flush_failure(e)
+
+    def _note_message_flush_failure(self, exc: BaseException) -> None:
+        # Back off while PostgreSQL is unreachable instead of retrying on every message.
+        self._message_flush_failures += 1
+        delay = min(
+            MESSAGE_FLUSH_MAX_BACKOFF_SECONDS,
+            max(self.message_flush_interval, 0.25) * 2 ** (self._message_flush_failures - 1),
+        )
+        logger.warning(
+            f"Message flush failed ({len(self._pending_messages or ())} buffered); retrying in {delay:.1f}s: {exc}"
+        )
+        self._schedule_message_flush(delay)
+
+    def _enforce_message_buffer_limit(self) -> None:
+        overflow = len(self._pending_messages or ()) - self.message_buffer_limit
+        if overflow > 0:
+            # Oldest first: during a long outage the most recent turns matter most.
+            del self._pending_messages[:overflow]
+            self._messages_dropped += overflow
+            logger.error(f"Message buffer full; dropped {overflow} oldest unsaved message(s)")
+
+    def _requeue_messages(self, rows: List[tuple]) -> None:
+        # Keep the rows ahead of anything buffered meanwhile for the next attempt.
+        self._pending_messages = list(rows) + (self._pending_messages or [])
+        self._enforce_message_buffer_limit()
+
+    @staticmethod
+    def _insert_messages(conn, rows: List[tuple]) -> None:
+        cursor = conn.cursor()
+        execute_values(cursor, """
+            INSERT INTO mindmate_messages (user_id, conversation_id, role, content, message_id, timestamp)
+            VALUES %s
+        """, rows)
+        conn.commit()
+
+    async def flush_messages(self) -> int:
+        """Write every buffered message in one multi-row INSERT; returns rows written.
+
+        If the batch is rejected for reasons other than connectivity, rows are
+        retried one at a time and any row PostgreSQL still refuses (a NUL byte,
+        say) is dropped and logged, so one bad message can't block everyone's.
+        Connectivity errors keep the rows buffered and are raised.
+        """
+        async with self._get_flush_lock():
+            rows = self._pending_messages
+            if not rows:
+                return 0
+            self._pending_messages = []
+            self._flushing_messages = tuple(rows)
+            try:
+                try:
+                    await self._run(lambda conn: self._insert_messages(conn, rows))
+                    written = len(rows)
+                except TRANSIENT_DB_ERRORS:
+                    self._requeue_messages(rows)
+                    raise
+                except Exception as e:
+                    logger.warning(f"Batched insert of {len(rows)} message(s) failed, retrying row by row: {e}")
+                    written = await self._insert_messages_one_by_one(rows)
+                except BaseException:
+                    self._requeue_messages(rows)
+                    raise
+            finally:
+                self._flushing_messages = ()
+            self._message_flush_failures = 0
+            self._messages_flushed += written
+            self._message_flushes += 1
+            return written
+
+    async def _insert_messages_one_by_one(self, rows: List[tuple]) -> int:
+        written = 0
+        for position, row in enumerate(rows):
+            try:
+                await self._run(lambda conn: self._insert_messages(conn, [row]))
+            except TRANSIENT_DB_ERRORS:
+                self._requeue_messages(rows[position:])
+                raise
+            except Exception as e:
+                self._messages_dropped += 1
+                logger.error(f"Dropping message {row[4]} for user {row[0]} that PostgreSQL rejected: {e}")
+            except BaseException:
+                self._requeue_messages(rows[position:])
+                raise
+            else:
+                written += 1
+        return written
+
+    async def _flush_before_read(self) -> None:
+        # Best effort: a failed flush must not turn every read into an error too.
+        if self._pending_messages:
+            try:
+                await self.flush_messages()
+            except Exception as e:
+                self._note_message_flush_failure(e)
+
+    def _buffered_messages_for(self, user_id: int, conversation_id: str) -> List[tuple]:
+        return [
+            row
+            for row in (*self._flushing_messages, *(self._pending_messages or ()))
+            if row[0] == user_id and row[1] == conversation_id
+        ]
 
     async def get_conversation_history(self, user_id: int, limit: int = 10) -> List[Dict]:
-        """Get conversation history for a user"""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        """Get conversation history for a user, including messages not flushed yet"""
+        conversation_id = self._key(f"conversation:{user_id}")
 
-        try:
-            conversation_id = self._key(f"conversation:{user_id}")
+        def _operation(conn):
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
             cursor.execute("""
                 SELECT role, content, message_id, timestamp
                 FROM mindmate_messages
@@ -172,19 +397,41 @@ class PostgresDatabase:
                 LIMIT %s
             """, (user_id, conversation_id, limit))
 
-            results = cursor.fetchall()
-            return [{"role": row["role"], "content": row["content"]} for row in reversed(results)]
-        finally:
-            pool.putconn(conn)
-
-    async def semantic_search(self, user_id: int, query: str, limit: int = 5) -> List[Dict]:
-        """Keyword-only message lookup."""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-        try:
-            conversation_id = self._key(f"conversation:{user_id}")
+            return list(reversed(cursor.fetchall()))
+
+        results = await self._run(_operation)
+        buffered = self._buffered_messages_for(user_id, conversation_id)
+        if buffered:
+            # A flush may commit between the SELECT and this point; de-duplicate on message_id.
+            stored_ids = {row["message_id"] for row in results}
+            results = results + [
+                {"role": role, "content": content, "message_id": message_id, "timestamp": timestamp}
+                for _, _, role, content, message_id, timestamp in buffered
+                if message_id not in stored_ids
+            ]
+            results.sort(key=lambda row: row["timestamp"])
+            results = results[-limit:] if limit > 0 else []
+        return [{"role": row["role"], "content": row["content"]} for row in results]
+
+    async def semantic_search(
+        self,
+        user_id: int,
+        query: str,
+        limit: int = 5,
+        mode: Optional[str] = None,
+    ) -> List[Dict]:
+        """Search a user's messages.
+
+        "fulltext" (default) ranks matches with `ts_rank_cd` over the indexed
+        `content_tsv` column and adds `rank` and a highlighted `snippet` to each
+        row; "keyword" is the original substring match, newest first.
+        """
+        await self._flush_before_read()
+        mode = (mode or self.search_mode).lower()
+        conversation_id = self._key(f"conversation:{user_id}")
+
+        def _keyword(conn):
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
             cursor.execute("""
                 SELECT role, content, message_id, timestamp
                 FROM mindmate_messages
@@ -194,16 +441,38 @@ class PostgresDatabase:
             """, (user_id, conversation_id, f"%{query}%", limit))
 
             return [dict(r) for r in cursor.fetchall()]
-        finally:
-            pool.putconn(conn)
+
+        def _fulltext(conn):
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            # Headlines are computed only for the rows that survive the LIMIT.
+            cursor.execute("""
+                WITH q AS (SELECT websearch_to_tsquery('english', %s) AS tsq),
+                top AS (
+                    SELECT m.role, m.content, m.message_id, m.timestamp,
+                           ts_rank_cd(m.content_tsv, q.tsq) AS rank
+                    FROM mindmate_messages m, q
+                    WHERE m.user_id = %s AND m.conversation_id = %s AND m.content_tsv @@ q.tsq
+                    ORDER BY rank DESC, m.timestamp DESC
+                    LIMIT %s
+                )
+                SELECT top.role, top.content, top.message_id, top.timestamp, top.rank,
+                       ts_headline('english', top.content, q.tsq, %s) AS snippet
+                FROM top, q
+                ORDER BY top.rank DESC, top.timestamp DESC
+            """, (query, user_id, conversation_id, limit, SEARCH_HEADLINE_OPTIONS))
+
+            return [dict(r, rank=float(r["rank"])) for r in cursor.fetchall()]
+
+        if mode == "keyword":
+            return await self._run(_keyword)
+        if mode != "fulltext":
+            raise ValueError(f"Unknown message search mode: {mode}")
+        return await self._run(_fulltext)
 
     async def store_user_preference(self, user_id: int, key: str, value: Any):
         """Store user preference"""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor()
-
-        try:
+        def _operation(conn):
+            cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO mindmate_user_preferences (user_id, pref_key, pref_value, updated_at)
                 VALUES (%s, %s, %s, %s)
@@ -212,16 +481,13 @@ class PostgresDatabase:
                     updated_at = EXCLUDED.updated_at
             """, (user_id, key, json.dumps(value), datetime.now()))
             conn.commit()
-        finally:
-            pool.putconn(conn)
+
+        await self._run(_operation)
 
     async def get_user_preference(self, user_id: int, key: str) -> Optional[Any]:
         """Get user preference"""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor()
-
-        try:
+        def _operation(conn):
+            cursor = conn.cursor()
             cursor.execute("""
                 SELECT pref_value FROM mindmate_user_preferences
                 WHERE user_id = %s AND pref_key = %s
@@ -231,16 +497,25 @@ class PostgresDatabase:
             if result:
                 return json.loads(result[0])
             return None
-        finally:
-            pool.putconn(conn)
+
+        return await self._run(_operation)
+
+    async def get_user_ids_with_preferences_updated_since(self, keys: Sequence[str], since: datetime) -> List[int]:
+        """Return users who changed any of `keys` at or after `since`."""
+        def _operation(conn):
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT DISTINCT user_id FROM mindmate_user_preferences
+                WHERE pref_key = ANY(%s) AND updated_at >= %s
+            """, (list(keys), since))
+            return [int(row[0]) for row in cursor.fetchall()]
+
+        return await self._run(_operation)
 
     async def get_user_ids_with_preference(self, key: str, expected_value: Any = True) -> List[int]:
         """Return users whose stored preference matches the expected value."""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor()
-
-        try:
+        def _operation(conn):
+            cursor = conn.cursor()
             cursor.execute("""
                 SELECT DISTINCT user_id, pref_value
                 FROM mindmate_user_preferences
@@ -256,16 +531,15 @@ class PostgresDatabase:
                 if parsed_value == expected_value:
                     matching_user_ids.append(int(user_id))
             return matching_user_ids
-        finally:
-            pool.putconn(conn)
+
+        return await self._run(_operation)
 
     async def get_known_user_ids(self) -> List[int]:
         """Return users MindMate has seen via messages or stored preferences."""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor()
+        await self._flush_before_read()
 
-        try:
+        def _operation(conn):
+            cursor = conn.cursor()
             cursor.execute(
                 """
                 SELECT DISTINCT user_id
@@ -284,32 +558,80 @@ class PostgresDatabase:
                 """
             )
             return [int(user_id) for (user_id,) in cursor.fetchall()]
-        finally:
-            pool.putconn(conn)
+
+        return await self._run(_operation)
+
+    async def get_daily_heartbeat_due_user_ids(self, local_date: str, candidate_user_ids: List[int]) -> List[int]:
+        """Return candidates who are known, not opted out, not already sent today and not awaiting a reply.
+
+        One round-trip regardless of how many users are checked.
+        """
+        if not candidate_user_ids:
+            return []
+        await self._flush_before_read()
+        await self._flush_checkins_before_read()
+
+        def _operation(conn):
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT c.user_id
+                FROM unnest(%s::bigint[]) AS c(user_id)
+                WHERE (
+                    EXISTS (SELECT 1 FROM mindmate_messages m WHERE m.user_id = c.user_id)
+                    OR EXISTS (SELECT 1 FROM mindmate_user_preferences p WHERE p.user_id = c.user_id)
+                    OR EXISTS (SELECT 1 FROM mindmate_user_journey j WHERE j.user_id = c.user_id)
+                    OR EXISTS (SELECT 1 FROM mindmate_journal_entries e WHERE e.user_id = c.user_id)
+                    OR EXISTS (SELECT 1 FROM mindmate_daily_checkins d WHERE d.user_id = c.user_id)
+                )
+                AND NOT EXISTS (
+                    -- pref_value is JSON text; these are the falsy encodings of an opt-out.
+                    SELECT 1 FROM mindmate_user_preferences p
+                    WHERE p.user_id = c.user_id AND p.pref_key = 'daily_heartbeat_enabled'
+                      AND p.pref_value IN ('false', '0', '0.0', '""', '[]', '{}')
+                )
+                AND NOT EXISTS (
+                    SELECT 1 FROM mindmate_daily_checkins d
+                    WHERE d.user_id = c.user_id AND d.local_date = %s::date
+                      AND d.claimed_by IS NOT NULL AND d.status = ANY(%s)
+                )
+                AND NOT EXISTS (
+                    SELECT 1 FROM mindmate_daily_checkins d
+                    WHERE d.user_id = c.user_id AND d.waiting_for_summary = TRUE
+                )
+                ORDER BY c.user_id
+                """,
+                (list(candidate_user_ids), local_date, list(SCHEDULED_CHECKIN_DONE_STATUSES)),
+            )
+            return [int(user_id) for (user_id,) in cursor.fetchall()]
+
+        return await self._run(_operation)
 
     async def clear_conversation(self, user_id: int):
-        """Clear conversation history"""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor()
+        """Clear conversation history, including messages not flushed yet"""
+        conversation_id = self._key(f"conversation:{user_id}")
 
-        try:
-            conversation_id = self._key(f"conversation:{user_id}")
+        def _operation(conn):
+            cursor = conn.cursor()
             cursor.execute("""
                 DELETE FROM mindmate_messages
                 WHERE user_id = %s AND conversation_id = %s
             """, (user_id, conversation_id))
             conn.commit()
-        finally:
-            pool.putconn(conn)
+
+        # Holding the flush lock means an in-flight batch lands before the DELETE.
+        async with self._get_flush_lock():
+            if self._pending_messages:
+                self._pending_messages = [
+                    row for row in self._pending_messages
+                    if not (row[0] == user_id and row[1] == conversation_id)
+                ]
+            await self._run(_operation)
 
     async def get_user_journey(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Return the latest durable journey snapshot for a user."""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-        try:
+        def _operation(conn):
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
             cursor.execute(
                 """
                 SELECT journey_data, updated_at
@@ -326,19 +648,16 @@ class PostgresDatabase:
             if updated_at and "last_updated" not in journey:
                 journey["last_updated"] = updated_at.isoformat()
             return journey
-        finally:
-            pool.putconn(conn)
+
+        return await self._run(_operation)
 
     async def save_user_journey(self, user_id: int, journey_data: Dict[str, Any]) -> Dict[str, Any]:
         """Persist the current durable journey snapshot for a user."""
         payload = dict(journey_data or {})
         payload.setdefault("last_updated", datetime.now().isoformat())
 
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor()
-
-        try:
+        def _operation(conn):
+            cursor = conn.cursor()
             cursor.execute(
                 """
                 INSERT INTO mindmate_user_journey (user_id, journey_data, updated_at)
@@ -351,8 +670,8 @@ class PostgresDatabase:
             )
             conn.commit()
             return payload
-        finally:
-            pool.putconn(conn)
+
+        return await self._run(_operation)
 
     async def delete_user_journey_keys(self, user_id: int, keys: List[str]) -> Dict[str, Any]:
         """Remove specific keys from the durable journey snapshot."""
@@ -385,11 +704,8 @@ class PostgresDatabase:
         if metadata:
             entry["metadata"] = metadata
 
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor()
-
-        try:
+        def _operation(conn):
+            cursor = conn.cursor()
             source_message_id = (metadata or {}).get("source_message_id")
             if source_message_id is not None:
                 cursor.execute(
@@ -435,8 +751,8 @@ class PostgresDatabase:
             )
             conn.commit()
             return entry
-        finally:
-            pool.putconn(conn)
+
+        return await self._run(_operation)
 
     async def get_journal_entry_by_source_message(
         self,
@@ -446,11 +762,8 @@ class PostgresDatabase:
         entry_type: Optional[str] = None,
     ) -> Optional[Dict[str, Any]]:
         """Return a durable journal entry previously tied to a source message id."""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-        try:
+        def _operation(conn):
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
             params: List[Any] = [user_id, source_message_id]
             where = ["user_id = %s", "metadata->>'source_message_id' = %s"]
             if local_date:
@@ -485,8 +798,8 @@ class PostgresDatabase:
             if metadata:
                 item["metadata"] = dict(metadata)
             return item
-        finally:
-            pool.putconn(conn)
+
+        return await self._run(_operation)
 
     async def get_journal_entries(
         self,
@@ -495,11 +808,8 @@ class PostgresDatabase:
         limit: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
         """Return durable journal entries, optionally filtered by local date."""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-        try:
+        def _operation(conn):
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
             params: List[Any] = [user_id]
             where = ["user_id = %s"]
             if local_date:
@@ -531,8 +841,8 @@ class PostgresDatabase:
                     item["metadata"] = dict(metadata)
                 entries.append(item)
             return entries
-        finally:
-            pool.putconn(conn)
+
+        return await self._run(_operation)
 
     async def upsert_daily_checkin(
         self,
@@ -548,80 +858,238 @@ class PostgresDatabase:
         metadata: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         """Persist or update durable daily check-in state for a local day."""
-        now = datetime.now()
-        if status is None:
-            if responded_at:
-                status = "completed"
-            elif waiting_for_summary:
-                status = "sent"
-            else:
-                status = "dismissed"
-
-        payload = {
-            "waiting_for_summary": bool(waiting_for_summary),
-            "sent_time": sent_at.isoformat() if sent_at else None,
-            "responded_at": responded_at.isoformat() if responded_at else None,
-            "message_id": str(prompt_message_id) if prompt_message_id is not None else None,
-            "response_message_id": str(response_message_id) if response_message_id is not None else None,
-            "kind": prompt_kind,
-            "status": status,
-        }
-        if metadata:
-            payload["metadata"] = metadata
-
-        pool = self._get_pool()
-        conn = pool.getconn()
+        status = _daily_checkin_status(waiting_for_summary, responded_at, status)
+        row = self._daily_checkin_row(
+            user_id, local_date, waiting_for_summary, sent_at, responded_at,
+            prompt_message_id, response_message_id, prompt_kind, status, metadata,
+        )
+        # A queued transition for the same day must not land after this one, so it is
+        # folded into this write; transitions queued for other users stay batched.
+        previous = self._pending_checkins.pop((user_id, local_date), None) if self._pending_checkins else None
+        if previous is not None:
+            row = self._merge_checkin_rows(previous, row)
+        try:
+            await self._run(lambda conn: self._write_daily_checkins(conn, [row]))
+        except BaseException:
+            if previous is not None:
+                self._pending_checkins.setdefault((user_id, local_date), previous)
+            raise
+        return _daily_checkin_payload(
+            waiting_for_summary, sent_at, responded_at, prompt_message_id,
+            response_message_id, prompt_kind, status, metadata,
+        )
+
+    async def queue_daily_checkin(
+        self,
+        user_id: int,
+        local_date: str,
+        waiting_for_summary: bool,
+        sent_at: Optional[datetime] = None,
+        responded_at: Optional[datetime] = None,
+        prompt_message_id: Optional[Any] = None,
+        response_message_id: Optional[Any] = None,
+        prompt_kind: str = "daily_heartbeat",
+        status: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Buffer a check-in transition for the next `flush_daily_checkins`.
+
+        Takes the same arguments as `upsert_daily_checkin`. Transitions for the
+        same user and day merge, so a cycle writes at most one row per user.
+        """
+        status = _daily_checkin_status(waiting_for_summary, responded_at, status)
+        row = self._daily_checkin_row(
+            user_id, local_date, waiting_for_summary, sent_at, responded_at,
+            prompt_message_id, response_message_id, prompt_kind, status, metadata,
+        )
+        if self._pending_checkins is None:
+            self._pending_checkins = {}
+        key = (user_id, local_date)
+        previous = self._pending_checkins.pop(key, None)
+        if previous is not None:
+            row = self._merge_checkin_rows(previous, row)
+        self._pending_checkins[key] = row
+        if len(self._pending_checkins) >= self.checkin_batch_size:
+            await self.flush_daily_checkins()
+        return _daily_checkin_payload(
+            waiting_for_summary, sent_at, responded_at, prompt_message_id,
+            response_message_id, prompt_kind, status, metadata,
+        )
+
+    async def flush_daily_checkins(self) -> int:
+        """Write every queued check-in transition in one multi-row upsert; returns rows written."""
+        async with self._get_flush_lock():
+            pending = self._pending_checkins
+            if not pending:
+                return 0
+            self._pending_checkins = {}
+            rows = list(pending.values())
+            try:
+                await self._run(lambda conn: self._write_daily_checkins(conn, rows))
+            except BaseException:
+                # Anything queued meanwhile is newer and wins over the retried rows.
+                pending.update(self._pending_checkins)
+                self._pending_checkins = pending
+                raise
+            self._checkins_flushed += len(rows)
+            self._checkin_flushes += 1
+            return len(rows)
+
+    async def _flush_checkins_before_read(self) -> None:
+        if self._pending_checkins:
+            await self.flush_daily_checkins()
+
+    @classmethod
+    def _merge_checkin_rows(cls, previous: tuple, row: tuple) -> tuple:
+        # Same COALESCE rule as the upsert: later values win, blanks keep earlier ones.
+        return tuple(
+            old if index in cls._CHECKIN_COALESCE_COLUMNS and new is None else new
+            for index, (old, new) in enumerate(zip(previous, row))
+        )
+
+    @staticmethod
+    def _daily_checkin_row(
+        user_id, local_date, waiting_for_summary, sent_at, responded_at,
+        prompt_message_id, response_message_id, prompt_kind, status, metadata,
+    ) -> tuple:
+        return (
+            user_id,
+            local_date,
+            bool(waiting_for_summary),
+            sent_at,
+            responded_at,
+            str(prompt_message_id) if prompt_message_id is not None else None,
+            str(response_message_id) if response_message_id is not None else None,
+            prompt_kind,
+            status,
+            Json(metadata or {}),
+            datetime.now(),
+        )
+
+    @staticmethod
+    def _write_daily_checkins(conn, rows: List[tuple]) -> None:
         cursor = conn.cursor()
+        execute_values(
+            cursor,
+            """
+            INSERT INTO mindmate_daily_checkins (
+                user_id, local_date, waiting_for_summary, sent_at, responded_at,
+                prompt_message_id, response_message_id, prompt_kind, status, metadata, updated_at
+            )
+            VALUES %s
+            ON CONFLICT (user_id, local_date) DO UPDATE SET
+                waiting_for_summary = EXCLUDED.waiting_for_summary,
+                sent_at = COALESCE(EXCLUDED.sent_at, mindmate_daily_checkins.sent_at),
+                responded_at = COALESCE(EXCLUDED.responded_at, mindmate_daily_checkins.responded_at),
+                prompt_message_id = COALESCE(EXCLUDED.prompt_message_id, mindmate_daily_checkins.prompt_message_id),
+                response_message_id = COALESCE(EXCLUDED.response_message_id, mindmate_daily_checkins.response_message_id),
+                prompt_kind = EXCLUDED.prompt_kind,
+                status = EXCLUDED.status,
+                metadata = EXCLUDED.metadata,
+                updated_at = EXCLUDED.updated_at
+            """,
+            rows,
+            template="(%s, %s::date, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            page_size=max(1, len(rows)),
+        )
+        conn.commit()
+
+    async def claim_daily_checkin(
+        self,
+        user_id: int,
+        local_date: str,
+        claimed_by: str,
+        *,
+        lease_seconds: float = 600.0,
+    ) -> bool:
+        """Atomically claim the scheduled check-in for `local_date`; True if this caller won.
+
+        A day can be claimed when no scheduled send has claimed it yet, when the
+        previous attempt failed, or when a claim was never followed by a send
+        within `lease_seconds` (the claiming instance died). Days with a check-in
+        still waiting for a reply are never claimed.
+        """
+        now = datetime.now()
 
-        try:
+        def _operation(conn):
+            cursor = conn.cursor()
             cursor.execute(
                 """
-                INSERT INTO mindmate_daily_checkins (
-                    user_id, local_date, waiting_for_summary, sent_at, responded_at,
-                    prompt_message_id, response_message_id, prompt_kind, status, metadata, updated_at
-                )
-                VALUES (%s, %s::date, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                INSERT INTO mindmate_daily_checkins (user_id, local_date, status, claimed_by, claimed_at, updated_at)
+                VALUES (%s, %s::date, 'claimed', %s, %s, %s)
                 ON CONFLICT (user_id, local_date) DO UPDATE SET
-                    waiting_for_summary = EXCLUDED.waiting_for_summary,
-                    sent_at = COALESCE(EXCLUDED.sent_at, mindmate_daily_checkins.sent_at),
-                    responded_at = COALESCE(EXCLUDED.responded_at, mindmate_daily_checkins.responded_at),
-                    prompt_message_id = COALESCE(EXCLUDED.prompt_message_id, mindmate_daily_checkins.prompt_message_id),
-                    response_message_id = COALESCE(EXCLUDED.response_message_id, mindmate_daily_checkins.response_message_id),
-                    prompt_kind = EXCLUDED.prompt_kind,
-                    status = EXCLUDED.status,
-                    metadata = EXCLUDED.metadata,
+                    status = 'claimed',
+                    claimed_by = EXCLUDED.claimed_by,
+                    claimed_at = EXCLUDED.claimed_at,
                     updated_at = EXCLUDED.updated_at
+                WHERE NOT mindmate_daily_checkins.waiting_for_summary
+                  AND (
+                    mindmate_daily_checkins.claimed_by IS NULL
+                    OR mindmate_daily_checkins.status = 'failed'
+                    OR (mindmate_daily_checkins.status = 'claimed' AND mindmate_daily_checkins.claimed_at < %s)
+                  )
+                RETURNING user_id
                 """,
-                (
-                    user_id,
-                    local_date,
-                    bool(waiting_for_summary),
-                    sent_at,
-                    responded_at,
-                    str(prompt_message_id) if prompt_message_id is not None else None,
-                    str(response_message_id) if response_message_id is not None else None,
-                    prompt_kind,
-                    status,
-                    Json(metadata or {}),
-                    now,
-                ),
+                (user_id, local_date, claimed_by, now, now, now - timedelta(seconds=lease_seconds)),
             )
+            claimed = cursor.fetchone() is not None
             conn.commit()
-            return payload
-        finally:
-            pool.putconn(conn)
+            return claimed
+
+        return await self._run(_operation)
+
+    def _hold_advisory_lock(self, key: int) -> bool:
+        conn = self._leader_conn
+        if conn is not None and not conn.closed:
+            try:
+                # A session lock lasts as long as its connection does.
+                conn.cursor().execute("SELECT 1")
+                return True
+            except psycopg2.Error as e:
+                logger.warning(f"Heartbeat leader connection lost: {e}")
+                self._close_leader_conn()
+        conn = psycopg2.connect(self.db_url)
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (key,))
+        if cursor.fetchone()[0]:
+            self._leader_conn = conn
+            return True
+        conn.close()
+        return False
+
+    def _close_leader_conn(self) -> None:
+        conn, self._leader_conn = self._leader_conn, None
+        if conn is not None and not conn.closed:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+    async def try_acquire_heartbeat_leadership(self) -> bool:
+        """Return True while this instance holds the heartbeat leader lock.
+
+        The lock lives on a dedicated connection outside the pool, so it is
+        released automatically if this instance dies; call again periodically
+        to confirm leadership is still held.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self._hold_advisory_lock, HEARTBEAT_LEADER_LOCK_KEY)
+
+    async def release_heartbeat_leadership(self) -> None:
+        if self._leader_conn is not None:
+            await asyncio.get_running_loop().run_in_executor(self._get_executor(), self._close_leader_conn)
 
     async def get_daily_checkin(self, user_id: int, local_date: str) -> Optional[Dict[str, Any]]:
         """Return durable daily check-in state for a given local day."""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        await self._flush_checkins_before_read()
 
-        try:
+        def _operation(conn):
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
             cursor.execute(
                 """
                 SELECT waiting_for_summary, sent_at, responded_at, prompt_message_id,
-                       response_message_id, prompt_kind, status, metadata, updated_at
+                       response_message_id, prompt_kind, status, metadata, updated_at, claimed_by
                 FROM mindmate_daily_checkins
                 WHERE user_id = %s AND local_date = %s::date
                 """,
@@ -639,21 +1107,21 @@ class PostgresDatabase:
                 "kind": row["prompt_kind"],
                 "status": row["status"],
                 "updated_at": row["updated_at"].isoformat() if row["updated_at"] else None,
+                "claimed_by": row["claimed_by"],
             }
             metadata = row.get("metadata") or {}
             if metadata:
                 result["metadata"] = dict(metadata)
             return result
-        finally:
-            pool.putconn(conn)
+
+        return await self._run(_operation)
 
     async def get_latest_pending_daily_checkin(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Return the most recent pending daily check-in for a user, if any."""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        await self._flush_checkins_before_read()
 
-        try:
+        def _operation(conn):
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
             cursor.execute(
                 """
                 SELECT local_date, waiting_for_summary, sent_at, responded_at, prompt_message_id,
@@ -683,32 +1151,86 @@ class PostgresDatabase:
             if metadata:
                 result["metadata"] = dict(metadata)
             return result
-        finally:
-            pool.putconn(conn)
+
+        return await self._run(_operation)
 
     async def store_feedback(self, user_id: int, feedback_text: str, metadata: Optional[Dict[str, Any]] = None, source: str = "command") -> Dict[str, Any]:
         """Store user feedback for later review."""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor()
-
-        try:
+        def _operation(conn):
+            cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO mindmate_feedback (user_id, feedback_text, source, metadata)
                 VALUES (%s, %s, %s, %s)
             """, (user_id, feedback_text, source, json.dumps(metadata or {})))
             conn.commit()
             return {"saved": True, "storage": "postgresql", "session_only": False}
-        finally:
-            pool.putconn(conn)
+
+        return await self._run(_operation)
+
+    async def store_memory_embeddings(self, user_id: int, model: str, items: List[Dict[str, Any]]) -> None:
+        """Persist embedded memories; re-embedding the same source row is a no-op."""
+        rows = [
+            (user_id, model, item["source"], str(item["source_id"]), item["content"],
+             psycopg2.Binary(item["embedding"]), item["created_at"])
+            for item in items
+        ]
+        if not rows:
+            return
+
+        def _operation(conn):
+            cursor = conn.cursor()
+            execute_values(cursor, """
+                INSERT INTO mindmate_memory_embeddings (user_id, model, source, source_id, content, embedding, created_at)
+                VALUES %s
+                ON CONFLICT (user_id, model, source, source_id) DO NOTHING
+            """, rows)
+            conn.commit()
+
+        await self._run(_operation)
+
+    async def delete_memory_embeddings(self, user_id: int, sources: Sequence[str] = ("message",)) -> int:
+        """Delete a user's memory vectors from `sources` (every model); returns rows deleted."""
+        def _operation(conn):
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM mindmate_memory_embeddings WHERE user_id = %s AND source = ANY(%s)",
+                (user_id, list(sources)),
+            )
+            deleted = cursor.rowcount
+            conn.commit()
+            return deleted
+
+        return await self._run(_operation)
+
+    async def get_memory_embeddings(self, user_id: int, model: str) -> List[Dict[str, Any]]:
+        """Load every stored memory vector for a user and embedding model."""
+        def _operation(conn):
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute("""
+                SELECT source, source_id, content, embedding, created_at
+                FROM mindmate_memory_embeddings
+                WHERE user_id = %s AND model = %s
+                ORDER BY id
+            """, (user_id, model))
+            return [
+                {
+                    "source": row["source"],
+                    "source_id": row["source_id"],
+                    "content": row["content"],
+                    "embedding": bytes(row["embedding"]),
+                    "created_at": row["created_at"].isoformat() if row["created_at"] else "",
+                }
+                for row in cursor.fetchall()
+            ]
+
+        return await self._run(_operation)
 
     async def get_stats(self) -> Dict[str, Any]:
         """Get database stats"""
-        pool = self._get_pool()
-        conn = pool.getconn()
-        cursor = conn.cursor()
+        await self._flush_before_read()
 
-        try:
+        def _operation(conn):
+            cursor = conn.cursor()
             cursor.execute("SELECT COUNT(*) FROM mindmate_messages")
             total_messages = cursor.fetchone()[0]
 
@@ -728,11 +1250,27 @@ class PostgresDatabase:
                 "total_daily_checkins": total_daily_checkins,
                 "storage": "postgresql"
             }
-        finally:
-            pool.putconn(conn)
+
+        return await self._run(_operation)
 
     async def close(self):
-        """Close database pool"""
+        """Flush buffered writes and close database pool"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        try:
+            await self.flush_messages()
+        except Exception as e:
+            logger.error(f"Failed to flush buffered messages on close: {e}")
+        try:
+            await self.flush_daily_checkins()
+        except Exception as e:
+            logger.error(f"Failed to flush buffered check-ins on close: {e}")
+        await self.release_heartbeat_leadership()
+        if self._executor is not None:
+            executor = self._executor
+            self._executor = None
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
         if self.pool:
             self.pool.closeall()
 
@@ -743,10 +1281,13 @@ class InMemoryDatabase:
     def __init__(self, db_url=None, openai_client=None):
         self.messages = {}
         self.preferences = {}
+        self.preference_updated_at: Dict[str, datetime] = {}
         self.feedback = []
         self.journeys: Dict[int, Dict[str, Any]] = {}
         self.journal_entries: Dict[int, Dict[str, List[Dict[str, Any]]]] = {}
         self.daily_checkins: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        self._pending_checkins: List[tuple] = []
+        self.memory_embeddings: Dict[tuple, Dict[tuple, Dict[str, Any]]] = {}
 
     async def connect(self):
         logger.info("✅ Using in-memory storage (fallback)")
@@ -769,10 +1310,19 @@ class InMemoryDatabase:
     async def store_user_preference(self, user_id: int, key: str, value: Any):
         k = f"{user_id}:{key}"
         self.preferences[k] = value
+        self.preference_updated_at[k] = datetime.now()
 
     async def get_user_preference(self, user_id: int, key: str) -> Optional[Any]:
         return self.preferences.get(f"{user_id}:{key}")
 
+    async def get_user_ids_with_preferences_updated_since(self, keys: Sequence[str], since: datetime) -> List[int]:
+        changed = set()
+        for stored_key, updated_at in self.preference_updated_at.items():
+            user_id_str, pref_key = stored_key.split(":", 1)
+            if pref_key in keys and updated_at >= since:
+                changed.add(int(user_id_str))
+        return sorted(changed)
+
     async def get_user_ids_with_preference(self, key: str, expected_value: Any = True) -> List[int]:
         matching_user_ids: List[int] = []
         for stored_key, stored_value in self.preferences.items():
@@ -791,6 +1341,23 @@ class InMemoryDatabase:
         known_user_ids.update(self.daily_checkins.keys())
         return sorted(known_user_ids)
 
+    async def get_daily_heartbeat_due_user_ids(self, local_date: str, candidate_user_ids: List[int]) -> List[int]:
+        await self.flush_daily_checkins()
+        known_user_ids = set(await self.get_known_user_ids())
+        due_user_ids: List[int] = []
+        for user_id in sorted(set(candidate_user_ids)):
+            if user_id not in known_user_ids:
+                continue
+            enabled = self.preferences.get(f"{user_id}:daily_heartbeat_enabled")
+            if enabled is not None and not enabled:
+                continue
+            if is_scheduled_checkin_done(self.daily_checkins.get(user_id, {}).get(local_date)):
+                continue
+            if any(record.get("waiting_for_summary") for record in self.daily_checkins.get(user_id, {}).values()):
+                continue
+            due_user_ids.append(user_id)
+        return due_user_ids
+
     async def clear_conversation(self, user_id: int):
         self.messages.pop(str(user_id), None)
 
@@ -883,32 +1450,96 @@ class InMemoryDatabase:
         status: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
-        if status is None:
-            if responded_at:
-                status = "completed"
-            elif waiting_for_summary:
-                status = "sent"
-            else:
-                status = "dismissed"
-        payload = {
-            "waiting_for_summary": bool(waiting_for_summary),
-            "sent_time": sent_at.isoformat() if sent_at else None,
-            "responded_at": responded_at.isoformat() if responded_at else None,
-            "message_id": str(prompt_message_id) if prompt_message_id is not None else None,
-            "response_message_id": str(response_message_id) if response_message_id is not None else None,
-            "kind": prompt_kind,
-            "status": status,
-        }
-        if metadata:
-            payload["metadata"] = dict(metadata)
-        self.daily_checkins.setdefault(user_id, {})[local_date] = payload
+        await self.flush_daily_checkins()
+        return self._apply_daily_checkin(
+            user_id, local_date, waiting_for_summary, sent_at, responded_at,
+            prompt_message_id, response_message_id, prompt_kind, status, metadata,
+        )
+
+    async def queue_daily_checkin(self, user_id: int, local_date: str, waiting_for_summary: bool, **fields) -> Dict[str, Any]:
+        # Buffered like the PostgreSQL store so call patterns match; applied in order on flush.
+        fields["status"] = _daily_checkin_status(waiting_for_summary, fields.get("responded_at"), fields.get("status"))
+        self._pending_checkins.append((user_id, local_date, waiting_for_summary, fields))
+        return _daily_checkin_payload(
+            waiting_for_summary,
+            fields.get("sent_at"),
+            fields.get("responded_at"),
+            fields.get("prompt_message_id"),
+            fields.get("response_message_id"),
+            fields.get("prompt_kind", "daily_heartbeat"),
+            fields["status"],
+            fields.get("metadata"),
+        )
+
+    async def flush_daily_checkins(self) -> int:
+        pending, self._pending_checkins = self._pending_checkins, []
+        for user_id, local_date, waiting_for_summary, fields in pending:
+            self._apply_daily_checkin(user_id, local_date, waiting_for_summary, **fields)
+        return len({(user_id, local_date) for user_id, local_date, _, _ in pending})
+
+    def _apply_daily_checkin(
+        self,
+        user_id: int,
+        local_date: str,
+        waiting_for_summary: bool,
+        sent_at: Optional[datetime] = None,
+        responded_at: Optional[datetime] = None,
+        prompt_message_id: Optional[Any] = None,
+        response_message_id: Optional[Any] = None,
+        prompt_kind: str = "daily_heartbeat",
+        status: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        status = _daily_checkin_status(waiting_for_summary, responded_at, status)
+        payload = _daily_checkin_payload(
+            waiting_for_summary, sent_at, responded_at, prompt_message_id,
+            response_message_id, prompt_kind, status, metadata,
+        )
+        previous = self.daily_checkins.setdefault(user_id, {}).get(local_date) or {}
+        stored = dict(payload)
+        # Like the SQL upsert, tracking updates leave the scheduler's claim alone.
+        stored.update({key: previous[key] for key in ("claimed_by", "claimed_at") if key in previous})
+        self.daily_checkins[user_id][local_date] = stored
         return dict(payload)
 
+    async def claim_daily_checkin(
+        self,
+        user_id: int,
+        local_date: str,
+        claimed_by: str,
+        *,
+        lease_seconds: float = 600.0,
+    ) -> bool:
+        now = datetime.now()
+        record = self.daily_checkins.setdefault(user_id, {}).get(local_date)
+        if record is not None:
+            if record.get("waiting_for_summary"):
+                return False
+            claimed_at = record.get("claimed_at")
+            stale = claimed_at is not None and now - claimed_at >= timedelta(seconds=lease_seconds)
+            if record.get("claimed_by") and record.get("status") != "failed" and not (
+                record.get("status") == "claimed" and stale
+            ):
+                return False
+        else:
+            record = {"waiting_for_summary": False}
+            self.daily_checkins[user_id][local_date] = record
+        record.update(status="claimed", claimed_by=claimed_by, claimed_at=now)
+        return True
+
+    async def try_acquire_heartbeat_leadership(self) -> bool:
+        return True
+
+    async def release_heartbeat_leadership(self) -> None:
+        pass
+
     async def get_daily_checkin(self, user_id: int, local_date: str) -> Optional[Dict[str, Any]]:
+        await self.flush_daily_checkins()
         record = self.daily_checkins.get(user_id, {}).get(local_date)
         return dict(record) if record else None
 
     async def get_latest_pending_daily_checkin(self, user_id: int) -> Optional[Dict[str, Any]]:
+        await self.flush_daily_checkins()
         pending = []
         for local_date, record in self.daily_checkins.get(user_id, {}).items():
             if record.get("waiting_for_summary"):
@@ -930,6 +1561,24 @@ class InMemoryDatabase:
         })
         return {"saved": True, "storage": "memory", "session_only": True}
 
+    async def store_memory_embeddings(self, user_id: int, model: str, items: List[Dict[str, Any]]) -> None:
+        stored = self.memory_embeddings.setdefault((user_id, model), {})
+        for item in items:
+            stored.setdefault((item["source"], str(item["source_id"])), dict(item, source_id=str(item["source_id"])))
+
+    async def delete_memory_embeddings(self, user_id: int, sources: Sequence[str] = ("message",)) -> int:
+        deleted = 0
+        for (owner, _model), stored in self.memory_embeddings.items():
+            if owner != user_id:
+                continue
+            for key in [key for key in stored if key[0] in sources]:
+                del stored[key]
+                deleted += 1
+        return deleted
+
+    async def get_memory_embeddings(self, user_id: int, model: str) -> List[Dict[str, Any]]:
+        return [dict(item) for item in self.memory_embeddings.get((user_id, model), {}).values()]
+
     async def get_stats(self):
         return {
             "storage": "memory",
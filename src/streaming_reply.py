@@ -0,0 +1,184 @@
+"""Progressive Telegram replies for streamed chat completions.
+
+A `StreamingReply` sends a placeholder as soon as generation starts and then
+edits it as text arrives, so the user sees the reply forming instead of
+waiting for the whole completion. Edits are throttled to Telegram's limits
+(about one per second in a private chat, fewer in groups); a `RetryAfter`
+pushes the next intermediate edit back rather than stalling the stream.
+Intermediate edits are best effort: a timeout, network error or rejected
+edit is logged and the next edit waits a little longer, and only the final
+edit raises.
+
+Intermediate edits only show a stable prefix: text up to the last word
+boundary with no `**`, `*` or backtick left open, so the basic markdown
+rendering never flickers between literal markers and formatting. The final
+edit renders the complete text. Replies longer than one Telegram message
+continue in follow-up messages.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, List
+
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Telegram's limit is 4096 characters after entity parsing; leave headroom.
+MAX_MESSAGE_CHARS = 4000
+DEFAULT_PLACEHOLDER = "💭 …"
+SINGLE_STAR = re.compile(r"(?<!\*)\*(?!\*)")
+
+
+def stable_prefix(text: str) -> str:
+    """Longest prefix ending on a word boundary that leaves no markdown marker open."""
+    cut = max(text.rfind(" "), text.rfind("\n"))
+    prefix = text[:cut] if cut > 0 else ""
+    if prefix.count("**") % 2:
+        prefix = prefix[:prefix.rfind("**")]
+    if prefix.count("`") % 2:
+        prefix = prefix[:prefix.rfind("`")]
+    singles = [match.start() for match in SINGLE_STAR.finditer(prefix)]
+    if len(singles) % 2:
+        prefix = prefix[:singles[-1]]
+    return prefix.rstrip()
+
+
+def split_point(text: str, start: int, limit: int) -> int:
+    """Where to end a message that starts at `start`, preferring paragraph, line, then word breaks."""
+    end = start + limit
+    if len(text) <= end:
+        return len(text)
+    window = text[start:end]
+    for separator in ("\n\n", "\n", " "):
+        index = window.rfind(separator)
+        if index > limit // 2:
+            return start + index
+    return end
+
+
+class StreamingReply:
+    """One streamed reply, possibly spread over several Telegram messages."""
+
+    def __init__(
+        self,
+        send: Callable[..., Awaitable[Any]],
+        *,
+        render: Callable[[str], str],
+        edit_interval: float = 1.0,
+        placeholder: str = DEFAULT_PLACEHOLDER,
+        max_chars: int = MAX_MESSAGE_CHARS,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+    ):
+        self._send = send
+        self._render = render
+        self.edit_interval = max(0.0, float(edit_interval))
+        self.placeholder = placeholder
+        self.max_chars = max(100, int(max_chars))
+        self._clock = clock
+        self._sleep = sleep
+        self.text = ""
+        self.messages: List[Any] = []
+        self._offset = 0
+        self._shown: str | None = None
+        self._next_edit_at = 0.0
+        self.edits = 0
+        self.started_at: float | None = None
+        self.first_text_at: float | None = None
+
+    @property
+    def started(self) -> bool:
+        return bool(self.messages)
+
+    async def start(self) -> None:
+        """Send the placeholder message the reply will grow into."""
+        self.started_at = self._clock()
+        await self._open_message()
+
+    async def push(self, delta: str) -> None:
+        """Append streamed text, editing the visible message when the throttle allows."""
+        if not delta:
+            return
+        self.text += delta
+        await self._roll_over()
+        if self._clock() < self._next_edit_at:
+            return
+        visible = stable_prefix(self.text[self._offset:])
+        if visible:
+            await self._edit(self._render(visible), force=False)
+
+    async def finish(self, text: str | None = None) -> List[Any]:
+        """Show the complete reply (optionally replaced by `text`) and return its messages."""
+        if text is not None:
+            self.text = text
+        if not self.started:
+            await self.start()
+        await self._roll_over()
+        await self._edit(self._render(self.text[self._offset:].strip() or self.placeholder), force=True)
+        return list(self.messages)
+
+    async def fail(self, text: str) -> None:
+        """Replace whatever is showing in the current message with a plain-text notice."""
+        if not self.started:
+            self.messages.append(await self._send(text))
+            return
+        await self._edit(text, force=True, parse_mode=None)
+
+    async def _open_message(self) -> None:
+        self.messages.append(await self._send(self.placeholder))
+        self._shown = self.placeholder
+
+    async def _roll_over(self) -> None:
+        # Freeze full messages at a natural break and continue in a new one.
+        while len(self.text) - self._offset > self.max_chars:
+            cut = split_point(self.text, self._offset, self.max_chars)
+            await self._edit(self._render(self.text[self._offset:cut].strip()), force=True)
+            self._offset = cut
+            while self._offset < len(self.text) and self.text[self._offset].isspace():
+                self._offset += 1
+            await self._open_message()
+
+    async def _edit(self, rendered: str, *, force: bool, parse_mode: str | None = "HTML") -> None:
+        if rendered == self._shown:
+            return
+        message = self.messages[-1]
+        for attempt in range(2):
+            try:
+                await message.edit_text(rendered, parse_mode=parse_mode)
+            except RetryAfter as exc:
+                wait = float(exc.retry_after)
+                if not force or attempt:
+                    self._next_edit_at = self._clock() + wait
+                    if force:
+                        raise
+                    return
+                logger.warning("Telegram flood control while finishing a streamed reply; waiting %.1fs", wait)
+                await self._sleep(wait)
+                continue
+            except BadRequest as exc:
+                if "not modified" not in str(exc).lower():
+                    if force:
+                        raise
+                    self._skip_edit(exc)
+                    return
+            except TelegramError as exc:
+                if force:
+                    raise
+                self._skip_edit(exc)
+                return
+            break
+        self._shown = rendered
+        self.edits += 1
+        if self.first_text_at is None and rendered != self.placeholder:
+            self.first_text_at = self._clock()
+        self._next_edit_at = self._clock() + self.edit_interval
+
+    def _skip_edit(self, exc: Exception) -> None:
+        # The stream keeps going; the next edit or the final one catches the message up.
+        logger.warning("Skipping an intermediate edit of a streamed reply: %s", exc)
+        self._next_edit_at = self._clock() + max(1.0, 2 * self.edit_interval)
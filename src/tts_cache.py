@@ -0,0 +1,256 @@
+"""Content-addressed cache for synthesized speech.
+
+Many voice replies repeat word for word: fallback notices, short
+acknowledgements, and check-in lines that come up again. The audio for a
+given model, voice, format and text never changes, so it is stored under
+the SHA-256 of those four values and served without another synthesis call.
+
+There are two tiers:
+
+* an in-process LRU capped by total bytes, for hot phrases;
+* an optional directory on disk capped by total bytes. It survives restarts,
+  and the least recently used files are evicted first.
+
+Most replies are personal and never repeat, so a phrase is only admitted
+once it has been synthesized `admit_after` times (twice by default); until
+then only its key is remembered, in a bounded LRU. A one-off reply is
+therefore never written to memory or disk. Note that the disk tier does
+hold reply audio in the clear, so point it at a private directory.
+
+Concurrent requests for the same phrase share one synthesis. It runs as a
+task the cache owns, so cancelling one caller never cancels the others; it
+is only abandoned once every caller waiting on it has gone.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE_SUFFIX = ".audio"
+
+
+def tts_cache_key(model: str, voice: str, response_format: str, text: str) -> str:
+    """Stable key for one synthesized phrase."""
+    payload = "\x1f".join((model, voice, response_format, text.strip()))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """LRU memory tier in front of an optional size-capped disk tier."""
+
+    def __init__(
+        self,
+        *,
+        max_memory_bytes: int = 32 * 1024 * 1024,
+        disk_dir: str | None = None,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        admit_after: int = 2,
+        max_candidates: int = 10_000,
+    ):
+        self.max_memory_bytes = max(0, int(max_memory_bytes))
+        self.disk_dir = disk_dir or None
+        self.max_disk_bytes = max(0, int(max_disk_bytes))
+        self.admit_after = max(1, int(admit_after))
+        self.max_candidates = max(1, int(max_candidates))
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_index: OrderedDict[str, int] | None = None
+        self._disk_bytes = 0
+        self._disk_lock = asyncio.Lock()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        # Keys synthesized fewer than `admit_after` times, with their count so far.
+        self._candidates: OrderedDict[str, int] = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_errors = 0
+        self.not_admitted = 0
+
+    async def get_or_synthesize(self, key: str, synthesize: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Return cached audio for `key`, synthesizing (once, even under concurrency) on a miss.
+
+        The result is only cached once `key` has been synthesized `admit_after` times.
+        """
+        audio = await self.get(key)
+        if audio is not None:
+            return audio
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._synthesize(key, synthesize))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters[task] == 1:
+                # Last one waiting: stop paying for audio nobody will play.
+                self._in_flight.pop(key, None)
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    async def _synthesize(self, key: str, synthesize: Callable[[], Awaitable[bytes]]) -> bytes:
+        audio = await synthesize()
+        if audio:
+            if self._admit(key):
+                await self.put(key, audio)
+            else:
+                self.not_admitted += 1
+        return audio
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Waiters re-raise it; mark it retrieved so an abandoned failure doesn't log "never retrieved".
+            task.exception()
+
+    def _admit(self, key: str) -> bool:
+        seen = self._candidates.pop(key, 0) + 1
+        if seen >= self.admit_after:
+            return True
+        self._candidates[key] = seen
+        while len(self._candidates) > self.max_candidates:
+            self._candidates.popitem(last=False)
+        return False
+
+    async def get(self, key: str) -> bytes | None:
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return audio
+        if self.disk_dir:
+            audio = await self._read_disk(key)
+            if audio is not None:
+                self.disk_hits += 1
+                self._remember(key, audio)
+                return audio
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, audio: bytes) -> None:
+        self._remember(key, audio)
+        if self.disk_dir:
+            await self._write_disk(key, audio)
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        if len(audio) > self.max_memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key + CACHE_FILE_SUFFIX)
+
+    async def _load_disk_index(self) -> OrderedDict[str, int]:
+        if self._disk_index is None:
+            entries = await asyncio.to_thread(self._scan_disk)
+            self._disk_index = OrderedDict(entries)
+            self._disk_bytes = sum(self._disk_index.values())
+        return self._disk_index
+
+    def _scan_disk(self) -> list[tuple[str, int]]:
+        os.makedirs(self.disk_dir, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and entry.name.endswith(CACHE_FILE_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[: -len(CACHE_FILE_SUFFIX)], stat.st_size))
+        # Oldest first, so the index starts out in least-recently-used order.
+        return [(key, size) for _, key, size in sorted(entries)]
+
+    async def _read_disk(self, key: str) -> bytes | None:
+        async with self._disk_lock:
+            try:
+                index = await self._load_disk_index()
+                if key not in index:
+                    return None
+                audio = await asyncio.to_thread(self._read_and_touch, self._path(key))
+            except OSError as e:
+                self.disk_errors += 1
+                logger.warning("TTS disk cache read failed: %s", e)
+                return None
+            index.move_to_end(key)
+            return audio
+
+    def _read_and_touch(self, path: str) -> bytes:
+        with open(path, "rb") as handle:
+            audio = handle.read()
+        os.utime(path)
+        return audio
+
+    async def _write_disk(self, key: str, audio: bytes) -> None:
+        if len(audio) > self.max_disk_bytes:
+            return
+        async with self._disk_lock:
+            try:
+                index = await self._load_disk_index()
+                if key in index:
+                    index.move_to_end(key)
+                    return
+                evicted = []
+                while index and self._disk_bytes + len(audio) > self.max_disk_bytes:
+                    old_key, size = index.popitem(last=False)
+                    self._disk_bytes -= size
+                    evicted.append(self._path(old_key))
+                await asyncio.to_thread(self._write_file, self._path(key), audio, evicted)
+            except OSError as e:
+                self.disk_errors += 1
+                logger.warning("TTS disk cache write failed: %s", e)
+                return
+            index[key] = len(audio)
+            self._disk_bytes += len(audio)
+
+    def _write_file(self, path: str, audio: bytes, evicted: list[str]) -> None:
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+        # Write then rename so a crash never leaves a truncated file under a valid key.
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(audio)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def stats(self) -> dict[str, int | bool]:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_enabled": bool(self.disk_dir),
+            "disk_entries": len(self._disk_index) if self._disk_index is not None else 0,
+            "disk_bytes": self._disk_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "disk_errors": self.disk_errors,
+            "candidates": len(self._candidates),
+            "not_admitted": self.not_admitted,
+        }
@@ -0,0 +1,271 @@
+"""Telegram update ingestion pipeline for MindMate.
+
+The webhook route only decodes an update and drops it into a bounded
+in-process queue, so Telegram gets its 200 straight away instead of waiting
+for a full LLM round-trip (and retrying when that is slow). A small pool of
+background workers drains the queue and hands each update to the bot.
+
+Handlers then run through a `KeyedScheduler`: updates that share a key (a
+user, or the configured heartbeat chat) are handled strictly in arrival
+order, while different keys run concurrently up to a global limit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Hashable
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+UpdateProcessor = Callable[[Any], Awaitable[None]]
+
+
+class UpdateIngestQueue:
+    """Bounded queue of decoded updates drained by a fixed worker pool."""
+
+    def __init__(self, process: UpdateProcessor, *, maxsize: int = 1000, workers: int = 8):
+        self._process = process
+        self.maxsize = max(1, int(maxsize))
+        self.worker_count = max(1, int(workers))
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self._dequeued = 0
+        self._total_wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._last_wait_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+        return self._queue
+
+    def submit(self, update: Any) -> bool:
+        """Enqueue an update without waiting; returns False when the queue is full."""
+        try:
+            self._get_queue().put_nowait((time.monotonic(), update))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        queue = self._get_queue()
+        self._workers = [
+            asyncio.create_task(self._worker(queue), name=f"mindmate-update-worker-{index}")
+            for index in range(self.worker_count)
+        ]
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Let workers finish queued updates (up to `drain_timeout`), then cancel them."""
+        if not self._workers:
+            return
+        queue = self._get_queue()
+        try:
+            await asyncio.wait_for(queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Update queue drain timed out with %s update(s) still queued", queue.qsize())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            enqueued_at, update = await queue.get()
+            waited = time.monotonic() - enqueued_at
+            self._dequeued += 1
+            self._last_wait_seconds = waited
+            self._total_wait_seconds += waited
+            self._max_wait_seconds = max(self._max_wait_seconds, waited)
+            try:
+                await self._process(update)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error("Queued update processing failed: %s", e, exc_info=True)
+            finally:
+                queue.task_done()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "depth": self._queue.qsize() if self._queue else 0,
+            "maxsize": self.maxsize,
+            "workers": len(self._workers),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "last_wait_ms": round(1000 * self._last_wait_seconds, 2),
+            "avg_wait_ms": round(1000 * self._total_wait_seconds / self._dequeued, 2) if self._dequeued else 0.0,
+            "max_wait_ms": round(1000 * self._max_wait_seconds, 2),
+        }
+
+
+class KeyedScheduler:
+    """Run jobs in submission order per key, with bounded cross-key concurrency.
+
+    Each key gets a FIFO lane drained by its own task. A lane exists only
+    while its key has pending work and is dropped as soon as it empties, so
+    memory is bounded by the number of keys with in-flight jobs, not by the
+    number of users ever seen.
+    """
+
+    def __init__(self, *, max_concurrency: int = 16, max_pending: int = 1000):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_pending = max(1, int(max_pending))
+        self._lanes: dict[Hashable, deque] = {}
+        self._drainers: set[asyncio.Task] = set()
+        self._running_slots: asyncio.Semaphore | None = None
+        self._pending_slots: asyncio.Semaphore | None = None
+        self._pending = 0
+        self._running = 0
+        self.completed = 0
+        self.failed = 0
+        self.peak_active_keys = 0
+
+    def _get_running_slots(self) -> asyncio.Semaphore:
+        if self._running_slots is None:
+            self._running_slots = asyncio.Semaphore(self.max_concurrency)
+        return self._running_slots
+
+    def _get_pending_slots(self) -> asyncio.Semaphore:
+        if self._pending_slots is None:
+            self._pending_slots = asyncio.Semaphore(self.max_pending)
+        return self._pending_slots
+
+    async def submit(self, key: Hashable, job: Awaitable[Any]) -> asyncio.Future:
+        """Queue `job` behind earlier jobs for `key` and return a future for its result.
+
+        Waits only when `max_pending` jobs are already queued (backpressure);
+        it never waits for the job itself to run.
+        """
+        try:
+            await self._get_pending_slots().acquire()
+        except BaseException:
+            _close_unstarted(job)
+            raise
+        self._pending += 1
+        future = asyncio.get_running_loop().create_future()
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = deque()
+            self.peak_active_keys = max(self.peak_active_keys, len(self._lanes))
+            drainer = asyncio.create_task(self._drain(key, lane), name=f"mindmate-lane-{key}")
+            self._drainers.add(drainer)
+            drainer.add_done_callback(self._drainers.discard)
+        lane.append((job, future))
+        return future
+
+    async def run(self, key: Hashable, job: Awaitable[Any]) -> Any:
+        """Submit `job` and wait for its result."""
+        future = await self.submit(key, job)
+        return await future
+
+    async def _drain(self, key: Hashable, lane: deque) -> None:
+        try:
+            while lane:
+                job, future = lane[0]
+                try:
+                    async with self._get_running_slots():
+                        self._running += 1
+                        try:
+                            result = await job
+                        finally:
+                            self._running -= 1
+                except asyncio.CancelledError:
+                    _close_unstarted(job)
+                    future.cancel()
+                    raise
+                except Exception as exc:
+                    self.failed += 1
+                    if not future.done():
+                        future.set_exception(exc)
+                        # Fire-and-forget submitters never read the result.
+                        future.exception()
+                    logger.error("Scheduled job for %s failed: %s", key, exc, exc_info=True)
+                else:
+                    self.completed += 1
+                    if not future.done():
+                        future.set_result(result)
+                finally:
+                    lane.popleft()
+                    self._pending -= 1
+                    self._get_pending_slots().release()
+        finally:
+            # Idle-key cleanup: drop the lane as soon as it has no work left.
+            for job, future in lane:
+                _close_unstarted(job)
+                future.cancel()
+                self._pending -= 1
+                self._get_pending_slots().release()
+            lane.clear()
+            if self._lanes.get(key) is lane:
+                del self._lanes[key]
+
+    async def shutdown(self, timeout: float = 10.0) -> None:
+        """Wait for queued jobs to finish (up to `timeout`), then cancel the rest."""
+        if not self._drainers:
+            return
+        drainers = list(self._drainers)
+        _, still_running = await asyncio.wait(drainers, timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        await asyncio.gather(*still_running, return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "active_keys": len(self._lanes),
+            "peak_active_keys": self.peak_active_keys,
+            "pending": self._pending,
+            "running": self._running,
+            "max_concurrency": self.max_concurrency,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+def _close_unstarted(job: Awaitable[Any]) -> None:
+    close = getattr(job, "close", None)
+    if close:
+        close()
+
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """python-telegram-bot update processor backed by a `KeyedScheduler`.
+
+    PTB's own semaphore only bounds how many updates are being handed over
+    at once; actual handler concurrency and per-key ordering come from the
+    scheduler.
+    """
+
+    def __init__(self, scheduler: KeyedScheduler, key_func: Callable[[object], Hashable]):
+        super().__init__(max_concurrent_updates=scheduler.max_concurrency)
+        self.scheduler = scheduler
+        self.key_func = key_func
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await self.scheduler.submit(self.key_func(update), coroutine)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        await self.scheduler.shutdown()
@@ -2,16 +2,34 @@
 
 Uses the public OurManna Verse of the Day endpoint because it is simple,
 JSON-based, and does not require API keys for basic usage.
+
+The verse only changes once a day, so `get_verse_of_the_day()` serves it
+from a day-keyed cache: concurrent callers share a single upstream request,
+a failed refresh keeps serving the last good verse, and the cache can be
+persisted to disk (`VOTD_CACHE_PATH`) so restarts do not refetch.
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict
+from zoneinfo import ZoneInfo
 
 import httpx
 
+logger = logging.getLogger(__name__)
+
 OURMANNA_VOTD_URL = "https://beta.ourmanna.com/api/v1/get?format=json"
 OURMANNA_TIMEOUT_SECONDS = 10.0
+# After a failed refresh, keep serving the stale verse this long before trying again.
+VOTD_RETRY_AFTER_FAILURE_SECONDS = 300.0
 
 
 @dataclass(slots=True)
@@ -29,7 +47,7 @@ def _clean_value(value: object) -> str:
     return str(value).strip()
 
 
-async def get_verse_of_the_day() -> VerseOfTheDay:
+async def fetch_verse_of_the_day() -> VerseOfTheDay:
     """Fetch and normalize a daily verse from OurManna."""
     async with httpx.AsyncClient(timeout=OURMANNA_TIMEOUT_SECONDS, follow_redirects=True) as client:
         response = await client.get(OURMANNA_VOTD_URL)
@@ -51,3 +69,117 @@ async def get_verse_of_the_day() -> VerseOfTheDay:
         version=version,
         link=link,
     )
+
+
+class VerseCache:
+    """Day-keyed verse cache with single-flight refresh and stale-while-revalidate."""
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[VerseOfTheDay]] = fetch_verse_of_the_day,
+        *,
+        timezone: str = "UTC",
+        persist_path: str | Path | None = None,
+        retry_after_failure_seconds: float = VOTD_RETRY_AFTER_FAILURE_SECONDS,
+    ):
+        self._fetch = fetch
+        try:
+            self.timezone = ZoneInfo(timezone)
+        except Exception:
+            logger.warning("Invalid Verse of the Day timezone %s; using UTC", timezone)
+            self.timezone = ZoneInfo("UTC")
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.retry_after_failure_seconds = retry_after_failure_seconds
+        self._day: str | None = None
+        self._verse: VerseOfTheDay | None = None
+        self._loaded_from_disk = False
+        # In-flight refreshes by day, so a caller for tomorrow never gets today's fetch.
+        self._refreshes: Dict[str, asyncio.Future] = {}
+        self._failed_at: float | None = None
+        self.upstream_requests = 0
+
+    def today(self) -> str:
+        return datetime.now(self.timezone).strftime("%Y-%m-%d")
+
+    def _load(self) -> None:
+        self._loaded_from_disk = True
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        try:
+            payload = json.loads(self.persist_path.read_text(encoding="utf-8"))
+            self._day = payload["day"]
+            self._verse = VerseOfTheDay(**payload["verse"])
+        except Exception as e:
+            logger.warning("Ignoring unreadable Verse of the Day cache %s: %s", self.persist_path, e)
+
+    def _store(self, day: str, verse: VerseOfTheDay) -> None:
+        if self._day is not None and day < self._day:
+            # A slow refresh for an earlier day finished after a later one; keep the newer verse.
+            return
+        self._day, self._verse, self._failed_at = day, verse, None
+        if not self.persist_path:
+            return
+        try:
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.persist_path.with_suffix(self.persist_path.suffix + ".tmp")
+            tmp_path.write_text(json.dumps({"day": day, "verse": asdict(verse)}), encoding="utf-8")
+            os.replace(tmp_path, self.persist_path)
+        except OSError as e:
+            logger.warning("Could not persist Verse of the Day cache to %s: %s", self.persist_path, e)
+
+    async def _refresh_for(self, day: str) -> VerseOfTheDay:
+        self.upstream_requests += 1
+        try:
+            verse = await self._fetch()
+        except Exception as e:
+            self._failed_at = time.monotonic()
+            if self._verse is not None:
+                logger.warning("Verse of the Day refresh failed; serving %s from %s: %s", self._verse.reference, self._day, e)
+            raise
+        self._store(day, verse)
+        return verse
+
+    async def get(self, day: str | None = None) -> VerseOfTheDay:
+        """Return the verse for `day` (default: today), fetching at most once per day."""
+        if not self._loaded_from_disk:
+            self._load()
+        day = day or self.today()
+        if self._day == day and self._verse is not None:
+            return self._verse
+        if (
+            self._verse is not None
+            and self._failed_at is not None
+            and time.monotonic() - self._failed_at < self.retry_after_failure_seconds
+        ):
+            return self._verse
+
+        refresh = self._refreshes.get(day)
+        if refresh is None:
+            refresh = self._refreshes[day] = asyncio.ensure_future(self._refresh_for(day))
+            refresh.add_done_callback(lambda _future: self._refreshes.pop(day, None))
+        try:
+            return await asyncio.shield(refresh)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if self._verse is None:
+                raise
+            return self._verse
+
+
+_verse_cache: VerseCache | None = None
+
+
+def get_verse_cache() -> VerseCache:
+    global _verse_cache
+    if _verse_cache is None:
+        _verse_cache = VerseCache(
+            timezone=os.getenv("DAILY_HEARTBEAT_TIMEZONE", "Africa/Johannesburg").strip() or "Africa/Johannesburg",
+            persist_path=os.getenv("VOTD_CACHE_PATH", "").strip() or None,
+        )
+    return _verse_cache
+
+
+async def get_verse_of_the_day() -> VerseOfTheDay:
+    """Return today's verse, fetching from OurManna at most once per local day."""
+    return await get_verse_cache().get()
@@ -0,0 +1,229 @@
+"""Bounded worker pool and admission control for voice notes.
+
+A voice note is the most expensive update MindMate handles (download,
+transcription, completion and speech), so voice work runs on its own small
+pool rather than inside the per-user update lane. That keeps a burst of
+voice notes from tying up the update scheduler's slots, so text messages
+stay responsive.
+
+A user's notes run strictly one at a time, in the order they arrived, so
+their transcripts and replies land in history in sequence and each reply
+sees the previous one. Different users' notes run in parallel, and a user
+with several notes waiting goes back in line after each one so nobody
+monopolises the workers. Text messages from a user can wait on
+`wait_for_user` so they are answered after that user's earlier notes.
+
+Admission is decided up front:
+
+* each user may have at most `per_user_limit` voice notes queued (including
+  the one running);
+* at most `max_queue` notes wait in total, and anything beyond that is refused;
+* an accepted note reports its position so the user knows they are waiting.
+
+When a note has waited longer than `latency_budget_seconds` by the time a
+worker picks it up, or its estimated wait already exceeds the budget at
+admission, it is answered text-only and the speech stage is skipped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+VoiceJob = Callable[[bool], Awaitable[Any]]
+
+DEFAULT_JOB_SECONDS = 8.0  # initial estimate until real voice turns have been timed
+JOB_SECONDS_SMOOTHING = 0.2
+
+
+@dataclass(frozen=True)
+class VoiceAdmission:
+    """Outcome of offering a voice note to the pool."""
+
+    accepted: bool
+    position: int = 0
+    estimated_wait_seconds: float = 0.0
+    text_only: bool = False
+    reason: str | None = None
+
+
+class VoiceJobPool:
+    """Fixed set of workers draining per-user FIFO lanes of voice jobs."""
+
+    def __init__(
+        self,
+        *,
+        workers: int = 4,
+        max_queue: int = 50,
+        per_user_limit: int = 2,
+        latency_budget_seconds: float = 45.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.worker_count = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.per_user_limit = max(1, int(per_user_limit))
+        self.latency_budget_seconds = max(0.0, float(latency_budget_seconds))
+        self._clock = clock
+        # Users whose next note is ready to run; each user appears at most once.
+        self._ready: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._lanes: dict[Hashable, deque] = {}
+        self._idle: dict[Hashable, asyncio.Event] = {}
+        self._waiting = 0
+        self._running = 0
+        self._job_seconds = DEFAULT_JOB_SECONDS
+        self.accepted = 0
+        self.rejected_user_limit = 0
+        self.rejected_queue_full = 0
+        self.text_only = 0
+        self.completed = 0
+        self.failed = 0
+        self._max_wait_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def _get_ready(self) -> asyncio.Queue:
+        if self._ready is None:
+            self._ready = asyncio.Queue()
+        return self._ready
+
+    def estimated_wait(self, position: int) -> float:
+        """Seconds a job `position` places back is expected to wait for a worker."""
+        return position * self._job_seconds / self.worker_count
+
+    def submit(self, user_id: Hashable, job: VoiceJob) -> VoiceAdmission:
+        """Queue `job` behind `user_id`'s earlier notes without waiting; `job(text_only)` runs on a worker."""
+        lane = self._lanes.get(user_id)
+        if lane is not None and len(lane) >= self.per_user_limit:
+            self.rejected_user_limit += 1
+            return VoiceAdmission(accepted=False, reason="user_limit")
+        if self._waiting >= self.max_queue:
+            self.rejected_queue_full += 1
+            return VoiceAdmission(accepted=False, reason="queue_full")
+        ready = self._get_ready()
+        idle_workers = max(0, self.worker_count - self._running)
+        position = max(0, ready.qsize() + 1 - idle_workers)
+        estimated_wait = self.estimated_wait(position)
+        if lane:
+            # The user's own notes ahead of this one run back to back.
+            position = max(position, len(lane))
+            estimated_wait = max(estimated_wait, len(lane) * self._job_seconds)
+        text_only = estimated_wait > self.latency_budget_seconds
+        if lane is None:
+            lane = self._lanes[user_id] = deque()
+            ready.put_nowait(user_id)
+        lane.append((job, self._clock(), text_only))
+        self._waiting += 1
+        self.accepted += 1
+        return VoiceAdmission(
+            accepted=True,
+            position=position,
+            estimated_wait_seconds=estimated_wait,
+            text_only=text_only,
+        )
+
+    async def wait_for_user(self, user_id: Hashable) -> None:
+        """Wait until every voice note `user_id` has queued so far has been answered."""
+        while user_id in self._lanes and self._workers:
+            event = self._idle.get(user_id)
+            if event is None:
+                event = self._idle[user_id] = asyncio.Event()
+            await event.wait()
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        ready = self._get_ready()
+        self._workers = [
+            asyncio.create_task(self._worker(ready), name=f"mindmate-voice-worker-{index}")
+            for index in range(self.worker_count)
+        ]
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Let workers finish queued voice notes (up to `drain_timeout`), then cancel them."""
+        if not self._workers:
+            return
+        ready = self._get_ready()
+        try:
+            await asyncio.wait_for(ready.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Voice queue drain timed out with %s note(s) still queued", self._waiting)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for event in self._idle.values():
+            event.set()
+        self._idle.clear()
+
+    async def _worker(self, ready: asyncio.Queue) -> None:
+        while True:
+            user_id = await ready.get()
+            lane = self._lanes[user_id]
+            job, enqueued_at, text_only = lane[0]
+            self._waiting -= 1
+            started = self._clock()
+            waited = started - enqueued_at
+            self._max_wait_seconds = max(self._max_wait_seconds, waited)
+            text_only = text_only or waited > self.latency_budget_seconds
+            if text_only:
+                self.text_only += 1
+                logger.info("Voice note for %s waited %.1fs; answering text-only", user_id, waited)
+            self._running += 1
+            try:
+                await job(text_only)
+                self.completed += 1
+            except asyncio.CancelledError as e:
+                # Only stop when this worker is being cancelled; a job that was cancelled
+                # internally (e.g. an abandoned shared synthesis) is just a failed job.
+                if asyncio.current_task().cancelling():
+                    raise
+                self.failed += 1
+                logger.error("Voice job for %s was cancelled: %r", user_id, e)
+            except Exception as e:
+                self.failed += 1
+                logger.error("Voice job for %s failed: %s", user_id, e, exc_info=True)
+            finally:
+                self._running -= 1
+                self._record_duration(self._clock() - started)
+                self._advance(user_id, lane)
+                ready.task_done()
+
+    def _advance(self, user_id: Hashable, lane: deque) -> None:
+        lane.popleft()
+        if lane:
+            # Back of the line, so one user's backlog can't hold every worker.
+            self._get_ready().put_nowait(user_id)
+            return
+        del self._lanes[user_id]
+        event = self._idle.pop(user_id, None)
+        if event is not None:
+            event.set()
+
+    def _record_duration(self, seconds: float) -> None:
+        self._job_seconds += JOB_SECONDS_SMOOTHING * (seconds - self._job_seconds)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "queued": self._waiting,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "users": len(self._lanes),
+            "accepted": self.accepted,
+            "rejected_user_limit": self.rejected_user_limit,
+            "rejected_queue_full": self.rejected_queue_full,
+            "text_only": self.text_only,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_job_seconds": round(self._job_seconds, 2),
+            "max_wait_ms": round(1000 * self._max_wait_seconds, 2),
+        }
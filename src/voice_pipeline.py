@@ -0,0 +1,141 @@
+"""Overlapped stages for voice replies.
+
+A voice turn runs download → transcription → chat completion → speech →
+upload. The first three stages depend on each other, but the rest do not
+have to wait: the text reply goes out as soon as the completion lands, and
+speech is synthesized per segment in parallel while earlier segments are
+already uploading. Segments are whole sentences; the first one is kept short
+so the first voice note arrives after one small synthesis instead of after
+the whole reply.
+
+Replies that fit in one segment still produce a single voice note. Longer
+replies arrive as consecutive voice notes, in order.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_CHARS = 600
+DEFAULT_FIRST_SEGMENT_CHARS = 200
+SENTENCE_END = re.compile(r"(?<=[.!?…])[\"')\]]*\s+")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences, keeping paragraph breaks as boundaries too."""
+    sentences: List[str] = []
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        sentences.extend(part.strip() for part in SENTENCE_END.split(paragraph.strip()) if part.strip())
+    return sentences
+
+
+def _hard_wrap(sentence: str, limit: int) -> List[str]:
+    # A single run-on sentence longer than a segment is cut at word boundaries.
+    pieces: List[str] = []
+    while len(sentence) > limit:
+        cut = sentence.rfind(" ", 0, limit)
+        cut = cut if cut > limit // 2 else limit
+        pieces.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def segment_for_speech(
+    text: str,
+    *,
+    max_chars: int = DEFAULT_SEGMENT_CHARS,
+    first_chars: int = DEFAULT_FIRST_SEGMENT_CHARS,
+) -> List[str]:
+    """Group sentences into TTS segments; a reply that fits in `max_chars` stays whole."""
+    text = text.strip()
+    if not text:
+        return []
+    max_chars = max(50, int(max_chars))
+    if len(text) <= max_chars:
+        return [text]
+    first_chars = max(50, min(int(first_chars), max_chars))
+    segments: List[str] = []
+    current = ""
+    for sentence in split_sentences(text):
+        limit = first_chars if not segments else max_chars
+        for piece in _hard_wrap(sentence, max_chars):
+            if current and len(current) + 1 + len(piece) > limit:
+                segments.append(current)
+                current = ""
+                limit = max_chars
+            current = f"{current} {piece}" if current else piece
+    if current:
+        segments.append(current)
+    return segments
+
+
+class StageTimings:
+    """Wall-clock marks for the stages of one voice turn."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self._clock = clock
+        self.started_at = clock()
+        self._last = self.started_at
+        self.stages: Dict[str, float] = {}
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, stage: str) -> float:
+        """Record the time since the previous mark under `stage`."""
+        now = self._clock()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last)
+        self._last = now
+        return self.stages[stage]
+
+    def elapsed(self) -> float:
+        return self._clock() - self.started_at
+
+    def note(self, event: str) -> None:
+        """Record when `event` happened, relative to the start of the turn."""
+        self.marks[event] = self.elapsed()
+
+    def format(self) -> str:
+        parts = [f"{stage}={seconds:.2f}s" for stage, seconds in self.stages.items()]
+        parts.extend(f"{event}@{seconds:.2f}s" for event, seconds in self.marks.items())
+        parts.append(f"total={self.elapsed():.2f}s")
+        return " ".join(parts)
+
+
+async def speak_segments(
+    segments: List[str],
+    synthesize: Callable[[str], Awaitable[bytes]],
+    send: Callable[[bytes, int], Awaitable[Any]],
+    *,
+    timings: StageTimings | None = None,
+) -> int:
+    """Synthesize every segment concurrently and send the audio in order.
+
+    Segment `i` is sent as soon as its audio and all earlier segments have
+    gone out, so uploads overlap with the synthesis of later segments. If a
+    segment fails, the remaining syntheses are cancelled and the error is
+    raised; segments already sent stay sent. Returns how many were sent.
+    """
+    tasks = [asyncio.create_task(synthesize(segment)) for segment in segments]
+    sent = 0
+    try:
+        for index, task in enumerate(tasks):
+            audio = await task
+            if not audio:
+                raise ValueError(f"speech synthesis returned no audio for segment {index + 1}/{len(tasks)}")
+            await send(audio, index)
+            sent += 1
+            if timings is not None and index == 0:
+                timings.note("first_audio")
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return sent
@@ -0,0 +1,228 @@
+"""Duration-aware transcription for voice notes.
+
+Short notes go to the transcription model as a single upload. A note longer
+than `threshold_seconds` (Telegram reports the duration with the message, so
+nothing has to be probed) is decoded to 16 kHz mono PCM, split at the
+quietest moment near every `chunk_seconds` mark, and the chunks are
+transcribed concurrently as WAV and stitched back together in order. A slow
+or failed call then only costs one chunk's worth of waiting instead of the
+whole note.
+
+Decoding Telegram's OGG/Opus needs `ffmpeg` on the PATH; it is run through
+pipes, so nothing touches the disk. Without it, long notes fall back to a
+single upload.
+
+Transcripts are cached by Telegram's `file_unique_id`, which is stable for
+the same file across forwards and resends, so a repeated note skips both the
+download and the transcription.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import shutil
+import wave
+from collections import OrderedDict
+from typing import Awaitable, Callable, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16_000
+FRAME_SECONDS = 0.05
+SILENCE_WINDOW_SECONDS = 0.4
+# Split points are searched in the last part of each chunk, so chunks never exceed `chunk_seconds`.
+SPLIT_SEARCH_FRACTION = 0.4
+DECODE_TIMEOUT_SECONDS = 30.0
+
+Transcribe = Callable[[bytes, str], Awaitable[str]]
+Decoder = Callable[[bytes], Awaitable["np.ndarray | None"]]
+
+
+class TranscriptCache:
+    """LRU of transcripts keyed by Telegram `file_unique_id`."""
+
+    def __init__(self, *, max_entries: int = 500):
+        self.max_entries = max(1, int(max_entries))
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str | None) -> str | None:
+        if not key:
+            return None
+        text = self._entries.get(key)
+        if text is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return text
+
+    def put(self, key: str | None, text: str) -> None:
+        if not key or not text:
+            return
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def find_split_points(
+    samples: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    *,
+    chunk_seconds: float = 60.0,
+) -> List[int]:
+    """Sample offsets to cut at: the quietest stretch before each `chunk_seconds` mark."""
+    frame = max(1, int(sample_rate * FRAME_SECONDS))
+    frame_count = len(samples) // frame
+    chunk_frames = max(2, int(chunk_seconds / FRAME_SECONDS))
+    if frame_count <= chunk_frames:
+        return []
+    framed = samples[: frame_count * frame].astype(np.float32).reshape(frame_count, frame)
+    energy = np.sqrt(np.mean(framed * framed, axis=1))
+    window = max(1, int(SILENCE_WINDOW_SECONDS / FRAME_SECONDS))
+    smoothed = np.convolve(energy, np.ones(window) / window, mode="same")
+
+    splits: List[int] = []
+    start = 0
+    while frame_count - start > chunk_frames:
+        low = start + int(chunk_frames * (1 - SPLIT_SEARCH_FRACTION))
+        high = start + chunk_frames
+        cut = low + int(np.argmin(smoothed[low:high]))
+        splits.append(cut * frame)
+        start = cut
+    return splits
+
+
+def pcm_to_wav(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Wrap 16-bit mono PCM in a WAV container."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.astype("<i2", copy=False).tobytes())
+    return buffer.getvalue()
+
+
+async def decode_with_ffmpeg(
+    audio: bytes,
+    sample_rate: int = SAMPLE_RATE,
+    *,
+    timeout: float = DECODE_TIMEOUT_SECONDS,
+) -> np.ndarray | None:
+    """Decode any format ffmpeg understands to mono 16-bit PCM, or None if it can't in `timeout` seconds."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg, "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(audio), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning("ffmpeg took longer than %.0fs to decode a voice note; giving up", timeout)
+        return None
+    finally:
+        # A hung or cancelled decode must not leave ffmpeg running.
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+    if process.returncode != 0:
+        logger.warning("ffmpeg could not decode voice note: %s", stderr.decode(errors="replace").strip()[:200])
+        return None
+    return np.frombuffer(stdout, dtype="<i2")
+
+
+class ChunkedTranscriber:
+    """Transcribe voice notes whole or in concurrent chunks, with a transcript cache."""
+
+    def __init__(
+        self,
+        transcribe: Transcribe,
+        *,
+        threshold_seconds: float = 90.0,
+        chunk_seconds: float = 60.0,
+        max_parallel: int = 4,
+        cache: TranscriptCache | None = None,
+        decoder: Decoder = decode_with_ffmpeg,
+    ):
+        self._transcribe = transcribe
+        self.threshold_seconds = max(1.0, float(threshold_seconds))
+        self.chunk_seconds = max(5.0, min(float(chunk_seconds), self.threshold_seconds))
+        self.max_parallel = max(1, int(max_parallel))
+        self.cache = cache if cache is not None else TranscriptCache()
+        self._decoder = decoder
+        self.single_uploads = 0
+        self.chunked_notes = 0
+        self.chunks = 0
+
+    def cached(self, key: str | None) -> str | None:
+        """Transcript of a note seen before, so the caller can skip the download too."""
+        return self.cache.get(key)
+
+    async def transcribe(
+        self,
+        audio: bytes,
+        filename: str = "voice.ogg",
+        *,
+        duration: float | None = None,
+        cache_key: str | None = None,
+    ) -> str:
+        """Transcribe `audio`, splitting it first when it is longer than the threshold."""
+        text = None
+        if duration and duration > self.threshold_seconds:
+            samples = await self._decoder(audio)
+            if samples is not None and len(samples) / SAMPLE_RATE > self.threshold_seconds:
+                text = await self._transcribe_chunks(samples)
+            else:
+                logger.info("Transcribing a %.0fs voice note in one upload (could not decode it to split)", duration)
+        if text is None:
+            self.single_uploads += 1
+            text = await self._transcribe(audio, filename)
+        self.cache.put(cache_key, text)
+        return text
+
+    async def _transcribe_chunks(self, samples: np.ndarray) -> str:
+        bounds = [0, *find_split_points(samples, SAMPLE_RATE, chunk_seconds=self.chunk_seconds), len(samples)]
+        slots = asyncio.Semaphore(self.max_parallel)
+
+        async def run(index: int, start: int, end: int) -> str:
+            async with slots:
+                return await self._transcribe(pcm_to_wav(samples[start:end]), f"chunk-{index}.wav")
+
+        tasks = [
+            asyncio.create_task(run(index, start, end))
+            for index, (start, end) in enumerate(zip(bounds, bounds[1:]))
+        ]
+        try:
+            parts = await asyncio.gather(*tasks)
+        finally:
+            # One failed chunk fails the note, so stop paying for the others.
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.chunked_notes += 1
+        self.chunks += len(parts)
+        return " ".join(part.strip() for part in parts if part and part.strip())
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "single_uploads": self.single_uploads,
+            "chunked_notes": self.chunked_notes,
+            "chunks": self.chunks,
+            "cache": self.cache.stats(),
+        }
@@ -5,23 +5,45 @@ so the bot can fetch fresh web results when explicitly requested.
 
 Usage pattern (v1, minimal & opt-in):
 - User sends a message starting with "web:" (e.g. "web: bitcoin price today").
-- The bot calls `search_web` with the rest of the text as the query.
-- The returned string is injected into the LLM prompt as additional context.
+- The bot calls `search_web_async` with the rest of the text as the query.
+- The returned summary is injected into the LLM prompt as additional context.
+
+The async path shares one pooled `httpx.AsyncClient`, caches successful
+results for a short TTL keyed by the normalized query, and coalesces
+identical concurrent lookups into a single upstream request.
 
 No background/implicit calls are made.
 """
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
-from typing import List
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
 
 import httpx
 
 logger = logging.getLogger(__name__)
 
 BRAVE_SEARCH_ENDPOINT = "https://api.search.brave.com/res/v1/web/search"
+BRAVE_SEARCH_TIMEOUT_SECONDS = 8.0
+WEB_SEARCH_CACHE_TTL_SECONDS = max(0.0, float(os.getenv("WEB_SEARCH_CACHE_TTL_SECONDS", "60")))
+WEB_SEARCH_CACHE_MAX_ENTRIES = 256
+
+
+@dataclass(slots=True)
+class WebSearchResult:
+    """Outcome of one web lookup, shaped for prompt injection and user-facing errors."""
+
+    query: str
+    ok: bool
+    summary: str = ""
+    result_count: int = 0
+    error: Optional[str] = None
 
 
 class WebSearchError(Exception):
@@ -43,41 +65,13 @@ def _get_brave_api_key() -> str:
     return key
 
 
-def search_web(query: str, max_results: int = 5) -> str:
-    """Perform a Brave web search and return a text summary.
-
-    Parameters
-    ----------
-    query: str
-        The search query text.
-    max_results: int, optional
-        Maximum number of results to include (default: 5, hard-capped at 10).
-
-    Returns
-    -------
-    str
-        A text block containing a short, LLM-friendly summary of results.
-        If the search fails, a human-friendly error message string is
-        returned instead of raising, so callers can still reply.
-    """
-
-    query = (query or "").strip()
-    if not query:
-        return "No web search query provided. Please include a topic after `web:`."
-
-    # Be defensive with result count and network behaviour
-    max_results = max(1, min(int(max_results or 5), 10))
+def normalize_search_query(query: str) -> str:
+    """Normalize a query for cache/coalescing keys (case and whitespace insensitive)."""
+    return " ".join((query or "").lower().split())
 
-    try:
-        api_key = _get_brave_api_key()
-    except WebSearchError as e:
-        # Log only the fact that config is missing, never the key
-        logger.warning(f"Web search unavailable: {e}")
-        return (
-            "Web search is not configured yet (missing BRAVE_API_KEY). "
-            "Ask the maintainer to set it in the environment."
-        )
 
+def _build_request(query: str, max_results: int) -> tuple[dict, dict]:
+    api_key = _get_brave_api_key()
     headers = {
         # Brave uses this header for API key auth
         "X-Subscription-Token": api_key,
@@ -90,37 +84,23 @@ def search_web(query: str, max_results: int = 5) -> str:
         # Keep it generic; the LLM can localise/interpret results
         "safesearch": "moderate",
     }
+    return headers, params
 
-    try:
-        with httpx.Client(timeout=8.0) as client:
-            response = client.get(BRAVE_SEARCH_ENDPOINT, headers=headers, params=params)
-            response.raise_for_status()
-            data = response.json()
 
-    except httpx.HTTPStatusError as e:
-        logger.error("Brave search HTTP error: %s - %s", e.response.status_code, e.response.text[:500])
-        return (
-            "I tried to search the web, but the search service returned an error. "
-            "Please try again in a bit or rephrase your query."
-        )
-    except httpx.RequestError as e:
-        logger.error("Brave search network error: %s", str(e))
-        return (
-            "I couldn't reach the web search service (network issue). "
-            "Please try again in a moment."
-        )
-    except Exception as e:  # pragma: no cover - defensive catch
-        logger.exception("Unexpected error during Brave web search: %s", str(e))
-        return "Something went wrong while searching the web. Please try again."
+def _failure(query: str, error: str) -> WebSearchResult:
+    return WebSearchResult(query=query, ok=False, error=error)
 
+
+def _summarize_results(query: str, data: dict, max_results: int) -> WebSearchResult:
     # Brave returns results under data["web"]["results"] in the v1 API
     web_block = (data or {}).get("web") or {}
     results: List[dict] = web_block.get("results") or []
 
     if not results:
-        return (
+        return _failure(
+            query,
             "I searched the web but couldn't find any clear results for that. "
-            "Try being more specific with your question."
+            "Try being more specific with your question.",
         )
 
     lines: List[str] = [
@@ -141,11 +121,237 @@ def search_web(query: str, max_results: int = 5) -> str:
         lines.append(line)
         lines.append("")
 
-    return "\n".join(lines)
+    return WebSearchResult(
+        query=query,
+        ok=True,
+        summary="\n".join(lines),
+        result_count=min(len(results), max_results),
+    )
+
 
+def _prepare(query: str, max_results: int) -> tuple[str, int, Optional[WebSearchResult]]:
+    query = (query or "").strip()
+    if not query:
+        return query, max_results, _failure(query, "No web search query provided. Please include a topic after `web:`.")
 
-def build_web_attribution_line(web_search_result: str) -> str:
+    # Be defensive with result count and network behaviour
+    max_results = max(1, min(int(max_results or 5), 10))
+    return query, max_results, None
+
+
+def _missing_key_failure(query: str, error: WebSearchError) -> WebSearchResult:
+    # Log only the fact that config is missing, never the key
+    logger.warning(f"Web search unavailable: {error}")
+    return _failure(
+        query,
+        "Web search is not configured yet (missing BRAVE_API_KEY). "
+        "Ask the maintainer to set it in the environment.",
+    )
+
+
+def _http_failure(query: str, error: Exception) -> WebSearchResult:
+    if isinstance(error, httpx.HTTPStatusError):
+        logger.error("Brave search HTTP error: %s - %s", error.response.status_code, error.response.text[:500])
+        return _failure(
+            query,
+            "I tried to search the web, but the search service returned an error. "
+            "Please try again in a bit or rephrase your query.",
+        )
+    if isinstance(error, httpx.RequestError):
+        logger.error("Brave search network error: %s", str(error))
+        return _failure(
+            query,
+            "I couldn't reach the web search service (network issue). "
+            "Please try again in a moment.",
+        )
+    logger.exception("Unexpected error during Brave web search: %s", str(error))
+    return _failure(query, "Something went wrong while searching the web. Please try again.")
+
+
+def search_web(query: str, max_results: int = 5) -> WebSearchResult:
+    """Perform a blocking Brave web search.
+
+    Prefer `search_web_async` from async code; this variant is kept for
+    scripts and other synchronous callers.
+
+    Parameters
+    ----------
+    query: str
+        The search query text.
+    max_results: int, optional
+        Maximum number of results to include (default: 5, hard-capped at 10).
+
+    Returns
+    -------
+    WebSearchResult
+        `ok` with an LLM-friendly `summary` on success. On failure `error`
+        holds a human-friendly message instead of raising, so callers can
+        still reply.
+    """
+
+    query, max_results, invalid = _prepare(query, max_results)
+    if invalid:
+        return invalid
+
+    try:
+        headers, params = _build_request(query, max_results)
+    except WebSearchError as e:
+        return _missing_key_failure(query, e)
+
+    try:
+        with httpx.Client(timeout=BRAVE_SEARCH_TIMEOUT_SECONDS) as client:
+            response = client.get(BRAVE_SEARCH_ENDPOINT, headers=headers, params=params)
+            response.raise_for_status()
+            data = response.json()
+    except Exception as e:  # pragma: no cover - network path
+        return _http_failure(query, e)
+
+    return _summarize_results(query, data, max_results)
+
+
+class BraveSearchClient:
+    """Async Brave client with one connection pool, a TTL cache and request coalescing."""
+
+    def __init__(
+        self,
+        cache_ttl_seconds: float = WEB_SEARCH_CACHE_TTL_SECONDS,
+        max_cache_entries: int = WEB_SEARCH_CACHE_MAX_ENTRIES,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.max_cache_entries = max(1, max_cache_entries)
+        self._http_client = http_client
+        self._cache: "OrderedDict[tuple[str, int], tuple[float, WebSearchResult]]" = OrderedDict()
+        self._in_flight: dict[tuple[str, int], asyncio.Future] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.coalesced = 0
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                timeout=BRAVE_SEARCH_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            )
+        return self._http_client
+
+    def _cached(self, key: tuple[str, int]) -> Optional[WebSearchResult]:
+        cached = self._cache.get(key)
+        if not cached:
+            return None
+        expires_at, result = cached
+        if expires_at <= time.monotonic():
+            self._cache.pop(key, None)
+            return None
+        self._cache.move_to_end(key)
+        return result
+
+    def _remember(self, key: tuple[str, int], result: WebSearchResult) -> None:
+        if not result.ok or self.cache_ttl_seconds <= 0:
+            return
+        self._cache[key] = (time.monotonic() + self.cache_ttl_seconds, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
+
+    async def search(self, query: str, max_results: int = 5) -> WebSearchResult:
+        query, max_results, invalid = _prepare(query, max_results)
+        if invalid:
+            return invalid
+
+        key = (normalize_search_query(query), max_results)
+        cached = self._cached(key)
+        if cached:
+            self.cache_hits += 1
+            return cached
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The leader was cancelled, not us: retry as a fresh lookup.
+                if not pending.cancelled():
+                    raise
+                return await self.search(query, max_results)
+
+        self.cache_misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await self._fetch(query, max_results)
+            self._remember(key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark retrieved so an un-awaited future does not log a warning.
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def _fetch(self, query: str, max_results: int) -> WebSearchResult:
+        try:
+            headers, params = _build_request(query, max_results)
+        except WebSearchError as e:
+            return _missing_key_failure(query, e)
+
+        try:
+            response = await self._get_http_client().get(BRAVE_SEARCH_ENDPOINT, headers=headers, params=params)
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            return _http_failure(query, e)
+
+        return _summarize_results(query, data, max_results)
+
+    def stats(self) -> dict:
+        return {
+            "cache_entries": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+    async def close(self) -> None:
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+
+_default_client: Optional[BraveSearchClient] = None
+
+
+def get_web_search_client() -> BraveSearchClient:
+    """Return the process-wide async search client."""
+    global _default_client
+    if _default_client is None:
+        _default_client = BraveSearchClient()
+    return _default_client
+
+
+async def search_web_async(query: str, max_results: int = 5) -> WebSearchResult:
+    """Non-blocking `search_web` backed by the shared pooled/cached client."""
+    return await get_web_search_client().search(query, max_results=max_results)
+
+
+async def close_web_search_client() -> None:
+    global _default_client
+    if _default_client is not None:
+        await _default_client.close()
+        _default_client = None
+
+
+def build_web_attribution_line(web_search_result: WebSearchResult | str | None) -> str:
     """Build a short source line for replies that used web search."""
+    if isinstance(web_search_result, WebSearchResult):
+        web_search_result = web_search_result.summary if web_search_result.ok else ""
     if not web_search_result:
         return ""
 
@@ -154,5 +360,3 @@ def build_web_attribution_line(web_search_result: str) -> str:
         return f"Source: {first_line}"
 
     return "Source: web search"
-
-
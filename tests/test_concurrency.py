@@ -0,0 +1,376 @@
+import asyncio
+import sys
+import threading
+import time
+import types
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+import psycopg2
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from llm_gateway import LLMGateway  # noqa: E402
+import postgres_db  # noqa: E402
+from postgres_db import Message, PostgresDatabase  # noqa: E402
+from update_pipeline import KeyedScheduler, UpdateIngestQueue  # noqa: E402
+
+
+class LLMGatewayTests(unittest.IsolatedAsyncioTestCase):
+    async def test_gateway_bounds_in_flight_requests_without_serializing_them(self):
+        active = 0
+        peak = 0
+
+        async def fake_create(**kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return types.SimpleNamespace(model=kwargs["model"])
+
+        client = types.SimpleNamespace(
+            chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=fake_create))
+        )
+        gateway = LLMGateway(client=client, max_concurrency=2)
+
+        results = await asyncio.gather(*(gateway.chat_completion(model=f"m{i}") for i in range(5)))
+
+        self.assertEqual([result.model for result in results], [f"m{i}" for i in range(5)])
+        self.assertEqual(peak, 2)
+        self.assertEqual(gateway.stats()["completed"], 5)
+        self.assertEqual(gateway.stats()["in_flight"], 0)
+
+
+class _SlowPool:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_out = 0
+        self.peak = 0
+
+    def getconn(self):
+        with self.lock:
+            self.checked_out += 1
+            self.peak = max(self.peak, self.checked_out)
+        return object()
+
+    def putconn(self, conn):
+        with self.lock:
+            self.checked_out -= 1
+
+    def closeall(self):
+        pass
+
+
+class PostgresExecutorTests(unittest.IsolatedAsyncioTestCase):
+    async def test_blocking_queries_run_off_loop_and_never_exceed_pool_size(self):
+        pool = _SlowPool()
+        db = PostgresDatabase("postgresql://unused")
+        db.pool_max_size = 3
+        db.pool = pool
+
+        def slow_query(conn):
+            time.sleep(0.05)
+            return threading.current_thread().name
+
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticker = asyncio.create_task(heartbeat())
+        try:
+            names = await asyncio.gather(*(db._run(slow_query) for _ in range(9)))
+        finally:
+            ticker.cancel()
+            await db.close()
+
+        self.assertTrue(all(name.startswith("mindmate-db") for name in names))
+        self.assertEqual(pool.peak, 3)
+        self.assertEqual(pool.checked_out, 0)
+        self.assertGreater(ticks, 10)
+        self.assertEqual(db.get_pool_stats()["total_queries"], 9)
+        self.assertEqual(db.get_pool_stats()["in_flight"], 0)
+
+
+class _RecordingCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def execute(self, query, params=None):
+        self.log.append((" ".join(query.split()), params))
+
+    def fetchall(self):
+        return []
+
+
+class _RecordingConnection:
+    def __init__(self):
+        self.log = []
+        self.commits = 0
+
+    def cursor(self, cursor_factory=None):
+        return _RecordingCursor(self.log)
+
+    def commit(self):
+        self.commits += 1
+
+
+class MessageWriteBufferTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.conn = _RecordingConnection()
+        self.batches = []
+        self.db = PostgresDatabase("postgresql://unused")
+        self.db.prefix = ""
+        self.db.message_batch_size = 4
+        self.db.message_flush_interval = 0.02
+        self.db._run_with_connection = lambda operation: operation(self.conn)
+        self.patcher = patch.object(
+            postgres_db, "execute_values", lambda cursor, query, rows: self.batches.append(list(rows))
+        )
+        self.patcher.start()
+        self.started = datetime(2026, 3, 24, 9, 0)
+
+    async def asyncTearDown(self):
+        self.patcher.stop()
+        await self.db.close()
+
+    async def store(self, user_id, role, content, offset):
+        await self.db.store_message(
+            Message(
+                user_id=user_id,
+                content=content,
+                role=role,
+                timestamp=self.started + timedelta(seconds=offset),
+                message_id=f"{user_id}_{offset}",
+            )
+        )
+
+    async def test_full_batch_is_written_as_one_multi_row_insert(self):
+        await self.store(1, "user", "hi", 0)
+        await self.store(1, "assistant", "hello", 1)
+        await self.store(2, "user", "hey", 2)
+        self.assertEqual(self.batches, [])
+
+        await self.store(2, "assistant", "hey there", 3)
+
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual([row[3] for row in self.batches[0]], ["hi", "hello", "hey", "hey there"])
+        self.assertEqual(self.conn.commits, 1)
+
+    async def test_unflushed_messages_are_visible_and_flush_after_interval(self):
+        await self.store(1, "user", "hi", 0)
+        await self.store(1, "assistant", "hello", 1)
+
+        history = await self.db.get_conversation_history(1, limit=10)
+
+        self.assertEqual(history, [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}])
+        self.assertEqual(self.batches, [])
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(self.db.get_pool_stats()["buffered_messages"], 0)
+
+    async def test_clear_conversation_discards_only_that_users_buffered_rows(self):
+        await self.store(1, "user", "hi", 0)
+        await self.store(2, "user", "hey", 1)
+
+        await self.db.clear_conversation(1)
+        await self.db.flush_messages()
+
+        self.assertEqual([row[0] for row in self.batches[0]], [2])
+        self.assertTrue(any(query.startswith("DELETE FROM mindmate_messages") for query, _ in self.conn.log))
+
+
+    def fail_execute_values(self, should_fail):
+        def execute(cursor, query, rows):
+            rows = list(rows)
+            error = should_fail(rows)
+            if error:
+                raise error
+            self.batches.append(rows)
+
+        self.patcher.stop()
+        self.patcher = patch.object(postgres_db, "execute_values", execute)
+        self.patcher.start()
+
+    async def test_a_rejected_row_is_dropped_without_blocking_the_rest(self):
+        self.fail_execute_values(
+            lambda rows: ValueError("A string literal cannot contain NUL (0x00) characters.")
+            if any("\x00" in row[3] for row in rows) else None
+        )
+        await self.store(1, "user", "hi", 0)
+        await self.store(2, "user", "bad\x00byte", 1)
+        await self.store(3, "user", "hey", 2)
+        await self.store(1, "assistant", "hello", 3)
+
+        self.assertEqual([[row[3] for row in batch] for batch in self.batches], [["hi"], ["hey"], ["hello"]])
+        stats = self.db.get_pool_stats()
+        self.assertEqual((stats["buffered_messages"], stats["messages_dropped"]), (0, 1))
+
+        await self.store(2, "user", "fine now", 4)
+        self.assertEqual(await self.db.flush_messages(), 1)
+
+    async def test_an_outage_keeps_rows_buffered_and_retries_with_backoff(self):
+        outage = [True]
+        self.fail_execute_values(lambda rows: psycopg2.OperationalError("server closed the connection") if outage[0] else None)
+        for offset in range(4):
+            await self.store(1, "user", f"message {offset}", offset)
+
+        self.assertEqual(self.db.get_pool_stats()["buffered_messages"], 4)
+        self.assertEqual(self.db.get_pool_stats()["message_flush_failures"], 1)
+        self.assertEqual(await self.db.get_conversation_history(1, limit=2), [
+            {"role": "user", "content": "message 2"},
+            {"role": "user", "content": "message 3"},
+        ])
+
+        outage[0] = False
+        await asyncio.sleep(0.35)
+
+        self.assertEqual([row[3] for row in self.batches[0]], [f"message {offset}" for offset in range(4)])
+        self.assertEqual(self.db.get_pool_stats()["message_flush_failures"], 0)
+
+    async def test_buffer_is_capped_during_an_outage(self):
+        self.fail_execute_values(lambda rows: psycopg2.OperationalError("down"))
+        self.db.message_buffer_limit = 6
+        for offset in range(10):
+            await self.store(1, "user", f"message {offset}", offset)
+
+        self.assertEqual(self.db.get_pool_stats()["buffered_messages"], 6)
+        self.assertEqual(self.db.get_pool_stats()["messages_dropped"], 4)
+
+
+class DailyCheckinWriteBufferTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.conn = _RecordingConnection()
+        self.batches = []
+        self.db = PostgresDatabase("postgresql://unused")
+        self.db._run_with_connection = lambda operation: operation(self.conn)
+        self.patcher = patch.object(
+            postgres_db, "execute_values", lambda cursor, query, rows, **kwargs: self.batches.append(list(rows))
+        )
+        self.patcher.start()
+
+    async def asyncTearDown(self):
+        self.patcher.stop()
+        await self.db.close()
+
+    async def test_a_cycles_transitions_merge_per_user_into_one_upsert(self):
+        sent_at = datetime(2026, 3, 24, 7, 0)
+        for user_id in (1, 2):
+            await self.db.queue_daily_checkin(user_id, "2026-03-24", True, sent_at=sent_at, status="sent")
+            await self.db.queue_daily_checkin(user_id, "2026-03-24", True, prompt_message_id=40 + user_id, status="sent")
+        await self.db.queue_daily_checkin(3, "2026-03-24", False, sent_at=sent_at, status="failed")
+        self.assertEqual(self.batches, [])
+
+        await self.db.get_daily_heartbeat_due_user_ids("2026-03-25", [1, 2, 3])
+
+        self.assertEqual(len(self.batches), 1)
+        rows = {row[0]: row for row in self.batches[0]}
+        self.assertEqual(sorted(rows), [1, 2, 3])
+        self.assertEqual((rows[1][3], rows[1][5], rows[1][8]), (sent_at, "41", "sent"))
+        self.assertEqual(rows[3][8], "failed")
+        self.assertEqual(self.db.get_pool_stats()["checkin_flushes"], 1)
+        self.assertEqual(await self.db.flush_daily_checkins(), 0)
+
+    async def test_an_immediate_write_folds_in_only_the_same_days_queued_row(self):
+        await self.db.queue_daily_checkin(1, "2026-03-24", True, prompt_message_id=41, status="sent")
+        await self.db.queue_daily_checkin(2, "2026-03-24", True, prompt_message_id=42, status="sent")
+
+        await self.db.upsert_daily_checkin(1, "2026-03-24", False, status="failed")
+
+        self.assertEqual(len(self.batches), 1)
+        [row] = self.batches[0]
+        self.assertEqual((row[0], row[5], row[8]), (1, "41", "failed"))
+        self.assertEqual(self.db.get_pool_stats()["buffered_checkins"], 1)
+
+
+class UpdateIngestQueueTests(unittest.IsolatedAsyncioTestCase):
+    async def test_submit_returns_immediately_and_workers_drain_in_background(self):
+        release = asyncio.Event()
+        processed = []
+
+        async def slow_process(update):
+            await release.wait()
+            processed.append(update)
+
+        queue = UpdateIngestQueue(slow_process, maxsize=2, workers=1)
+        await queue.start()
+        try:
+            self.assertTrue(queue.submit("a"))
+            await asyncio.sleep(0)  # worker picks up "a" and blocks on the event
+            self.assertTrue(queue.submit("b"))
+            self.assertTrue(queue.submit("c"))
+            self.assertFalse(queue.submit("d"))
+            self.assertEqual(queue.stats()["depth"], 2)
+            self.assertEqual(queue.stats()["rejected"], 1)
+
+            release.set()
+        finally:
+            await queue.stop(drain_timeout=1.0)
+
+        self.assertEqual(processed, ["a", "b", "c"])
+        self.assertEqual(queue.stats()["processed"], 3)
+        self.assertGreater(queue.stats()["max_wait_ms"], 0)
+
+
+class KeyedSchedulerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_same_key_runs_in_order_while_other_keys_run_in_parallel(self):
+        events = []
+        active = 0
+        peak = 0
+
+        async def job(key, index, delay):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            events.append((key, index, "start"))
+            await asyncio.sleep(delay)
+            events.append((key, index, "end"))
+            active -= 1
+            return index
+
+        scheduler = KeyedScheduler(max_concurrency=4)
+        futures = []
+        for index, delay in enumerate([0.03, 0.001, 0.01]):
+            futures.append(await scheduler.submit(("user", 1), job(1, index, delay)))
+        futures.append(await scheduler.submit(("user", 2), job(2, 0, 0.01)))
+
+        self.assertEqual(await asyncio.gather(*futures), [0, 1, 2, 0])
+        user_one = [(index, phase) for key, index, phase in events if key == 1]
+        self.assertEqual(
+            user_one,
+            [(0, "start"), (0, "end"), (1, "start"), (1, "end"), (2, "start"), (2, "end")],
+        )
+        # user 2 finished while user 1's first (slow) job was still running
+        self.assertLess(events.index((2, 0, "end")), events.index((1, 0, "end")))
+        self.assertEqual(peak, 2)
+        stats = scheduler.stats()
+        self.assertEqual(stats["active_keys"], 0)
+        self.assertEqual(stats["peak_active_keys"], 2)
+        self.assertEqual(stats["completed"], 4)
+
+    async def test_failed_job_does_not_block_later_jobs_for_the_same_key(self):
+        async def boom():
+            raise ValueError("nope")
+
+        async def ok():
+            return "ok"
+
+        scheduler = KeyedScheduler()
+        failed = await scheduler.submit("k", boom())
+        self.assertEqual(await scheduler.run("k", ok()), "ok")
+        with self.assertRaises(ValueError):
+            await failed
+        self.assertEqual(scheduler.stats()["failed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import sys
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from db_migrations import MIGRATIONS, MIGRATIONS_TABLE, apply_migrations, latest_version  # noqa: E402
+
+
+class _CatalogCursor:
+    """Answers the handful of catalog/version queries the runner issues."""
+
+    def __init__(self, state):
+        self.state = state
+        self.executed = []
+        self._result = []
+
+    def execute(self, query, params=None):
+        normalized = " ".join(query.split())
+        self.executed.append(normalized)
+        if normalized.startswith("SELECT to_regclass"):
+            self._result = [(MIGRATIONS_TABLE if self.state["table"] else None,)]
+        elif normalized.startswith("SELECT COALESCE(MAX(version), 0)"):
+            self._result = [(max(self.state["versions"], default=0),)]
+        elif normalized.startswith(f"SELECT version FROM {MIGRATIONS_TABLE}"):
+            self._result = [(version,) for version in sorted(self.state["versions"])]
+        elif normalized.startswith(f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE}"):
+            self.state["table"] = True
+        elif normalized.startswith(f"INSERT INTO {MIGRATIONS_TABLE}"):
+            self.state["versions"].add(params[0])
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return list(self._result)
+
+
+class _Connection:
+    def __init__(self, state):
+        self.cursor_obj = _CatalogCursor(state)
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return self.cursor_obj
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class MigrationRunnerTests(unittest.TestCase):
+    def test_fresh_database_applies_every_migration_in_order_under_lock(self):
+        state = {"table": False, "versions": set()}
+        conn = _Connection(state)
+
+        applied = apply_migrations(conn)
+
+        self.assertEqual(applied, [migration.version for migration in MIGRATIONS])
+        self.assertEqual(state["versions"], set(applied))
+        executed = conn.cursor_obj.executed
+        self.assertTrue(executed[1].startswith("SELECT pg_advisory_lock"))
+        self.assertTrue(executed[-1].startswith("SELECT pg_advisory_unlock"))
+        self.assertTrue(any("idx_messages_user_conv_ts" in query for query in executed))
+
+    def test_up_to_date_database_runs_no_ddl(self):
+        state = {"table": True, "versions": {migration.version for migration in MIGRATIONS}}
+        conn = _Connection(state)
+
+        self.assertEqual(apply_migrations(conn), [])
+        self.assertEqual(len(conn.cursor_obj.executed), 2)
+        self.assertFalse(any("CREATE" in query or "DROP" in query for query in conn.cursor_obj.executed))
+
+    def test_only_pending_migrations_are_applied(self):
+        state = {"table": True, "versions": {1}}
+        conn = _Connection(state)
+
+        self.assertEqual(apply_migrations(conn), [v for v in range(2, latest_version() + 1)])
+        self.assertFalse(any("CREATE TABLE IF NOT EXISTS mindmate_messages" in q for q in conn.cursor_obj.executed))
+
+
+if __name__ == "__main__":
+    unittest.main()
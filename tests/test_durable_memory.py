@@ -3,7 +3,7 @@ import types
 import unittest
 from datetime import datetime
 from pathlib import Path
-from unittest.mock import AsyncMock, Mock
+from unittest.mock import AsyncMock, Mock, patch
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 SRC_ROOT = PROJECT_ROOT / "src"
@@ -11,6 +11,7 @@ if str(SRC_ROOT) not in sys.path:
     sys.path.insert(0, str(SRC_ROOT))
 
 import bot  # noqa: E402
+from llm_gateway import LLMGateway  # noqa: E402
 from postgres_db import InMemoryDatabase, PostgresDatabase  # noqa: E402
 
 
@@ -21,16 +22,37 @@ class DurableMemoryTests(unittest.IsolatedAsyncioTestCase):
         bot.user_journey.clear()
         bot.daily_journals.clear()
         bot.daily_summary_tracking.clear()
+        bot.history_cache.clear()
+        bot.heartbeat_digests.clear()
         bot.degraded_mode_notice_sent.clear()
         bot.processed_messages.clear()
         self.original_daily_heartbeat_enabled = bot.DAILY_HEARTBEAT_ENABLED
         self.original_telegram_app = bot.telegram_app
-        self.original_openai_client = bot.openai_client
+        self.original_llm_gateway = bot.llm_gateway
 
     async def asyncTearDown(self):
         bot.DAILY_HEARTBEAT_ENABLED = self.original_daily_heartbeat_enabled
         bot.telegram_app = self.original_telegram_app
-        bot.openai_client = self.original_openai_client
+        bot.llm_gateway = self.original_llm_gateway
+
+    async def test_history_window_is_served_from_cache_after_first_read(self):
+        user_id = 4321
+        history_reads = AsyncMock(wraps=bot.db_manager.get_conversation_history)
+        bot.db_manager.get_conversation_history = history_reads
+
+        await bot.add_to_history(user_id, "user", "first")
+        self.assertEqual(await bot.get_history(user_id), [{"role": "user", "content": "first"}])
+        for index in range(bot.MAX_HISTORY_LENGTH):
+            await bot.add_to_history(user_id, "assistant", f"reply {index}")
+        history = await bot.get_history(user_id)
+
+        self.assertEqual(history_reads.await_count, 1)
+        self.assertEqual(len(history), bot.MAX_HISTORY_LENGTH)
+        self.assertEqual(history[-1], {"role": "assistant", "content": f"reply {bot.MAX_HISTORY_LENGTH - 1}"})
+        self.assertEqual(history, await bot.db_manager.get_conversation_history(user_id, bot.MAX_HISTORY_LENGTH))
+
+        await bot.clear_history(user_id)
+        self.assertEqual(await bot.get_history(user_id), [])
 
     async def test_journey_survives_restart_via_active_db_layer(self):
         user_id = 1234
@@ -86,14 +108,25 @@ class DurableMemoryTests(unittest.IsolatedAsyncioTestCase):
 
         bot.DAILY_HEARTBEAT_ENABLED = True
         bot.telegram_app = types.SimpleNamespace(bot=object())
-        bot.get_daily_heartbeat_candidate_user_ids = AsyncMock(return_value=[user_id])
-        bot.get_daily_heartbeat_last_sent_date = AsyncMock(return_value=None)
-        bot.send_scheduled_daily_summary = AsyncMock()
-
-        count = await bot.run_daily_heartbeat_cycle(now=datetime(2026, 3, 24, 7, 5, 0))
+        with patch.object(bot, "get_daily_heartbeat_rollout_user_ids", return_value=[user_id]), \
+                patch.object(bot, "send_scheduled_daily_summary", AsyncMock()) as send_summary:
+            count = await bot.run_daily_heartbeat_cycle(now=datetime(2026, 3, 24, 7, 5, 0))
 
         self.assertEqual(count, 0)
-        bot.send_scheduled_daily_summary.assert_not_awaited()
+        send_summary.assert_not_awaited()
+
+    async def test_due_user_query_filters_unknown_opted_out_sent_and_pending_users(self):
+        local_date = "2026-03-24"
+        for user_id in (1, 2, 3, 4):
+            await bot.db_manager.store_user_preference(user_id, "timezone", "Africa/Johannesburg")
+        await bot.db_manager.store_user_preference(2, "daily_heartbeat_enabled", False)
+        await bot.db_manager.claim_daily_checkin(3, local_date, "instance-a")
+        await bot.db_manager.upsert_daily_checkin(3, local_date, False, status="completed")
+        await bot.db_manager.upsert_daily_checkin(4, "2026-03-23", True, sent_at=datetime(2026, 3, 23, 7, 0))
+
+        due = await bot.db_manager.get_daily_heartbeat_due_user_ids(local_date, [1, 2, 3, 4, 5])
+
+        self.assertEqual(due, [1])
 
 
     async def test_duplicate_daily_reply_is_not_appended_twice_across_retry_state(self):
@@ -170,12 +203,14 @@ class DurableMemoryTests(unittest.IsolatedAsyncioTestCase):
             ),
         )
         context = types.SimpleNamespace()
-        bot.openai_client = types.SimpleNamespace(
-            chat=types.SimpleNamespace(
-                completions=types.SimpleNamespace(
-                    create=Mock(
-                        return_value=types.SimpleNamespace(
-                            choices=[types.SimpleNamespace(message=types.SimpleNamespace(content="Glad you shared that."))]
+        bot.llm_gateway = LLMGateway(
+            client=types.SimpleNamespace(
+                chat=types.SimpleNamespace(
+                    completions=types.SimpleNamespace(
+                        create=AsyncMock(
+                            return_value=types.SimpleNamespace(
+                                choices=[types.SimpleNamespace(message=types.SimpleNamespace(content="Glad you shared that."))]
+                            )
                         )
                     )
                 )
@@ -229,6 +264,8 @@ class DailyHeartbeatCopyTests(unittest.IsolatedAsyncioTestCase):
         bot.user_journey.clear()
         bot.daily_journals.clear()
         bot.daily_summary_tracking.clear()
+        bot.history_cache.clear()
+        bot.heartbeat_digests.clear()
 
     async def test_daily_heartbeat_uses_lighter_distinct_checkin_voice(self):
         user_id = 339651126
@@ -252,8 +289,9 @@ class DailyHeartbeatCopyTests(unittest.IsolatedAsyncioTestCase):
 
 
 class _FakeCursor:
-    def __init__(self, fetchone_results=None):
+    def __init__(self, fetchone_results=None, fetchall_results=None):
         self.fetchone_results = list(fetchone_results or [])
+        self.fetchall_results = list(fetchall_results or [])
         self.executed = []
 
     def execute(self, query, params=None):
@@ -264,6 +302,9 @@ class _FakeCursor:
             return self.fetchone_results.pop(0)
         return None
 
+    def fetchall(self):
+        return list(self.fetchall_results)
+
 
 class _FakeConnection:
     def __init__(self, cursor):
@@ -376,5 +417,45 @@ class PostgresJournalDedupeTests(unittest.IsolatedAsyncioTestCase):
         self.assertFalse(any("INSERT INTO mindmate_journal_entries" in query for query, _ in cursor.executed))
 
 
+class PostgresMessageSearchTests(unittest.IsolatedAsyncioTestCase):
+    def _db(self, cursor):
+        pool = _FakePool(_FakeConnection(cursor))
+        db = PostgresDatabase.__new__(PostgresDatabase)
+        db.pool = pool
+        db.prefix = ""
+        db._get_pool = lambda: pool
+        return db
+
+    async def test_fulltext_search_returns_ranked_rows_with_snippets(self):
+        row = {
+            "role": "user",
+            "content": "Could not sleep again before the deadline",
+            "message_id": "42_1",
+            "timestamp": datetime(2026, 3, 24, 22, 0),
+            "rank": 0.4,
+            "snippet": "Could not **sleep** again before the **deadline**",
+        }
+        cursor = _FakeCursor(fetchall_results=[row])
+        db = self._db(cursor)
+
+        results = await db.semantic_search(42, "sleep deadline", limit=3)
+
+        self.assertEqual(results, [row])
+        query, params = cursor.executed[0]
+        self.assertIn("websearch_to_tsquery", query)
+        self.assertIn("content_tsv @@", query)
+        self.assertEqual(params[:4], ("sleep deadline", 42, "conversation:42", 3))
+
+    async def test_keyword_mode_keeps_substring_match(self):
+        cursor = _FakeCursor(fetchall_results=[])
+        db = self._db(cursor)
+
+        await db.semantic_search(42, "slee", mode="keyword")
+
+        query, params = cursor.executed[0]
+        self.assertIn("content ILIKE", query)
+        self.assertEqual(params[2], "%slee%")
+
+
 if __name__ == "__main__":
     unittest.main()
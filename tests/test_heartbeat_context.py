@@ -0,0 +1,85 @@
+import sys
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+import bot  # noqa: E402
+from heartbeat_context import HeartbeatContextScorer  # noqa: E402
+
+CORPUS = ['', '   ', 'ok', 'hi there', '/start', '/help me please', 'search the web for bitcoin price',
+ 'look up the weather tomorrow', 'google stock news', 'find cheap flights',
+ 'Can you find the BTC price and crypto news?', 'https://example.com/article',
+ 'translate this and summarize the web page', 'price weather news', "what's happening in Gaza",
+ 'What is going on there right now', 'any updates on the election?',
+ 'in South Africa lately the load shedding is bad', 'latest headlines please',
+ 'I feel anxious and overwhelmed about work', "I've been so tired and my sleep is a mess",
+ 'My therapist said to journal when I feel overwhelmed at work',
+ "My meds make me drowsy, my mood is flat, I'm feeling low", 'Family dinner was tense and I felt lonely',
+ 'Work deadline stress again, barely slept', 'Yesterday my partner and I had a fight about money',
+ "Recently I've been coping better with panic attacks", 'I was crying after the episode with my mom',
+ 'bipolar manic episode, therapy tomorrow', 'Had a nice walk in the park with the dog',
+ 'I think the news about the economy makes me stressed', 'grief hits hard on Sundays, I miss my dad',
+ 'ive been feeling calm, rest helped', 'My journal entry: tired but grateful',
+ 'Work work work work work work work work', '  Multiple   spaces\tand\nnewlines about   sleep  ',
+ 'DEPRESSION and ANXIETY are LOUD today', "don't know what's the update with my relationship",
+ 'Lookup therapist near me', 'support group tonight, trigger warnings everywhere']
+# Outputs of the original per-feature helpers: (score, low value, current events).
+EXPECTED_FEATURES = [(-100, True, False), (-100, True, False), (-6, True, False), (0, False, False), (-6, True, False),
+ (-6, True, False), (-6, True, False), (-6, True, False), (-14, True, True), (-6, True, False),
+ (-13, True, True), (-6, True, False), (0, False, False), (-14, True, True), (-8, False, True),
+ (-8, False, True), (-8, False, True), (-7, False, True), (-8, False, True), (14, False, False),
+ (16, False, False), (20, False, False), (18, False, False), (9, False, False), (6, False, False),
+ (12, False, False), (13, False, False), (9, False, False), (14, False, False), (1, False, False),
+ (-9, True, True), (5, False, False), (10, False, False), (11, False, False), (2, False, False),
+ (6, False, False), (10, False, False), (2, False, True), (0, True, False), (8, False, False)]
+# _select_heartbeat_context_messages(CORPUS[i:i + 12]) for i in range(0, len(CORPUS), 5)
+EXPECTED_SELECTIONS = [['hi there'], ['translate this and summarize the web page'],
+ ['My therapist said to journal when I feel overwhelmed at work', "I've been so tired and my sleep is a mess",
+  'I feel anxious and overwhelmed about work'],
+ ['My therapist said to journal when I feel overwhelmed at work',
+  "My meds make me drowsy, my mood is flat, I'm feeling low", "I've been so tired and my sleep is a mess"],
+ ['My therapist said to journal when I feel overwhelmed at work',
+  "My meds make me drowsy, my mood is flat, I'm feeling low", "I've been so tired and my sleep is a mess"],
+ ['bipolar manic episode, therapy tomorrow', "Recently I've been coping better with panic attacks",
+  'Yesterday my partner and I had a fight about money'],
+ ['My journal entry: tired but grateful', 'DEPRESSION and ANXIETY are LOUD today',
+  'ive been feeling calm, rest helped'],
+ ['DEPRESSION and ANXIETY are LOUD today', 'support group tonight, trigger warnings everywhere',
+  'Multiple spaces and newlines about sleep']]
+EXPECTED_TOPICS = [[], [], [], [], [], [], [], [], [], [], [], [], [], [], [], [], [], [], [], ['career', 'stress', 'work'],
+ ['energy'], ['career', 'stress', 'work'], ['meds'], ['close_relationships', 'people'],
+ ['career', 'stress', 'work'], ['close_relationships', 'people'], ['stress'], ['people'], [], [], ['stress'],
+ ['people'], ['energy'], ['energy'], ['career', 'work'], ['energy'], [], ['close_relationships', 'people'],
+ [], []]
+
+
+class HeartbeatContextScorerTests(unittest.TestCase):
+    def setUp(self):
+        self.scorer = HeartbeatContextScorer()
+
+    def test_single_pass_features_match_the_original_helpers(self):
+        for message, expected in zip(CORPUS, EXPECTED_FEATURES):
+            scored = self.scorer.score(message)
+            actual = (-100, True, False) if scored is None else (scored.score, scored.is_low_value, scored.is_current_events)
+            self.assertEqual(actual, expected, message)
+
+    def test_topics_match_substring_checks(self):
+        self.assertEqual([sorted(self.scorer.topics(message)) for message in CORPUS], EXPECTED_TOPICS)
+
+    def test_selection_is_unchanged(self):
+        selections = [bot._select_heartbeat_context_messages(CORPUS[i:i + 12]) for i in range(0, len(CORPUS), 5)]
+
+        self.assertEqual(selections, EXPECTED_SELECTIONS)
+
+    def test_score_many_drops_blank_messages(self):
+        scored = self.scorer.score_many(["", "  ", "I feel tired"])
+
+        self.assertEqual([item.text for item in scored], ["I feel tired"])
+
+
+if __name__ == "__main__":
+    unittest.main()
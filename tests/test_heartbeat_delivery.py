@@ -0,0 +1,77 @@
+import asyncio
+import sys
+import time
+import unittest
+from pathlib import Path
+
+from telegram.error import RetryAfter
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from heartbeat_delivery import HeartbeatDeliveryEngine, TelegramRateLimiter, TokenBucket  # noqa: E402
+
+
+class TokenBucketTests(unittest.IsolatedAsyncioTestCase):
+    async def test_bucket_allows_a_burst_then_paces_to_the_rate(self):
+        bucket = TokenBucket(rate=50, capacity=5)
+        started = time.perf_counter()
+        for _ in range(10):
+            await bucket.acquire()
+        elapsed = time.perf_counter() - started
+
+        # 5 immediate tokens, then 5 more at 50/s ≈ 0.1s.
+        self.assertGreaterEqual(elapsed, 0.08)
+        self.assertLess(elapsed, 0.5)
+
+
+class HeartbeatDeliveryEngineTests(unittest.IsolatedAsyncioTestCase):
+    async def test_flood_control_is_retried_and_reported(self):
+        engine = HeartbeatDeliveryEngine(max_concurrency=4, limiter=TelegramRateLimiter(global_rate=1000))
+        attempts = {}
+
+        async def send_message(chat_id, text):
+            attempts[chat_id] = attempts.get(chat_id, 0) + 1
+            if chat_id == 2 and attempts[chat_id] == 1:
+                raise RetryAfter(0)
+            return text
+
+        async def deliver(user_id):
+            if user_id == 3:
+                return False
+            if user_id == 4:
+                raise RuntimeError("boom")
+            await engine.send(send_message, chat_id=user_id, text="hi")
+            return True
+
+        report = await engine.run([1, 2, 3, 4], deliver)
+
+        self.assertEqual((report.due, report.sent, report.skipped, report.failed), (4, 2, 1, 1))
+        self.assertEqual(report.retries, 1)
+        self.assertEqual(report.failed_user_ids, [4])
+        self.assertEqual(attempts[2], 2)
+        self.assertIs(engine.last_report, report)
+
+    async def test_deliveries_run_concurrently_up_to_the_limit(self):
+        engine = HeartbeatDeliveryEngine(max_concurrency=3)
+        active = 0
+        peak = 0
+
+        async def deliver(user_id):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return True
+
+        report = await engine.run(range(10), deliver)
+
+        self.assertEqual(report.sent, 10)
+        self.assertEqual(peak, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
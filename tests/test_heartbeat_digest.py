@@ -0,0 +1,85 @@
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+import bot  # noqa: E402
+from postgres_db import InMemoryDatabase  # noqa: E402
+
+MESSAGES = [
+    "search the web for bitcoin price",
+    "I've been so tired and my sleep is a mess",
+    "what's happening in the news today",
+    "My therapist said to journal when I feel overwhelmed at work",
+    "ok",
+    "Family dinner was tense and I felt lonely",
+    "/help",
+    "Work deadline stress again, barely slept",
+]
+
+
+class HeartbeatDigestTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.original_db_manager = bot.db_manager
+        bot.db_manager = InMemoryDatabase()
+        bot.history_cache.clear()
+        bot.heartbeat_digests.clear()
+        self.user_id = 4242
+
+    async def asyncTearDown(self):
+        bot.db_manager = self.original_db_manager
+        bot.history_cache.clear()
+        bot.heartbeat_digests.clear()
+
+    async def test_incremental_digest_matches_a_rebuild_from_history(self):
+        await bot.get_heartbeat_digest(self.user_id, "2026-03-23")
+        for text in MESSAGES * 2:
+            await bot.add_to_history(self.user_id, "user", text)
+            await bot.add_to_history(self.user_id, "assistant", "noted")
+
+        incremental = bot.heartbeat_digests.get(self.user_id).messages()
+        history = await bot.get_history(self.user_id)
+        rebuilt = bot.heartbeat_digests.build(history, {}, "2026-03-23").messages()
+        window_texts = [item["content"] for item in history if item["role"] == "user"]
+
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(
+            [item.text for item in bot._select_heartbeat_context_features(incremental)],
+            bot._select_heartbeat_context_messages(window_texts),
+        )
+
+    async def test_warm_digest_builds_the_message_without_storage_reads(self):
+        await bot.append_journal_entry_for_user(self.user_id, "2026-03-23", "Stressed after work, need rest.")
+        now = datetime(2026, 3, 24, 7, 0, tzinfo=bot.get_daily_heartbeat_timezone())
+        first = await bot.build_daily_heartbeat_message(self.user_id, now=now)
+
+        with patch.object(bot, "get_history") as get_history, \
+                patch.object(bot, "get_journal_entries_for_date") as get_journal:
+            second = await bot.build_daily_heartbeat_message(self.user_id, now=now)
+
+        get_history.assert_not_called()
+        get_journal.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertIn("Stressed after work", second)
+
+    async def test_journal_written_after_the_digest_is_built_reaches_the_next_morning(self):
+        await bot.get_heartbeat_digest(self.user_id, "2026-03-23")
+        await bot.append_journal_entry_for_user(self.user_id, "2026-03-24", "Exhausted but proud of today.")
+
+        message = await bot.build_daily_heartbeat_message(
+            self.user_id,
+            now=datetime(2026, 3, 25, 7, 0, tzinfo=bot.get_daily_heartbeat_timezone()),
+        )
+
+        self.assertIn("Exhausted but proud of today.", message)
+        self.assertIn("protect your energy", message)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,271 @@
+import sys
+import types
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+from zoneinfo import ZoneInfo
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+import bot  # noqa: E402
+from heartbeat_scheduler import HeartbeatScheduler, UserSchedule, next_fire_time, spread_offset_minutes  # noqa: E402
+from postgres_db import InMemoryDatabase  # noqa: E402
+
+
+class NextFireTimeTests(unittest.TestCase):
+    def test_fire_time_follows_the_users_own_timezone_and_hour(self):
+        now = datetime(2026, 3, 24, 3, 0, tzinfo=timezone.utc)
+        london = UserSchedule(ZoneInfo("Europe/London"), 7)
+        sydney = UserSchedule(ZoneInfo("Australia/Sydney"), 7)
+
+        london_at, london_date = next_fire_time(1, london, now)
+        sydney_at, sydney_date = next_fire_time(1, sydney, now)
+
+        self.assertEqual((london_at, london_date), (datetime(2026, 3, 24, 7, 0, tzinfo=timezone.utc), "2026-03-24"))
+        # 14:00 in Sydney already passed today's 07:00 window, so it rolls to tomorrow.
+        self.assertEqual((sydney_at, sydney_date), (datetime(2026, 3, 24, 20, 0, tzinfo=timezone.utc), "2026-03-25"))
+
+    def test_inside_the_window_fires_now_and_skip_date_moves_to_tomorrow(self):
+        schedule = UserSchedule(ZoneInfo("UTC"), 7)
+        now = datetime(2026, 3, 24, 7, 5, tzinfo=timezone.utc)
+
+        self.assertEqual(next_fire_time(1, schedule, now), (now, "2026-03-24"))
+        self.assertEqual(
+            next_fire_time(1, schedule, now, skip_local_date="2026-03-24"),
+            (datetime(2026, 3, 25, 7, 0, tzinfo=timezone.utc), "2026-03-25"),
+        )
+
+    def test_spread_offsets_are_stable_and_within_the_window(self):
+        offsets = [spread_offset_minutes(user_id, 60) for user_id in range(500)]
+
+        self.assertEqual(offsets, [spread_offset_minutes(user_id, 60) for user_id in range(500)])
+        self.assertTrue(all(0 <= offset < 60 for offset in offsets))
+        self.assertGreater(len(set(offsets)), 40)
+
+
+class HeartbeatSchedulerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_due_users_fire_grouped_by_local_date_then_move_to_the_next_day(self):
+        now = datetime(2026, 3, 24, 7, 0, tzinfo=timezone.utc)
+        schedules = {
+            1: UserSchedule(ZoneInfo("UTC"), 7),
+            2: UserSchedule(ZoneInfo("Etc/GMT-14"), 21),  # 21:00 on 2026-03-24 at UTC+14
+            3: UserSchedule(ZoneInfo("UTC"), 9),
+        }
+        fired = []
+
+        async def resolve(user_id):
+            return schedules[user_id]
+
+        async def fire(local_date, timezones):
+            fired.append((local_date, sorted(timezones)))
+            self.assertTrue(all(timezones[user_id] == schedules[user_id].timezone for user_id in timezones))
+            return list(timezones)
+
+        scheduler = HeartbeatScheduler(resolve_schedule=resolve, fire=fire, clock=lambda: now)
+        for user_id in schedules:
+            await scheduler.schedule(user_id)
+
+        self.assertEqual(await scheduler.run_due(), 2)
+        self.assertEqual(fired, [("2026-03-24", [1, 2])])
+        self.assertEqual(scheduler.next_fire_at(), datetime(2026, 3, 24, 9, 0, tzinfo=timezone.utc))
+
+        now = datetime(2026, 3, 24, 9, 0, tzinfo=timezone.utc)
+        await scheduler.run_due()
+        self.assertEqual(fired[-1], ("2026-03-24", [3]))
+        self.assertEqual(scheduler.next_fire_at(), datetime(2026, 3, 25, 7, 0, tzinfo=timezone.utc))
+
+    async def test_a_failed_batch_retries_inside_the_window_then_moves_on(self):
+        clock = {"now": datetime(2026, 3, 24, 7, 0, tzinfo=timezone.utc)}
+        attempts = []
+
+        async def resolve(user_id):
+            return UserSchedule(ZoneInfo("UTC"), 7)
+
+        async def fire(local_date, timezones):
+            attempts.append((clock["now"], sorted(timezones)))
+            if len(attempts) == 1:
+                raise RuntimeError("database went away")
+            return [1]
+
+        scheduler = HeartbeatScheduler(
+            resolve_schedule=resolve,
+            fire=fire,
+            window_minutes=15,
+            retry_seconds=60,
+            clock=lambda: clock["now"],
+        )
+        await scheduler.schedule(1)
+        await scheduler.schedule(2)
+
+        await scheduler.run_due()
+        self.assertEqual(scheduler.next_fire_at(), datetime(2026, 3, 24, 7, 1, tzinfo=timezone.utc))
+
+        # Only user 1 goes out on the retry; user 2 keeps retrying until the window closes.
+        clock["now"] = datetime(2026, 3, 24, 7, 1, tzinfo=timezone.utc)
+        await scheduler.run_due()
+        self.assertEqual(attempts[1][1], [1, 2])
+        self.assertEqual(scheduler.next_fire_at(), datetime(2026, 3, 24, 7, 2, tzinfo=timezone.utc))
+
+        clock["now"] = datetime(2026, 3, 24, 7, 14, 30, tzinfo=timezone.utc)
+        await scheduler.run_due()
+        self.assertEqual(attempts[-1][1], [2])
+        self.assertEqual(scheduler.next_fire_at(), datetime(2026, 3, 25, 7, 0, tzinfo=timezone.utc))
+        self.assertEqual(scheduler.stats()["retried_users"], 3)
+
+    async def test_reschedule_replaces_the_old_fire_time(self):
+        now = datetime(2026, 3, 24, 5, 0, tzinfo=timezone.utc)
+        schedule = {"hour": 7}
+
+        async def resolve(user_id):
+            return UserSchedule(ZoneInfo("UTC"), schedule["hour"])
+
+        async def fire(local_date, timezones):
+            raise AssertionError("nothing should be due")
+
+        scheduler = HeartbeatScheduler(resolve_schedule=resolve, fire=fire, clock=lambda: now)
+        await scheduler.schedule(1)
+        schedule["hour"] = 6
+        await scheduler.reschedule(1)
+
+        self.assertEqual(scheduler.next_fire_at(), datetime(2026, 3, 24, 6, 0, tzinfo=timezone.utc))
+        self.assertEqual(scheduler.stats()["scheduled_users"], 1)
+        self.assertEqual(await scheduler.run_due(), 0)
+
+
+class UserHeartbeatScheduleTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.original_db_manager = bot.db_manager
+        bot.db_manager = InMemoryDatabase()
+
+    async def asyncTearDown(self):
+        bot.db_manager = self.original_db_manager
+
+    async def test_schedule_command_stores_hour_and_timezone(self):
+        user_id = next(iter(bot.PERSONAL_MODE_USERS))
+        replies = []
+
+        async def reply_text(text, **kwargs):
+            replies.append(text)
+
+        update = types.SimpleNamespace(
+            effective_user=types.SimpleNamespace(id=user_id),
+            message=types.SimpleNamespace(reply_text=reply_text),
+        )
+        await bot.cmd_schedule(update, types.SimpleNamespace(args=["hour", "6"]))
+        await bot.cmd_schedule(update, types.SimpleNamespace(args=["tz", "Europe/London"]))
+        await bot.cmd_schedule(update, types.SimpleNamespace(args=["tz", "Not/AZone"]))
+
+        schedule = await bot.get_daily_heartbeat_user_schedule(user_id)
+        self.assertEqual((schedule.hour, schedule.timezone.key), (6, "Europe/London"))
+        self.assertIn("don't recognise", replies[-1])
+
+    async def test_the_leader_picks_up_a_schedule_stored_by_another_instance(self):
+        now = datetime(2026, 3, 24, 1, 0, tzinfo=timezone.utc)
+        leader = HeartbeatScheduler(
+            resolve_schedule=bot.get_daily_heartbeat_user_schedule,
+            fire=AsyncMock(return_value=[]),
+            clock=lambda: now,
+        )
+        await leader.schedule(11)
+        before = leader.next_fire_at()
+        since = datetime.now()
+
+        # This instance is not the leader, so only the preferences change.
+        with patch.object(bot, "heartbeat_scheduler", None):
+            await bot.set_daily_heartbeat_schedule_for_user(11, hour=4, timezone_name="UTC")
+            await bot.set_daily_heartbeat_schedule_for_user(12, hour=4, timezone_name="UTC")
+
+        self.assertEqual(await bot.pick_up_changed_heartbeat_schedules(leader, since), 1)
+        self.assertNotEqual(leader.next_fire_at(), before)
+        self.assertEqual(leader.next_fire_at(), datetime(2026, 3, 24, 4, 0, tzinfo=timezone.utc))
+        self.assertNotIn(12, leader)
+
+
+class DailyCheckinClaimTests(unittest.IsolatedAsyncioTestCase):
+    async def test_only_one_instance_wins_a_day_until_the_send_fails_or_the_lease_expires(self):
+        store = InMemoryDatabase()
+
+        self.assertTrue(await store.claim_daily_checkin(1, "2026-03-24", "a"))
+        self.assertFalse(await store.claim_daily_checkin(1, "2026-03-24", "b"))
+
+        await store.upsert_daily_checkin(1, "2026-03-24", False, status="failed", metadata={"error": "boom"})
+        self.assertTrue(await store.claim_daily_checkin(1, "2026-03-24", "b"))
+
+        store.daily_checkins[1]["2026-03-24"]["claimed_at"] -= timedelta(minutes=11)
+        self.assertTrue(await store.claim_daily_checkin(1, "2026-03-24", "c"))
+
+        await store.upsert_daily_checkin(1, "2026-03-24", True, sent_at=datetime(2026, 3, 24, 7, 0))
+        self.assertEqual(store.daily_checkins[1]["2026-03-24"]["claimed_by"], "c")
+        self.assertFalse(await store.claim_daily_checkin(1, "2026-03-24", "d", lease_seconds=0))
+
+    async def test_delivery_skips_a_day_another_instance_claimed(self):
+        original_db_manager = bot.db_manager
+        bot.db_manager = InMemoryDatabase()
+        try:
+            await bot.db_manager.claim_daily_checkin(5, "2026-03-24", "other-instance")
+            with patch.object(bot, "send_scheduled_daily_summary", AsyncMock()) as send_summary:
+                delivered = await bot.deliver_daily_heartbeat(5, "2026-03-24")
+        finally:
+            bot.db_manager = original_db_manager
+
+        self.assertFalse(delivered)
+        send_summary.assert_not_called()
+
+    async def test_a_claimed_day_is_durably_sent_before_the_message_goes_out(self):
+        original_db_manager = bot.db_manager
+        bot.db_manager = InMemoryDatabase()
+        states_at_send = []
+
+        async def send(**kwargs):
+            # Crash here: nothing queued would survive, only what the store already holds.
+            states_at_send.append(dict(bot.db_manager.daily_checkins[5]["2026-03-24"]))
+            return types.SimpleNamespace(message_id=77)
+
+        try:
+            with patch.object(bot, "send_heartbeat_message", side_effect=send), \
+                    patch.object(bot, "get_verse_of_the_day", AsyncMock(return_value=None)), \
+                    patch.object(bot, "build_daily_heartbeat_message", AsyncMock(return_value="Morning!")):
+                self.assertTrue(await bot.deliver_daily_heartbeat(5, "2026-03-24"))
+            await bot.flush_daily_checkin_tracking()
+            stored = await bot.db_manager.get_daily_checkin(5, "2026-03-24")
+            reclaimed = await bot.db_manager.claim_daily_checkin(5, "2026-03-24", "other", lease_seconds=0)
+        finally:
+            bot.db_manager = original_db_manager
+            bot.daily_summary_tracking.pop(5, None)
+
+        self.assertEqual(states_at_send[0]["status"], "sent")
+        self.assertTrue(states_at_send[0]["waiting_for_summary"])
+        self.assertEqual(stored["message_id"], "77")
+        self.assertFalse(reclaimed)
+
+
+    async def test_a_batch_delivers_in_the_scheduled_timezones_without_rereading_preferences(self):
+        sydney = ZoneInfo("Australia/Sydney")
+        delivered = []
+
+        async def deliver(user_id, local_date, tz):
+            if user_id == 6:
+                raise RuntimeError("Telegram is down")
+            delivered.append((user_id, local_date, tz))
+            return True
+
+        with patch.object(bot, "DAILY_HEARTBEAT_ENABLED", True), \
+                patch.object(bot, "telegram_app", types.SimpleNamespace(bot=object())), \
+                patch.object(bot, "get_daily_heartbeat_due_user_ids", AsyncMock(return_value=[5, 6])), \
+                patch.object(bot, "get_daily_heartbeat_user_schedule", AsyncMock()) as resolve, \
+                patch.object(bot, "deliver_daily_heartbeat", side_effect=deliver), \
+                patch.object(bot, "flush_daily_checkin_tracking", AsyncMock()):
+            done = await bot.deliver_daily_heartbeat_batch("2026-03-24", {5: sydney, 6: sydney, 7: sydney})
+
+        # 7 was not due, so it is done too; the failed send to 6 is left for a retry.
+        self.assertEqual(done, [5, 7])
+        self.assertEqual(delivered, [(5, "2026-03-24", sydney)])
+        resolve.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import sys
+import unittest
+from unittest.mock import patch
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+import bot  # noqa: E402
+from heartbeat_simulation import STAGES, PopulationSpec, run_heartbeat_simulation  # noqa: E402
+
+
+class HeartbeatSimulationTests(unittest.IsolatedAsyncioTestCase):
+    async def test_dry_run_sends_to_the_fake_bot_and_restores_the_bot_globals(self):
+        originals = (bot.db_manager, bot.telegram_app, bot.heartbeat_delivery, bot.build_daily_heartbeat_message)
+        spec = PopulationSpec(users=12, history_messages=6, journal_density=0.5, opted_out_ratio=0.25, seed=3)
+
+        # One batch keeps the run short: each batch waits out the per-chat pacing between a user's messages.
+        with patch.object(bot, "DAILY_HEARTBEAT_SPREAD_MINUTES", 0):
+            report = await run_heartbeat_simulation(spec, global_rate=10_000)
+
+        self.assertEqual(report.users, 12)
+        self.assertGreater(report.due, 0)
+        self.assertLess(report.due, 12)
+        self.assertEqual((report.sent, report.failed), (report.due, 0))
+        self.assertGreaterEqual(report.messages_sent, report.sent)
+        self.assertEqual(report.stages["build_daily_heartbeat_message"]["calls"], report.due)
+        self.assertEqual(set(report.stages), set(STAGES))
+        self.assertGreater(report.store_calls["claim_daily_checkin"], 0)
+        # The pre-send "sent" transition is written per user before sending; the
+        # post-send bookkeeping is queued and written once per batch. No preference writes.
+        self.assertEqual(report.store_calls["upsert_daily_checkin"], report.store_calls["claim_daily_checkin"])
+        self.assertEqual(report.store_calls["flush_daily_checkins"], report.batches)
+        self.assertNotIn("store_user_preference", report.store_calls)
+        self.assertIn("spread", report.format(project_users=1000))
+        self.assertEqual(
+            (bot.db_manager, bot.telegram_app, bot.heartbeat_delivery, bot.build_daily_heartbeat_message),
+            originals,
+        )
+        self.assertFalse(any(user_id >= 9_000_000_000 for user_id in bot.daily_summary_tracking))
+
+
+    async def test_users_fire_in_batches_by_their_own_timezone(self):
+        spec = PopulationSpec(users=8, history_messages=2, timezones=("UTC", "Asia/Tokyo"), seed=5)
+
+        with patch.object(bot, "DAILY_HEARTBEAT_SPREAD_MINUTES", 0):
+            report = await run_heartbeat_simulation(spec, global_rate=10_000)
+
+        self.assertEqual((report.due, report.sent), (8, 8))
+        self.assertEqual(report.batches, 2)
+        self.assertLess(report.largest_batch, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import types
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+import bot  # noqa: E402
+from memory_recall import HashingEmbedder, MemoryRecall, VectorIndex  # noqa: E402
+from postgres_db import InMemoryDatabase  # noqa: E402
+
+
+class HashingEmbedderTests(unittest.TestCase):
+    def test_embeddings_are_deterministic_and_normalised(self):
+        embedder = HashingEmbedder(dimensions=64)
+        first = embedder.embed_sync(["Could not sleep before the exam", ""])
+        second = HashingEmbedder(dimensions=64).embed_sync(["Could not sleep before the exam"])
+
+        np.testing.assert_array_equal(first[0], second[0])
+        self.assertAlmostEqual(float(np.linalg.norm(first[0])), 1.0, places=5)
+        self.assertFalse(first[1].any())
+
+
+class VectorIndexTests(unittest.TestCase):
+    def test_ivf_search_agrees_with_brute_force_on_clustered_vectors(self):
+        rng = np.random.default_rng(3)
+        centers = rng.normal(size=(8, 32))
+        vectors = np.vstack([center + 0.05 * rng.normal(size=(100, 32)) for center in centers]).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        items = [{"source": "message", "source_id": str(i), "content": str(i), "created_at": ""} for i in range(len(vectors))]
+
+        brute = VectorIndex(32, ivf_min_vectors=10_000)
+        ivf = VectorIndex(32, ivf_min_vectors=100)
+        brute.add(vectors, items)
+        ivf.add(vectors, items)
+
+        for query in vectors[::97]:
+            self.assertEqual(brute.search(query, 1)[0][1]["source_id"], ivf.search(query, 1)[0][1]["source_id"])
+
+
+class MemoryRecallTests(unittest.IsolatedAsyncioTestCase):
+    async def test_recall_returns_related_moment_and_skips_current_history(self):
+        store = InMemoryDatabase()
+        recall = MemoryRecall(store, HashingEmbedder(), min_score=0.1)
+        await recall.remember(7, "journal", "d1", "Work deadline stress kept me awake all night", "2026-03-01T21:00:00")
+        await recall.remember(7, "message", "m1", "Church choir practice was lovely on Sunday", "2026-03-02T10:00:00")
+        await recall.remember(7, "message", "m2", "I am stressed about the work deadline again", "2026-03-20T09:00:00")
+
+        # A fresh instance proves vectors are reloaded from the store.
+        moments = await MemoryRecall(store, HashingEmbedder(), min_score=0.1).recall(
+            7,
+            "work deadline stress tonight",
+            k=1,
+            exclude_contents=["I am stressed about the work deadline again"],
+        )
+
+        self.assertEqual([moment.content for moment in moments], ["Work deadline stress kept me awake all night"])
+        self.assertEqual(moments[0].source, "journal")
+        self.assertEqual(await recall.recall(8, "work deadline"), [])
+
+    async def test_clear_forgets_recalled_messages_but_keeps_journal_moments(self):
+        store = InMemoryDatabase()
+        recall = MemoryRecall(store, HashingEmbedder(), min_score=0.1)
+        await recall.remember(7, "message", "m1", "I am stressed about the work deadline again", "2026-03-20T09:00:00")
+        await recall.remember(7, "journal", "d1", "Journal: church choir practice was lovely", "2026-03-02T10:00:00")
+        # Warm the index, as a real conversation would have.
+        self.assertTrue(await recall.recall(7, "work deadline stress"))
+
+        update = types.SimpleNamespace(effective_user=types.SimpleNamespace(id=7))
+        with patch.object(bot, "db_manager", store), patch.object(bot, "memory_recall", recall), \
+                patch.object(bot, "send_markdown_message", AsyncMock()):
+            await bot.cmd_clear(update, types.SimpleNamespace())
+            recalled = await bot.recall_relevant_memories(7, "work deadline stress")
+
+        self.assertNotIn("work deadline again", recalled or "")
+        self.assertEqual([row["source"] for row in await store.get_memory_embeddings(7, recall.embedder.model)], ["journal"])
+
+    def test_recalled_moments_are_layered_into_the_system_prompt(self):
+        prompt = bot.build_generation_system_prompt(
+            7,
+            personal_mode=False,
+            recalled_memories="- [2026-03-01, journal] Work deadline stress kept me awake",
+        )
+
+        self.assertIn("Relevant Past Moments", prompt)
+        self.assertIn("Work deadline stress kept me awake", prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
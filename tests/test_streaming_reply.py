@@ -0,0 +1,227 @@
+import sys
+import types
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+from telegram.error import BadRequest, RetryAfter, TimedOut
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+import bot  # noqa: E402
+from bot import _render_basic_telegram_html  # noqa: E402
+from llm_gateway import LLMGateway  # noqa: E402
+from postgres_db import InMemoryDatabase  # noqa: E402
+from streaming_reply import StreamingReply, stable_prefix  # noqa: E402
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Message:
+    def __init__(self, text, failures=()):
+        self.text = text
+        self.edits = []
+        self._failures = list(failures)
+
+    async def edit_text(self, text, parse_mode=None):
+        if self._failures:
+            raise self._failures.pop(0)
+        self.text = text
+        self.edits.append(text)
+
+
+class _Chat:
+    def __init__(self):
+        self.messages = []
+        self.failures = []
+
+    async def send(self, text):
+        message = _Message(text, self.failures)
+        self.messages.append(message)
+        return message
+
+
+class StablePrefixTests(unittest.TestCase):
+    def test_prefix_stops_at_a_word_boundary_and_never_leaves_markers_open(self):
+        self.assertEqual(stable_prefix("Hello the"), "Hello")
+        self.assertEqual(stable_prefix("Hello"), "")
+        self.assertEqual(stable_prefix("You are **really doing"), "You are")
+        self.assertEqual(stable_prefix("You are **really** doing well"), "You are **really** doing")
+        self.assertEqual(stable_prefix("Try `journal today"), "Try")
+        self.assertEqual(stable_prefix("It is *gently true"), "It is")
+
+
+class StreamingReplyTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.chat = _Chat()
+        self.slept = []
+
+        async def sleep(seconds):
+            self.slept.append(seconds)
+            self.clock.now += seconds
+
+        self.reply = StreamingReply(
+            self.chat.send,
+            render=_render_basic_telegram_html,
+            edit_interval=1.0,
+            clock=self.clock,
+            sleep=sleep,
+            max_chars=120,
+        )
+
+    async def test_first_words_show_immediately_then_edits_are_throttled(self):
+        await self.reply.start()
+        placeholder = self.chat.messages[0]
+        self.assertEqual(placeholder.text, self.reply.placeholder)
+
+        for delta in ("I hear ", "you. ", "**That ", "sounds** ", "heavy."):
+            await self.reply.push(delta)
+            self.clock.now += 0.3
+        self.assertEqual(placeholder.edits, ["I hear", "I hear you. <b>That sounds</b>"])
+
+        await self.reply.finish(self.reply.text + "\n\n🌐 Sources: example.com")
+
+        self.assertEqual(len(self.chat.messages), 1)
+        self.assertEqual(placeholder.text, "I hear you. <b>That sounds</b> heavy.\n\n🌐 Sources: example.com")
+        self.assertTrue(all(edit.count("<b>") == edit.count("</b>") for edit in placeholder.edits))
+        self.assertEqual(self.reply.first_text_at, 0.0)
+
+    async def test_flood_control_defers_intermediate_edits_but_the_final_edit_waits(self):
+        self.chat.failures.extend([RetryAfter(5), RetryAfter(2)])
+        await self.reply.start()
+
+        await self.reply.push("Take a breath ")
+        self.clock.now += 1
+        await self.reply.push("with me. ")
+        self.assertEqual(self.chat.messages[0].edits, [])
+
+        await self.reply.finish()
+
+        self.assertEqual(self.slept, [2.0])
+        self.assertEqual(self.chat.messages[0].text, "Take a breath with me.")
+
+    async def test_failed_intermediate_edits_are_skipped_and_only_the_final_edit_raises(self):
+        self.chat.failures.extend([TimedOut(), BadRequest("Can't parse entities")])
+        await self.reply.start()
+
+        await self.reply.push("Take a breath ")
+        self.clock.now += 2
+        await self.reply.push("with me. ")
+        self.assertEqual(self.chat.messages[0].edits, [])
+        self.assertGreater(self.reply._next_edit_at, self.clock.now)
+
+        await self.reply.finish()
+        self.assertEqual(self.chat.messages[0].text, "Take a breath with me.")
+
+        self.chat.messages[0]._failures.append(TimedOut())
+        with self.assertRaises(TimedOut):
+            await self.reply.finish("Take a breath with me. Slowly.")
+
+    async def test_long_replies_continue_in_follow_up_messages(self):
+        await self.reply.start()
+        paragraph = "One small step at a time is still progress. " * 2
+        for _ in range(4):
+            await self.reply.push(paragraph + "\n\n")
+            self.clock.now += 1
+
+        await self.reply.finish()
+
+        self.assertGreater(len(self.chat.messages), 1)
+        self.assertTrue(all(len(message.text) <= 120 for message in self.chat.messages))
+        joined = " ".join(message.text for message in self.chat.messages).split()
+        self.assertEqual(joined, self.reply.text.split())
+
+
+def _streaming_gateway(contents):
+    async def _stream():
+        for content in contents:
+            yield types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=content))])
+
+    async def create(**kwargs):
+        assert kwargs["stream"]
+        return _stream()
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    return LLMGateway(client=client, max_concurrency=1)
+
+
+class StreamingGatewayTests(unittest.IsolatedAsyncioTestCase):
+    async def test_stream_yields_deltas_and_frees_the_slot_when_done(self):
+        gateway = _streaming_gateway(("Hi", None, " there"))
+
+        deltas = [delta async for delta in gateway.stream_chat_completion(model="m")]
+
+        self.assertEqual(deltas, ["Hi", " there"])
+        self.assertEqual(gateway.stats()["completed"], 1)
+        self.assertEqual(gateway.stats()["in_flight"], 0)
+
+
+class StreamingChatHandlerTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.original = (bot.db_manager, bot.llm_gateway)
+        bot.db_manager = InMemoryDatabase()
+        bot.history_cache.clear()
+        bot.heartbeat_digests.clear()
+        bot.daily_summary_tracking.clear()
+        bot.processed_messages.clear()
+
+    async def asyncTearDown(self):
+        bot.db_manager, bot.llm_gateway = self.original
+        bot.history_cache.clear()
+        bot.heartbeat_digests.clear()
+
+    async def test_streamed_reply_edits_the_placeholder_and_stores_the_full_text(self):
+        chat = _Chat()
+        user_id = 777001
+        update = types.SimpleNamespace(
+            effective_user=types.SimpleNamespace(id=user_id),
+            effective_chat=types.SimpleNamespace(type="private"),
+            message=types.SimpleNamespace(
+                message_id=91,
+                text="Rough morning, honestly.",
+                date=datetime(2026, 3, 24, 8, 0),
+                reply_text=chat.send,
+            ),
+        )
+        bot.llm_gateway = _streaming_gateway(("That ", "sounds ", "**really** ", "hard."))
+
+        with patch.object(bot, "STREAMING_REPLIES_ENABLED", True):
+            await bot.handle_message(update, types.SimpleNamespace())
+
+        reply = chat.messages[-1]
+        self.assertEqual(reply.edits[-1], "That sounds <b>really</b> hard.")
+        history = await bot.get_history(user_id)
+        self.assertEqual(history[-1], {"role": "assistant", "content": "That sounds **really** hard."})
+
+
+    async def test_a_failed_push_still_closes_the_stream_and_frees_the_slot(self):
+        bot.llm_gateway = _streaming_gateway(("One ", "two ", "three."))
+
+        class _Broken:
+            text = ""
+
+            async def start(self):
+                pass
+
+            async def push(self, delta):
+                raise RuntimeError("edit exploded")
+
+        with self.assertRaises(RuntimeError):
+            await bot.stream_chat_reply(_Broken(), {"model": "m"})
+
+        self.assertEqual(bot.llm_gateway.stats()["in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
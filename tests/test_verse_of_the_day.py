@@ -0,0 +1,68 @@
+import asyncio
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from verse_of_the_day import VerseCache, VerseOfTheDay  # noqa: E402
+
+
+class VerseCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.calls = 0
+        self.fail = False
+
+        async def fetch():
+            self.calls += 1
+            await asyncio.sleep(0.01)
+            if self.fail:
+                raise RuntimeError("upstream down")
+            return VerseOfTheDay(text=f"Verse {self.calls}", reference=f"John 3:{self.calls}")
+
+        self.fetch = fetch
+
+    async def test_concurrent_callers_on_the_same_day_share_one_request(self):
+        cache = VerseCache(self.fetch)
+
+        verses = await asyncio.gather(*(cache.get("2026-03-24") for _ in range(50)))
+        again = await cache.get("2026-03-24")
+
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(verse is again for verse in verses))
+
+    async def test_a_caller_for_the_next_day_never_gets_the_earlier_days_refresh(self):
+        cache = VerseCache(self.fetch)
+
+        today, tomorrow = await asyncio.gather(cache.get("2026-03-24"), cache.get("2026-03-25"))
+
+        self.assertEqual(self.calls, 2)
+        self.assertIsNot(today, tomorrow)
+        self.assertIs(await cache.get("2026-03-25"), tomorrow)
+        self.assertEqual(self.calls, 2)
+
+    async def test_failed_refresh_serves_yesterdays_verse_and_backs_off(self):
+        cache = VerseCache(self.fetch, retry_after_failure_seconds=60)
+        yesterday = await cache.get("2026-03-23")
+        self.fail = True
+
+        self.assertIs(await cache.get("2026-03-24"), yesterday)
+        self.assertIs(await cache.get("2026-03-24"), yesterday)
+        self.assertEqual(self.calls, 2)
+
+    async def test_persisted_verse_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "votd.json"
+            first = await VerseCache(self.fetch, persist_path=path).get("2026-03-24")
+            restored = await VerseCache(self.fetch, persist_path=path).get("2026-03-24")
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(restored, first)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,472 @@
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import types
+import unittest
+import wave
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+import bot  # noqa: E402
+from llm_gateway import LLMGateway  # noqa: E402
+from postgres_db import InMemoryDatabase  # noqa: E402
+from tts_cache import TTSCache, tts_cache_key  # noqa: E402
+from voice_jobs import VoiceJobPool  # noqa: E402
+from voice_pipeline import StageTimings, segment_for_speech, speak_segments  # noqa: E402
+from voice_transcription import SAMPLE_RATE, ChunkedTranscriber, decode_with_ffmpeg, find_split_points  # noqa: E402
+
+VOICE_NOTE = b"OggS\x00voice-note"
+REPLY_AUDIO = b"OggS\x00opus-reply"
+
+
+class _TelegramFile:
+    async def download_to_memory(self, out):
+        out.write(VOICE_NOTE)
+
+
+def _voice_gateway(uploads, speech_requests, reply_text="Breathe in for four, out for six."):
+    async def transcribe(**kwargs):
+        uploads.append(kwargs["file"])
+        return types.SimpleNamespace(text="I can't sleep again")
+
+    async def complete(**kwargs):
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=reply_text))])
+
+    async def speak(**kwargs):
+        speech_requests.append(kwargs)
+        return types.SimpleNamespace(content=REPLY_AUDIO)
+
+    return LLMGateway(client=types.SimpleNamespace(
+        audio=types.SimpleNamespace(
+            transcriptions=types.SimpleNamespace(create=transcribe),
+            speech=types.SimpleNamespace(create=speak),
+        ),
+        chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=complete)),
+    ))
+
+
+class SpeechSegmentTests(unittest.TestCase):
+    def test_short_replies_stay_whole_and_long_ones_lead_with_a_short_segment(self):
+        self.assertEqual(segment_for_speech("One breath. Then another."), ["One breath. Then another."])
+
+        sentence = "You have carried a lot this week and it makes sense to feel tired."
+        text = " ".join([sentence] * 12)
+        segments = segment_for_speech(text, max_chars=300, first_chars=100)
+
+        self.assertLessEqual(len(segments[0]), 100)
+        self.assertTrue(all(len(segment) <= 300 for segment in segments))
+        self.assertTrue(all(segment.endswith(".") for segment in segments))
+        self.assertEqual(" ".join(segments), text)
+
+
+class SpeakSegmentsTests(unittest.IsolatedAsyncioTestCase):
+    async def test_segments_synthesize_concurrently_but_send_in_order(self):
+        started, sent = [], []
+        delays = {"first": 0.03, "second": 0.0, "third": 0.01}
+
+        async def synthesize(segment):
+            started.append(segment)
+            await asyncio.sleep(delays[segment])
+            return segment.encode()
+
+        async def send(audio, index):
+            self.assertEqual(len(started), 3)
+            sent.append((index, audio))
+
+        timings = StageTimings()
+        count = await speak_segments(["first", "second", "third"], synthesize, send, timings=timings)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(sent, [(0, b"first"), (1, b"second"), (2, b"third")])
+        self.assertIn("first_audio", timings.marks)
+
+    async def test_a_failed_segment_cancels_the_rest(self):
+        cancelled = []
+
+        async def synthesize(segment):
+            if segment == "broken":
+                return b""
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(segment)
+                raise
+            return segment.encode()
+
+        async def send(audio, index):
+            raise AssertionError("nothing should be sent")
+
+        with self.assertRaises(ValueError):
+            await speak_segments(["broken", "later"], synthesize, send)
+        self.assertEqual(cancelled, ["later"])
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class VoiceJobPoolTests(unittest.IsolatedAsyncioTestCase):
+    async def test_admission_reports_position_and_enforces_user_and_queue_caps(self):
+        pool = VoiceJobPool(workers=1, max_queue=3, per_user_limit=2, latency_budget_seconds=1000)
+        job = AsyncMock()
+
+        first = pool.submit("a", job)
+        second = pool.submit("b", job)
+        third = pool.submit("b", job)
+        capped = pool.submit("b", job)
+        full = pool.submit("c", job)
+
+        self.assertEqual([first.position, second.position, third.position], [0, 1, 2])
+        self.assertEqual((capped.accepted, capped.reason), (False, "user_limit"))
+        self.assertEqual((full.accepted, full.reason), (False, "queue_full"))
+
+        await pool.start()
+        await pool.stop()
+        self.assertEqual(job.await_count, 3)
+        self.assertEqual(pool.stats()["users"], 0)
+        self.assertEqual(pool.submit("b", job).position, 0)
+
+    async def test_jobs_past_the_latency_budget_run_text_only(self):
+        clock = _Clock()
+        pool = VoiceJobPool(workers=1, latency_budget_seconds=15, clock=clock)
+        modes = []
+
+        async def job(text_only):
+            modes.append(text_only)
+            clock.now += 40
+
+        pool.submit("a", job)
+        admission = pool.submit("b", job)
+        self.assertFalse(admission.text_only)
+
+        await pool.start()
+        await pool.stop()
+
+        self.assertEqual(modes, [False, True])
+        self.assertEqual(pool.stats()["text_only"], 1)
+        # The measured job time now pushes a queued note's estimate over budget at admission.
+        pool.submit("c", AsyncMock())
+        self.assertTrue(pool.submit("d", AsyncMock()).text_only)
+
+    async def test_a_users_notes_run_one_at_a_time_in_order_while_others_run_alongside(self):
+        pool = VoiceJobPool(workers=2, latency_budget_seconds=1000)
+        events = []
+
+        def job(name):
+            async def run(text_only):
+                events.append(("start", name))
+                await asyncio.sleep(0.01)
+                events.append(("end", name))
+            return run
+
+        pool.submit("a", job("a1"))
+        pool.submit("a", job("a2"))
+        pool.submit("b", job("b1"))
+        await pool.start()
+        await pool.wait_for_user("a")
+
+        self.assertLess(events.index(("end", "a1")), events.index(("start", "a2")))
+        self.assertLess(events.index(("start", "b1")), events.index(("end", "a1")))
+        self.assertIn(("end", "a2"), events)
+        await pool.stop()
+        self.assertEqual(pool.stats()["completed"], 3)
+
+    async def test_a_job_that_raises_cancelled_does_not_take_its_worker_down(self):
+        pool = VoiceJobPool(workers=1, latency_budget_seconds=1000)
+        ran = []
+
+        async def cancelled(text_only):
+            raise asyncio.CancelledError()
+
+        async def later(text_only):
+            ran.append("b")
+
+        pool.submit("a", cancelled)
+        pool.submit("b", later)
+        await pool.start()
+        await asyncio.wait_for(pool.wait_for_user("b"), timeout=1)
+
+        self.assertEqual(ran, ["b"])
+        self.assertEqual((pool.stats()["failed"], pool.stats()["workers"]), (1, 1))
+        await pool.stop()
+
+
+def _speech_with_pauses(seconds, pauses):
+    """A loud tone with half-second silences starting at each of `pauses` (in seconds)."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    samples = (8000 * np.sin(2 * np.pi * 220 * t)).astype("<i2")
+    for pause in pauses:
+        samples[int(pause * SAMPLE_RATE):int((pause + 0.5) * SAMPLE_RATE)] = 0
+    return samples
+
+
+class ChunkedTranscriptionTests(unittest.IsolatedAsyncioTestCase):
+    def test_splits_land_in_the_pauses_and_chunks_stay_under_the_limit(self):
+        samples = _speech_with_pauses(25, pauses=[8.0, 17.0])
+
+        splits = find_split_points(samples, chunk_seconds=10)
+
+        self.assertEqual(len(splits), 2)
+        for split, pause in zip(splits, (8.0, 17.0)):
+            self.assertTrue(pause <= split / SAMPLE_RATE <= pause + 0.5)
+        bounds = [0, *splits, len(samples)]
+        self.assertTrue(all(end - start <= 10 * SAMPLE_RATE for start, end in zip(bounds, bounds[1:])))
+
+    async def test_long_notes_are_chunked_concurrently_and_stitched_in_order(self):
+        samples = _speech_with_pauses(25, pauses=[8.0, 17.0])
+        calls = []
+
+        async def transcribe(audio, filename):
+            calls.append(filename)
+            with wave.open(io.BytesIO(audio)) as wav:
+                self.assertEqual((wav.getnchannels(), wav.getframerate()), (1, SAMPLE_RATE))
+            await asyncio.sleep(0.01 * (3 - len(calls)))
+            return f" part {filename[6]} "
+
+        transcriber = ChunkedTranscriber(
+            transcribe,
+            threshold_seconds=12,
+            chunk_seconds=10,
+            decoder=AsyncMock(return_value=samples),
+        )
+
+        text = await transcriber.transcribe(b"ogg", duration=25, cache_key="unique-1")
+
+        self.assertEqual(text, "part 0 part 1 part 2")
+        self.assertEqual(transcriber.stats()["chunks"], 3)
+        self.assertEqual(transcriber.cached("unique-1"), text)
+
+    async def test_a_failed_chunk_cancels_the_chunks_still_running(self):
+        samples = _speech_with_pauses(25, pauses=[8.0, 17.0])
+        cancelled = []
+
+        async def transcribe(audio, filename):
+            if filename == "chunk-0.wav":
+                raise RuntimeError("transcription failed")
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(filename)
+                raise
+            return "late"
+
+        transcriber = ChunkedTranscriber(
+            transcribe,
+            threshold_seconds=12,
+            chunk_seconds=10,
+            decoder=AsyncMock(return_value=samples),
+        )
+
+        with self.assertRaises(RuntimeError):
+            await transcriber.transcribe(b"ogg", duration=25)
+        self.assertEqual(sorted(cancelled), ["chunk-1.wav", "chunk-2.wav"])
+
+    async def test_a_hung_decoder_is_killed_after_the_timeout(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            hung = os.path.join(tmp, "ffmpeg")
+            with open(hung, "w") as handle:
+                handle.write("#!/bin/sh\nexec sleep 30\n")
+            os.chmod(hung, 0o755)
+
+            with patch("voice_transcription.shutil.which", return_value=hung):
+                samples = await asyncio.wait_for(decode_with_ffmpeg(b"ogg", timeout=0.2), timeout=5)
+
+        self.assertIsNone(samples)
+
+    async def test_short_or_undecodable_notes_go_up_in_one_piece(self):
+        transcribe = AsyncMock(return_value="hello")
+        transcriber = ChunkedTranscriber(transcribe, threshold_seconds=12, decoder=AsyncMock(return_value=None))
+
+        await transcriber.transcribe(b"ogg", "voice.ogg", duration=5)
+        await transcriber.transcribe(b"ogg", "voice.ogg", duration=300)
+
+        self.assertEqual(transcribe.await_count, 2)
+        self.assertEqual(transcriber.stats()["single_uploads"], 2)
+
+
+class TTSCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def test_identical_phrases_synthesize_once_even_when_requested_together(self):
+        cache = TTSCache(admit_after=1)
+        synthesize = AsyncMock(return_value=b"opus")
+        key = tts_cache_key("tts", "alloy", "opus", "You've got this.")
+
+        results = await asyncio.gather(*(cache.get_or_synthesize(key, synthesize) for _ in range(3)))
+        again = await cache.get_or_synthesize(tts_cache_key("tts", "alloy", "opus", " You've got this. "), synthesize)
+
+        self.assertEqual(results + [again], [b"opus"] * 4)
+        self.assertEqual(synthesize.await_count, 1)
+        self.assertNotEqual(key, tts_cache_key("tts", "nova", "opus", "You've got this."))
+
+    async def test_cancelling_one_caller_never_cancels_the_others(self):
+        cache = TTSCache()
+        release = asyncio.Event()
+        calls = []
+
+        async def synthesize():
+            calls.append(1)
+            try:
+                await release.wait()
+            except asyncio.CancelledError:
+                calls.append("cancelled")
+                raise
+            return b"opus"
+
+        owner = asyncio.create_task(cache.get_or_synthesize("calm", synthesize))
+        other = asyncio.create_task(cache.get_or_synthesize("calm", synthesize))
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        self.assertEqual(await other, b"opus")
+        with self.assertRaises(asyncio.CancelledError):
+            await owner
+        self.assertEqual(calls, [1])
+
+        # When everyone waiting goes away the synthesis is dropped, and the next caller starts afresh.
+        release.clear()
+        lonely = asyncio.create_task(cache.get_or_synthesize("steady", synthesize))
+        await asyncio.sleep(0)
+        lonely.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        self.assertEqual(await cache.get_or_synthesize("steady", synthesize), b"opus")
+        self.assertEqual(calls, [1, 1, "cancelled", 1])
+
+    async def test_one_off_phrases_are_never_stored_until_they_repeat(self):
+        with tempfile.TemporaryDirectory() as disk_dir:
+            cache = TTSCache(disk_dir=disk_dir, max_candidates=1)
+            synthesize = AsyncMock(return_value=b"opus")
+
+            await cache.get_or_synthesize("personal", synthesize)
+            self.assertIsNone(await cache.get("personal"))
+            self.assertEqual(os.listdir(disk_dir), [])
+
+            await cache.get_or_synthesize("personal", synthesize)
+            await cache.get_or_synthesize("personal", synthesize)
+            self.assertEqual(synthesize.await_count, 2)
+            self.assertEqual(len(os.listdir(disk_dir)), 1)
+
+            # Remembered keys are bounded; an evicted candidate starts counting again.
+            await cache.get_or_synthesize("one", synthesize)
+            await cache.get_or_synthesize("two", synthesize)
+            await cache.get_or_synthesize("one", synthesize)
+            self.assertIsNone(await cache.get("one"))
+            self.assertEqual(cache.stats()["not_admitted"], 4)
+
+    async def test_memory_tier_evicts_by_bytes_and_disk_tier_survives_restarts(self):
+        with tempfile.TemporaryDirectory() as disk_dir:
+            cache = TTSCache(max_memory_bytes=10, disk_dir=disk_dir, max_disk_bytes=12)
+            for name in ("a", "b", "c"):
+                await cache.put(name, name.encode() * 6)
+
+            self.assertEqual(cache.stats()["memory_entries"], 1)
+            self.assertEqual(sorted(os.listdir(disk_dir)), ["b.audio", "c.audio"])
+
+            restarted = TTSCache(max_memory_bytes=10, disk_dir=disk_dir, max_disk_bytes=12)
+            self.assertEqual(await restarted.get("b"), b"bbbbbb")
+            self.assertIsNone(await restarted.get("a"))
+            self.assertEqual(restarted.stats()["disk_hits"], 1)
+            await restarted.put("d", b"dddddd")
+            self.assertEqual(sorted(os.listdir(disk_dir)), ["b.audio", "d.audio"])
+
+
+class VoiceHandlerTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.original = (bot.db_manager, bot.llm_gateway, bot.voice_job_pool, bot.tts_cache)
+        bot.db_manager = InMemoryDatabase()
+        bot.tts_cache = TTSCache()
+        bot.history_cache.clear()
+        bot.heartbeat_digests.clear()
+
+    async def asyncTearDown(self):
+        bot.db_manager, bot.llm_gateway, bot.voice_job_pool, bot.tts_cache = self.original
+        bot.history_cache.clear()
+        bot.heartbeat_digests.clear()
+
+    async def test_voice_round_trip_stays_in_memory(self):
+        uploads, speech_requests, sent = [], [], []
+        bot.llm_gateway = _voice_gateway(uploads, speech_requests)
+        update = self._voice_update(sent)
+        context = types.SimpleNamespace(bot=types.SimpleNamespace(get_file=AsyncMock(return_value=_TelegramFile())))
+
+        with patch.object(bot.tempfile, "NamedTemporaryFile", side_effect=AssertionError("voice path touched disk")):
+            await bot.handle_voice(update, context)
+
+        self.assertEqual(uploads, [("voice.ogg", VOICE_NOTE)])
+        self.assertEqual(speech_requests[0]["response_format"], "opus")
+        self.assertEqual(sent, [("text", "Breathe in for four, out for six."), ("voice", REPLY_AUDIO)])
+        history = await bot.get_history(424242)
+        self.assertEqual([item["content"] for item in history], ["I can't sleep again", "Breathe in for four, out for six."])
+
+    async def test_queued_voice_note_gets_position_feedback_and_text_only_when_late(self):
+        clock = _Clock()
+        uploads, speech_requests, sent = [], [], []
+        bot.llm_gateway = _voice_gateway(uploads, speech_requests)
+        bot.voice_job_pool = VoiceJobPool(workers=1, latency_budget_seconds=15, clock=clock)
+        bot.voice_job_pool.submit("someone-else", AsyncMock(side_effect=lambda text_only: setattr(clock, "now", clock.now + 60)))
+        update = self._voice_update(sent)
+        context = types.SimpleNamespace(bot=types.SimpleNamespace(get_file=AsyncMock(return_value=_TelegramFile())))
+
+        await bot.handle_voice(update, context)
+        self.assertEqual(sent, [("text", "🎧 Got it, you're next.")])
+
+        await bot.voice_job_pool.start()
+        await bot.voice_job_pool.stop()
+
+        self.assertEqual(sent[1:], [("text", "Breathe in for four, out for six.")])
+        self.assertEqual(speech_requests, [])
+
+    async def test_resent_voice_note_reuses_the_cached_transcript(self):
+        uploads, speech_requests, sent = [], [], []
+        bot.llm_gateway = _voice_gateway(uploads, speech_requests)
+        context = types.SimpleNamespace(bot=types.SimpleNamespace(get_file=AsyncMock(return_value=_TelegramFile())))
+
+        with patch.object(bot, "voice_transcriber", ChunkedTranscriber(bot.transcribe_voice_bytes)):
+            await bot.handle_voice(self._voice_update(sent, file_unique_id="same-note"), context)
+            await bot.handle_voice(self._voice_update(sent, file_unique_id="same-note"), context)
+
+        self.assertEqual(len(uploads), 1)
+        self.assertEqual(context.bot.get_file.await_count, 1)
+
+    async def test_repeated_replies_reuse_cached_speech(self):
+        uploads, speech_requests, sent = [], [], []
+        bot.llm_gateway = _voice_gateway(uploads, speech_requests)
+        context = types.SimpleNamespace(bot=types.SimpleNamespace(get_file=AsyncMock(return_value=_TelegramFile())))
+
+        for _ in range(3):
+            await bot.handle_voice(self._voice_update(sent), context)
+
+        # The first reply is a one-off until it comes back, so only the second is cached.
+        self.assertEqual(len(speech_requests), 2)
+        self.assertEqual([audio for kind, audio in sent if kind == "voice"], [REPLY_AUDIO] * 3)
+
+    def _voice_update(self, sent, file_unique_id=None):
+        return types.SimpleNamespace(
+            effective_user=types.SimpleNamespace(id=424242),
+            message=types.SimpleNamespace(
+                voice=types.SimpleNamespace(file_id="voice-1", file_unique_id=file_unique_id, duration=4),
+                audio=None,
+                date=datetime(2026, 3, 24, 23, 0),
+                reply_text=AsyncMock(side_effect=lambda text: sent.append(("text", text))),
+                reply_voice=AsyncMock(side_effect=lambda voice: sent.append(("voice", voice))),
+            ),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SRC_ROOT = PROJECT_ROOT / "src"
+if str(SRC_ROOT) not in sys.path:
+    sys.path.insert(0, str(SRC_ROOT))
+
+from web_search import BraveSearchClient, build_web_attribution_line  # noqa: E402
+
+
+class BraveSearchClientTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(request.url.params["q"])
+            await asyncio.sleep(0.01)
+            return httpx.Response(
+                200,
+                json={"web": {"results": [{"title": "BTC", "url": "https://example.com", "description": "Up today"}]}},
+            )
+
+        self.client = BraveSearchClient(
+            cache_ttl_seconds=60,
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        )
+        self.env = patch.dict(os.environ, {"BRAVE_API_KEY": "test-key"})
+        self.env.start()
+
+    async def asyncTearDown(self):
+        self.env.stop()
+        await self.client.close()
+
+    async def test_identical_concurrent_queries_share_one_upstream_request(self):
+        results = await asyncio.gather(
+            self.client.search("bitcoin price today"),
+            self.client.search("Bitcoin  price today"),
+            self.client.search("bitcoin price today "),
+        )
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(self.client.stats()["coalesced"], 2)
+
+    async def test_repeated_query_within_ttl_is_served_from_cache(self):
+        first = await self.client.search("bitcoin price today")
+        second = await self.client.search("BITCOIN price today")
+
+        self.assertEqual(len(self.requests), 1)
+        self.assertIs(first, second)
+        self.assertEqual(first.result_count, 1)
+        self.assertEqual(build_web_attribution_line(first), "Source: Web search results for: bitcoin price today")
+
+
+if __name__ == "__main__":
+    unittest.main()